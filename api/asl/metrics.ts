@@ -0,0 +1,18 @@
+import type { VercelRequest, VercelResponse } from '@vercel/node';
+import { handleCors } from '../../lib/cors';
+import { sharedSignRouter } from '../../lib/signRouter';
+
+// Routing counters of this function instance (GET ?format=json for JSON)
+export default function handler(req: VercelRequest, res: VercelResponse) {
+  if (handleCors(req, res)) return;
+
+  if (req.method !== 'GET') {
+    return res.status(405).json({ error: 'Method not allowed' });
+  }
+
+  if (req.query.format === 'json') {
+    return res.status(200).json(sharedSignRouter().routingStats());
+  }
+  res.setHeader('Content-Type', 'text/plain; version=0.0.4');
+  res.status(200).send(sharedSignRouter().routingMetricsText());
+}
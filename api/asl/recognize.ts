@@ -1,8 +1,7 @@
 import type { VercelRequest, VercelResponse } from '@vercel/node';
 import { GoogleGenerativeAI, HarmCategory, HarmBlockThreshold } from '@google/generative-ai';
 import { handleCors } from '../../lib/cors';
-
-type SignLanguage = 'ASL' | 'BSL' | 'CSL' | 'ISL' | 'FSL' | 'JSL';
+import { sharedSignRouter, type Prediction, type RecognizeRequest, type SignLanguage } from '../../lib/signRouter';
 
 const SIGN_LANGUAGE_NAMES: Record<SignLanguage, string> = {
   ASL: 'American Sign Language (ASL)',
@@ -95,6 +94,62 @@ function getGenAI(): GoogleGenerativeAI {
   return genAI;
 }
 
+async function geminiRecognize({ frames, landmarks, signLanguage }: RecognizeRequest): Promise<Prediction> {
+  const selectedFrames = frames.slice(0, 5);
+  const systemPrompt = buildSystemPrompt(signLanguage);
+  const fullName = SIGN_LANGUAGE_NAMES[signLanguage];
+
+  const ai = getGenAI();
+  const model = ai.getGenerativeModel({
+    model: 'gemini-2.0-flash',
+    safetySettings: [
+      { category: HarmCategory.HARM_CATEGORY_HARASSMENT, threshold: HarmBlockThreshold.BLOCK_NONE },
+      { category: HarmCategory.HARM_CATEGORY_HATE_SPEECH, threshold: HarmBlockThreshold.BLOCK_NONE },
+      { category: HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT, threshold: HarmBlockThreshold.BLOCK_NONE },
+      { category: HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT, threshold: HarmBlockThreshold.BLOCK_NONE },
+    ],
+  });
+
+  const detectMime = (b64: string): string => {
+    if (b64.startsWith('/9j/')) return 'image/jpeg';
+    if (b64.startsWith('iVBOR')) return 'image/png';
+    return 'image/jpeg';
+  };
+
+  const imageParts = selectedFrames.map((base64) => ({
+    inlineData: {
+      data: base64,
+      mimeType: detectMime(base64) as 'image/jpeg' | 'image/png',
+    },
+  }));
+
+  let landmarkContext = '';
+  if (landmarks && Array.isArray(landmarks) && landmarks.length > 0) {
+    landmarkContext = '\n\nMediaPipe landmark data (JSON):\n' + JSON.stringify(landmarks, null, 0);
+  }
+
+  const result = await model.generateContent([
+    systemPrompt,
+    ...imageParts,
+    `What ${fullName} sign is being performed? ${landmarkContext ? 'Use both the images AND the landmark data below to identify the sign.' : 'Respond with JSON only.'}${landmarkContext}\n\nRespond with JSON only.`,
+  ]);
+
+  const text = result.response.text().trim();
+
+  let parsed: { sign: string; confidence: number };
+  try {
+    const jsonStr = text.replace(/```json\s*/g, '').replace(/```\s*/g, '').trim();
+    parsed = JSON.parse(jsonStr);
+  } catch {
+    parsed = { sign: '', confidence: 0 };
+  }
+
+  return {
+    sign: parsed.sign || '',
+    confidence: typeof parsed.confidence === 'number' ? parsed.confidence : 0,
+  };
+}
+
 export default async function handler(req: VercelRequest, res: VercelResponse) {
   if (handleCors(req, res)) return;
 
@@ -115,59 +170,10 @@ export default async function handler(req: VercelRequest, res: VercelResponse) {
       ? (reqSignLanguage as SignLanguage)
       : 'ASL';
 
-    const selectedFrames = frames.slice(0, 5);
-    const systemPrompt = buildSystemPrompt(signLanguage);
-    const fullName = SIGN_LANGUAGE_NAMES[signLanguage];
-
-    const ai = getGenAI();
-    const model = ai.getGenerativeModel({
-      model: 'gemini-2.0-flash',
-      safetySettings: [
-        { category: HarmCategory.HARM_CATEGORY_HARASSMENT, threshold: HarmBlockThreshold.BLOCK_NONE },
-        { category: HarmCategory.HARM_CATEGORY_HATE_SPEECH, threshold: HarmBlockThreshold.BLOCK_NONE },
-        { category: HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT, threshold: HarmBlockThreshold.BLOCK_NONE },
-        { category: HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT, threshold: HarmBlockThreshold.BLOCK_NONE },
-      ],
-    });
-
-    const detectMime = (b64: string): string => {
-      if (b64.startsWith('/9j/')) return 'image/jpeg';
-      if (b64.startsWith('iVBOR')) return 'image/png';
-      return 'image/jpeg';
-    };
-
-    const imageParts = selectedFrames.map((base64) => ({
-      inlineData: {
-        data: base64,
-        mimeType: detectMime(base64) as 'image/jpeg' | 'image/png',
-      },
-    }));
-
-    let landmarkContext = '';
-    if (landmarks && Array.isArray(landmarks) && landmarks.length > 0) {
-      landmarkContext = '\n\nMediaPipe landmark data (JSON):\n' + JSON.stringify(landmarks, null, 0);
-    }
-
-    const result = await model.generateContent([
-      systemPrompt,
-      ...imageParts,
-      `What ${fullName} sign is being performed? ${landmarkContext ? 'Use both the images AND the landmark data below to identify the sign.' : 'Respond with JSON only.'}${landmarkContext}\n\nRespond with JSON only.`,
-    ]);
-
-    const text = result.response.text().trim();
-
-    let parsed: { sign: string; confidence: number };
-    try {
-      const jsonStr = text.replace(/```json\s*/g, '').replace(/```\s*/g, '').trim();
-      parsed = JSON.parse(jsonStr);
-    } catch {
-      parsed = { sign: '', confidence: 0 };
-    }
+    // Local model first for ASL (when ASL_LOCAL_URL is set); the LLM only when it is unsure
+    const prediction = await sharedSignRouter().recognizeSign({ frames, landmarks, signLanguage }, geminiRecognize);
 
-    res.json({
-      sign: parsed.sign || '',
-      confidence: typeof parsed.confidence === 'number' ? parsed.confidence : 0,
-    });
+    res.json(prediction);
   } catch (err: any) {
     const msg = err.message || String(err);
     console.error(`[${(req.body as any)?.signLanguage || 'ASL'} Vision] Error:`, msg);
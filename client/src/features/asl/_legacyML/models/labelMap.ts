@@ -1,6 +1,6 @@
 /**
  * ASL model constants and label map.
- * Auto-generated by convert_to_tfjs.py  do not edit manually.
+ * Auto-generated by convert_to_tfjs.py — do not edit manually.
  */
 
 export const NUM_CLASSES = 250;
@@ -8,6 +8,9 @@ export const SEQ_LEN = 25;
 export const NUM_LANDMARKS = 100;
 export const NUM_FEATURES = 5; // [type, x, y, z, landmark_id]
 
+/** Version of the compiled landmark mapping these tables come from (see manifest.json) */
+export const LANDMARK_MAPPING_VERSION = '2c6ef04dbe5d0a4f';
+
 export const ASL_LABELS: string[] = [
   'TV',
   'after',
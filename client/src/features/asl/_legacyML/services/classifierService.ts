@@ -1,5 +1,5 @@
 import * as ort from 'onnxruntime-web';
-import { ASL_LABELS, SEQ_LEN, NUM_LANDMARKS } from '../models/labelMap';
+import { ASL_LABELS, SEQ_LEN, NUM_LANDMARKS, LANDMARK_MAPPING_VERSION } from '../models/labelMap';
 
 let session: ort.InferenceSession | null = null;
 let loadPromise: Promise<ort.InferenceSession> | null = null;
@@ -7,13 +7,45 @@ let loadPromise: Promise<ort.InferenceSession> | null = null;
 ort.env.wasm.numThreads = 1;
 ort.env.wasm.wasmPaths = 'https://cdn.jsdelivr.net/npm/onnxruntime-web@1.24.1/dist/';
 
+/**
+ * Resolve the content-hashed model URL from the deploy manifest written by
+ * convert_to_tfjs.py. Hashed files never change, so the browser can cache them
+ * immutably; only the small manifest needs revalidating.
+ *
+ * Refuses a deploy whose landmark mapping differs from the tables compiled into
+ * labelMap.ts — the model would silently see wrongly assembled frames. There is
+ * no unversioned fallback: the deploy only ever publishes the hashed file, so
+ * without a manifest entry there is no model to load.
+ */
+async function resolveModelUrl(): Promise<string> {
+  let manifest: any = null;
+  try {
+    const res = await fetch('/models/manifest.json', { cache: 'no-cache' });
+    if (res.ok) manifest = await res.json();
+  } catch {
+    // Network error — reported below as a missing manifest
+  }
+  const mappingVersion: string | undefined = manifest?.landmark_mapping?.version;
+  if (mappingVersion && mappingVersion !== LANDMARK_MAPPING_VERSION) {
+    throw new Error(
+      `Landmark mapping mismatch: model expects ${mappingVersion}, client has ${LANDMARK_MAPPING_VERSION}`
+    );
+  }
+  const file: string | undefined = manifest?.models?.asl_deberta?.file;
+  if (!file) {
+    throw new Error('No asl_deberta model in /models/manifest.json (run convert_to_tfjs.py to deploy it)');
+  }
+  return `/models/${file}`;
+}
+
 export async function loadModel(): Promise<ort.InferenceSession> {
   if (session) return session;
   if (loadPromise) return loadPromise;
 
   loadPromise = (async () => {
     try {
-      const s = await ort.InferenceSession.create('/models/asl_deberta.onnx', {
+      const modelUrl = await resolveModelUrl();
+      const s = await ort.InferenceSession.create(modelUrl, {
         executionProviders: ['wasm'],
       });
       session = s;
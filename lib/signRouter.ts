@@ -0,0 +1,186 @@
+/**
+ * Local-model-first routing for /api/asl/recognize, shared by the Express
+ * server (server/src/routes/asl.ts) and the serverless handlers (api/asl/).
+ *
+ * Requests in a sign language listed in ASL_LOCAL_LANGUAGES (default ASL; the
+ * languages the local service's model registry has models for) go to the local
+ * Python recognizer (ml/scripts/recognize_service.py) first; its answer is
+ * returned when the confidence clears ASL_LOCAL_MIN_CONFIDENCE. Everything else
+ * falls back to the LLM: low-confidence answers, a local recognizer that is down
+ * or slower than ASL_LOCAL_TIMEOUT_MS, requests without landmarks or with fewer
+ * than ASL_LOCAL_MIN_FRAMES snapshots, and every sign language without a local
+ * model.
+ *
+ * Limitation: the models are trained on 25-frame windows with face landmarks,
+ * but useASLVisionPipeline sends at most 2 snapshots of hands + pose per
+ * request. Until the client sends a full window, every request falls back
+ * with `too_few_frames` instead of spending a local call on an answer that
+ * never clears the confidence bar.
+ *
+ * With ASL_LLM_STUB set, the LLM is replaced by a stub that answers after
+ * ASL_LLM_STUB_MS with an empty sign, so routing can be tested without API calls.
+ */
+
+export type SignLanguage = 'ASL' | 'BSL' | 'CSL' | 'ISL' | 'FSL' | 'JSL';
+
+export interface RecognizeRequest {
+  frames: string[];
+  landmarks?: any[];
+  signLanguage: SignLanguage;
+}
+
+export interface Prediction {
+  sign: string;
+  confidence: number;
+}
+
+export type LLMRecognizer = (req: RecognizeRequest) => Promise<Prediction>;
+
+export interface SignRouterConfig {
+  aslLocalUrl: string;
+  aslLocalMinConfidence: number;
+  aslLocalTimeoutMs: number;
+  aslLocalLanguages: string[];
+  aslLocalMinFrames: number;
+  aslLlmStub: boolean;
+  aslLlmStubMs: number;
+}
+
+type Source = 'local' | 'llm';
+type FallbackReason =
+  | 'low_confidence' | 'local_error' | 'unsupported_language' | 'no_landmarks' | 'too_few_frames' | 'local_disabled';
+
+const FALLBACK_REASONS: FallbackReason[] = [
+  'low_confidence', 'local_error', 'unsupported_language', 'no_landmarks', 'too_few_frames', 'local_disabled',
+];
+
+/** Routing settings from the environment (listed in server/.env.example). */
+export function signRouterConfig(env: NodeJS.ProcessEnv = process.env): SignRouterConfig {
+  return {
+    aslLocalUrl: (env.ASL_LOCAL_URL || '').replace(/\/+$/, ''),
+    aslLocalMinConfidence: Number(env.ASL_LOCAL_MIN_CONFIDENCE || 0.6),
+    aslLocalTimeoutMs: Number(env.ASL_LOCAL_TIMEOUT_MS || 250),
+    aslLocalLanguages: (env.ASL_LOCAL_LANGUAGES || 'ASL').split(',').map((l) => l.trim().toUpperCase()).filter(Boolean),
+    aslLocalMinFrames: Number(env.ASL_LOCAL_MIN_FRAMES || 8),
+    aslLlmStub: ['1', 'true'].includes((env.ASL_LLM_STUB || '').toLowerCase()),
+    aslLlmStubMs: Number(env.ASL_LLM_STUB_MS || 300),
+  };
+}
+
+export function createSignRouter(config: SignRouterConfig) {
+  const stats = {
+    started: Date.now(),
+    requests: 0,
+    bySource: { local: 0, llm: 0 } as Record<Source, number>,
+    fallbacks: Object.fromEntries(FALLBACK_REASONS.map((r) => [r, 0])) as Record<FallbackReason, number>,
+    localCalls: 0,
+    localMs: 0,
+    llmMs: 0,
+  };
+
+  const stubLLM: LLMRecognizer = (_req) =>
+    new Promise((resolve) => setTimeout(() => resolve({ sign: '', confidence: 0 }), config.aslLlmStubMs));
+
+  async function recognizeLocal(req: RecognizeRequest): Promise<Prediction> {
+    const started = Date.now();
+    stats.localCalls++;
+    try {
+      const resp = await fetch(`${config.aslLocalUrl}/recognize`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        // Landmarks only: the images stay here in case the LLM needs them
+        body: JSON.stringify({ landmarks: req.landmarks, signLanguage: req.signLanguage }),
+        signal: AbortSignal.timeout(config.aslLocalTimeoutMs),
+      });
+      if (!resp.ok) throw new Error(`Local recognizer responded with ${resp.status}`);
+      const result = (await resp.json()) as Prediction;
+      return { sign: result.sign || '', confidence: typeof result.confidence === 'number' ? result.confidence : 0 };
+    } finally {
+      stats.localMs += Date.now() - started;
+    }
+  }
+
+  function fallbackReason(req: RecognizeRequest): FallbackReason | null {
+    if (!config.aslLocalLanguages.includes(req.signLanguage)) return 'unsupported_language';
+    if (!config.aslLocalUrl) return 'local_disabled';
+    if (!req.landmarks || req.landmarks.length === 0) return 'no_landmarks';
+    if (req.landmarks.length < config.aslLocalMinFrames) return 'too_few_frames';
+    return null;
+  }
+
+  /** Answer from the local recognizer when it is confident, else from `llm` (the stub with ASL_LLM_STUB). */
+  async function recognizeSign(req: RecognizeRequest, llm: LLMRecognizer): Promise<Prediction & { source: Source }> {
+    stats.requests++;
+    let reason = fallbackReason(req);
+
+    if (reason === null) {
+      try {
+        const local = await recognizeLocal(req);
+        if (local.confidence >= config.aslLocalMinConfidence) {
+          stats.bySource.local++;
+          return { ...local, source: 'local' };
+        }
+        reason = 'low_confidence';
+      } catch (err: any) {
+        console.warn('[ASL Router] Local recognizer failed:', err.message || String(err));
+        reason = 'local_error';
+      }
+    }
+
+    stats.fallbacks[reason]++;
+    stats.bySource.llm++;
+    const started = Date.now();
+    try {
+      return { ...(await (config.aslLlmStub ? stubLLM : llm)(req)), source: 'llm' };
+    } finally {
+      stats.llmMs += Date.now() - started;
+    }
+  }
+
+  function routingStats() {
+    const fallbacks = stats.bySource.llm;
+    return {
+      uptimeS: (Date.now() - stats.started) / 1000,
+      requests: stats.requests,
+      local: stats.bySource.local,
+      llm: fallbacks,
+      fallbackRate: stats.requests ? fallbacks / stats.requests : 0,
+      fallbacks: { ...stats.fallbacks },
+      localMeanMs: stats.localCalls ? stats.localMs / stats.localCalls : null,
+      llmMeanMs: fallbacks ? stats.llmMs / fallbacks : null,
+    };
+  }
+
+  /** Prometheus text exposition, same `asl_` prefix as ml/scripts/metrics.py. */
+  function routingMetricsText(): string {
+    const s = routingStats();
+    const lines = [
+      '# HELP asl_route_requests_total Recognition requests by answering model',
+      '# TYPE asl_route_requests_total counter',
+      `asl_route_requests_total{source="local"} ${s.local}`,
+      `asl_route_requests_total{source="llm"} ${s.llm}`,
+      '# HELP asl_route_fallback_total LLM fallbacks by reason',
+      '# TYPE asl_route_fallback_total counter',
+      ...FALLBACK_REASONS.map((r) => `asl_route_fallback_total{reason="${r}"} ${s.fallbacks[r]}`),
+      '# HELP asl_route_fallback_ratio Share of requests answered by the LLM',
+      '# TYPE asl_route_fallback_ratio gauge',
+      `asl_route_fallback_ratio ${s.fallbackRate}`,
+      '# HELP asl_route_duration_ms_sum Time spent per model',
+      '# TYPE asl_route_duration_ms_sum counter',
+      `asl_route_duration_ms_sum{source="local"} ${stats.localMs}`,
+      `asl_route_duration_ms_sum{source="llm"} ${stats.llmMs}`,
+    ];
+    return lines.join('\n') + '\n';
+  }
+
+  return { recognizeSign, routingStats, routingMetricsText };
+}
+
+export type SignRouter = ReturnType<typeof createSignRouter>;
+
+let shared: SignRouter | null = null;
+
+/** The process-wide router configured from the environment (serverless: counters are per instance). */
+export function sharedSignRouter(): SignRouter {
+  return (shared ??= createSignRouter(signRouterConfig()));
+}
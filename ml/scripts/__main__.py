@@ -0,0 +1,4 @@
+"""Allow `python scripts <command>` from ml/ — see cli.py."""
+from cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,330 @@
+"""
+Adaptive sequence-length inference over the dynamic seq_len axis.
+
+The DeBERTa export takes any window length up to SEQ_LEN (position ids are
+built per length), but the client always waits for a full 25-frame window.
+Here a window is classified on growing prefixes of its frames (8, 12, 16, 20,
+25 by default) and the prediction is taken at the first prefix where it has
+settled: the top-1 sign is the same for `stable` prefixes in a row and its
+probability reaches `min_confidence`. Windows that never settle end at the
+full length, i.e. the fixed-length result.
+
+    recognizer = AdaptiveRecognizer()
+    results = recognizer.classify_many(windows)    # assembled [L, 5, 100] each
+    results[0]  # {"word", "confidence", "frames"}: frames = prefix length used
+
+    stream = AdaptiveStream(recognizer)            # one per signer
+    stream.reset()                                 # at sign onset (segmenter / gesture buffer)
+    for frame in frames:
+        result = stream.push(frame)                # dict once settled, else None
+    result = result or stream.flush()              # sign ended early: use what arrived
+
+classify_many runs all undecided windows of a prefix length as one batch
+(asl_deberta_batched.onnx when it exists), then drops the settled ones before
+the next length, so attention cost (~ length^2) is only paid where needed.
+
+Benchmark (time-to-first-word, compute and attention cost against the fixed
+length path, per stopping rule): python cli.py bench adaptive [--files 400]
+"""
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from asl_inference import ASLRecognizer, MODEL_PATH, normalize_window, softmax
+from landmark_config import SEQ_LEN
+
+BATCHED_MODEL_PATH = MODEL_PATH.with_name("asl_deberta_batched.onnx")
+PREFIXES = (8, 12, 16, 20, SEQ_LEN)
+MAX_BATCH = 32
+
+
+@dataclass
+class AdaptiveConfig:
+    prefixes: tuple = PREFIXES
+    stable: int = 2                 # consecutive prefixes that must agree on the top-1 sign
+    min_confidence: float = 0.5     # top-1 probability needed to stop before the full length
+
+
+def stop_index(preds: np.ndarray, confidence: np.ndarray, config: AdaptiveConfig) -> np.ndarray:
+    """
+    preds / confidence: [N, n_prefixes] top-1 per prefix. Returns, per window,
+    the index of the prefix the stopping rule settles at (last prefix if never).
+    """
+    n, p = preds.shape
+    run = np.ones((n, p), dtype=np.int64)           # length of the agreeing run ending at each prefix
+    for k in range(1, p):
+        run[:, k] = np.where(preds[:, k] == preds[:, k - 1], run[:, k - 1] + 1, 1)
+    settled = (run >= config.stable) & (confidence >= config.min_confidence)
+    settled[:, -1] = True
+    return settled.argmax(1)
+
+
+def _lengths(n_frames: int, prefixes: tuple) -> list[int]:
+    """Prefix lengths a window of n_frames goes through (the last one is the whole window)."""
+    lengths = [p for p in prefixes if p < n_frames]
+    return lengths + [min(n_frames, prefixes[-1])]
+
+
+class AdaptiveRecognizer:
+    """ASLRecognizer + prefix-by-prefix classification with same-length batching."""
+
+    def __init__(self, model_path: Path | None = None, config: AdaptiveConfig = AdaptiveConfig(),
+                 max_batch: int = MAX_BATCH, **recognizer_kwargs):
+        if model_path is None:
+            model_path = BATCHED_MODEL_PATH if BATCHED_MODEL_PATH.exists() else MODEL_PATH
+        self.recognizer = ASLRecognizer(model_path, **recognizer_kwargs)
+        if self.recognizer.fused:
+            raise ValueError(f"{Path(model_path).name} is a fused model; adaptive inference needs [L, 5, 100] input")
+        self.batched = len(self.recognizer.session.get_inputs()[0].shape) == 4
+        self.max_batch = max_batch if self.batched else 1
+        self.config = config
+
+    def run(self, windows: list[np.ndarray]) -> np.ndarray:
+        """Logits [N, NUM_CLASSES] for normalized windows of one length, in batches of max_batch."""
+        rec = self.recognizer
+        out = []
+        for start in range(0, len(windows), self.max_batch):
+            batch = np.stack(windows[start:start + self.max_batch])
+            with rec.metrics.time("infer"):
+                logits = rec.session.run(None, {rec.input_name: batch if self.batched else batch[0]})[0]
+            if self.batched:
+                rec.metrics.batch_fill.observe(len(batch) / self.max_batch)
+            out.append(logits)
+        return np.concatenate(out)
+
+    def prefix_logits(self, frames: list[np.ndarray], length: int) -> np.ndarray:
+        """Logits of the first `length` frames of each (assembled) window, normalized per prefix."""
+        return self.run([self.recognizer.normalize(f[:length]) for f in frames])
+
+    def classify_many(self, frames: list[np.ndarray], config: AdaptiveConfig | None = None) -> list[dict]:
+        """
+        frames: assembled (un-normalized) [L, 5, 100] windows, first frame = sign onset
+        (only the first prefixes[-1] frames are used). Returns
+        [{word, confidence, frames}] in input order.
+        """
+        config = config or self.config
+        plans = [_lengths(len(f), config.prefixes) for f in frames]
+        history: list[list[int]] = [[] for _ in frames]
+        results: list[dict | None] = [None] * len(frames)
+
+        for step in range(max((len(p) for p in plans), default=0)):
+            by_len: dict[int, list[int]] = {}
+            for i, plan in enumerate(plans):
+                if results[i] is None and step < len(plan):
+                    by_len.setdefault(plan[step], []).append(i)
+            for length, idx in by_len.items():
+                probs = softmax(self.prefix_logits([frames[i] for i in idx], length))
+                for i, p in zip(idx, probs):
+                    top = int(p.argmax())
+                    history[i].append(top)
+                    run = history[i][-config.stable:]
+                    last = step == len(plans[i]) - 1
+                    settled = len(run) == config.stable and len(set(run)) == 1 and p[top] >= config.min_confidence
+                    if settled or last:
+                        results[i] = {"word": self.recognizer.labels[top], "confidence": float(p[top]),
+                                      "frames": length}
+        return results
+
+
+class AdaptiveStream:
+    """Per-signer frame buffer that classifies as each prefix length fills up."""
+
+    def __init__(self, recognizer: AdaptiveRecognizer, config: AdaptiveConfig | None = None):
+        self.recognizer = recognizer
+        self.config = config or recognizer.config
+        self.reset()
+
+    def reset(self):
+        """Start a new sign: the next pushed frame is frame 0 of the window."""
+        self.frames: list[np.ndarray] = []
+        self.history: list[int] = []
+        self.done = False
+
+    def push(self, frame: np.ndarray) -> dict | None:
+        """Append one assembled [5, 100] frame; returns the result once it settles (then None until reset)."""
+        if self.done:
+            return None
+        self.frames.append(frame)
+        n = len(self.frames)
+        if n not in self.config.prefixes:
+            return None
+        probs = softmax(self.recognizer.prefix_logits([np.stack(self.frames)], n)[0])
+        top = int(probs.argmax())
+        self.history.append(top)
+        run = self.history[-self.config.stable:]
+        settled = len(run) == self.config.stable and len(set(run)) == 1 and probs[top] >= self.config.min_confidence
+        if settled or n >= self.config.prefixes[-1]:
+            self.done = True
+            return {"word": self.recognizer.recognizer.labels[top], "confidence": float(probs[top]), "frames": n}
+        return None
+
+    def flush(self) -> dict | None:
+        """Sign ended before settling or reaching the full length: classify what was buffered."""
+        if self.done or not self.frames:
+            return None
+        self.done = True
+        n = len(self.frames)
+        probs = softmax(self.recognizer.prefix_logits([np.stack(self.frames)], n)[0])
+        top = int(probs.argmax())
+        return {"word": self.recognizer.recognizer.labels[top], "confidence": float(probs[top]), "frames": n}
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _timed(fn, *args, repeats: int = 3) -> tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def _fixed_batched(adaptive: AdaptiveRecognizer, frames: list[np.ndarray], seq_len: int):
+    """The fixed-length path: every window at its full length, equal lengths batched."""
+    by_len: dict[int, list[int]] = {}
+    for i, f in enumerate(frames):
+        by_len.setdefault(min(len(f), seq_len), []).append(i)
+    return [adaptive.prefix_logits([frames[i] for i in idx], length) for length, idx in by_len.items()]
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench adaptive`: Kaggle windows (last SEQ_LEN frames of each clip,
+    first frame taken as onset) through every prefix length once, then each
+    stopping rule derived from those logits:
+
+        acc / agree     accuracy, and top-1 agreement with the fixed-length path
+        frames          mean prefix length the rule stops at
+        ttfw            time to first word: frames waited at --fps + unbatched
+                        latency of every prefix evaluated (fixed: SEQ_LEN + one run)
+        compute         model time per window at full batches, all prefixes evaluated
+        attention       sum of length^2 over evaluated prefixes / SEQ_LEN^2
+
+    and one rule (--stable / --min-confidence) once more through classify_many
+    end to end.
+    """
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(prog="bench adaptive")
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--prefixes", default=",".join(map(str, PREFIXES)))
+    parser.add_argument("--stable", type=int, default=AdaptiveConfig.stable, help="rule for the end-to-end run")
+    parser.add_argument("--min-confidence", type=float, default=AdaptiveConfig.min_confidence)
+    parser.add_argument("--model", type=Path, default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    from asl_inference import load_kaggle_windows
+
+    prefixes = tuple(int(p) for p in args.prefixes.split(","))
+    adaptive = AdaptiveRecognizer(args.model, AdaptiveConfig(prefixes=prefixes))
+    print(f"Model: {adaptive.recognizer.model_path.name}{' (batched)' if adaptive.batched else ''}, "
+          f"prefixes {','.join(map(str, prefixes))}")
+    frames, labels, _ = load_kaggle_windows(args.files, args.seed, normalize=False)
+    if not frames:
+        print("No Kaggle windows found")
+        return 1
+    n = len(frames)
+    plans = [_lengths(len(f), prefixes) for f in frames]
+    n_steps = max(len(p) for p in plans)
+    print(f"Windows: {n} ({sum(len(f) < prefixes[-1] for f in frames)} shorter than {prefixes[-1]} frames)")
+
+    # Every window through every prefix: logits plus per-window batched cost and single-window latency per length
+    preds = np.zeros((n, n_steps), dtype=np.int64)
+    conf = np.zeros((n, n_steps), dtype=np.float32)
+    lengths = np.zeros((n, n_steps), dtype=np.int64)
+    batched_ms, single_ms = {}, {}
+    adaptive.prefix_logits(frames[:1], prefixes[0])     # warm-up
+    for step in range(n_steps):
+        by_len: dict[int, list[int]] = {}
+        for i, plan in enumerate(plans):
+            by_len.setdefault(plan[min(step, len(plan) - 1)], []).append(i)
+        for length, idx in by_len.items():
+            windows = [normalize_window(frames[i][:length]) for i in idx]
+            if length not in batched_ms:
+                elapsed, _ = _timed(adaptive.run, windows)
+                batched_ms[length] = elapsed * 1000 / len(windows)
+                single = [_timed(adaptive.run, [w])[0] for w in windows[:8]]
+                single_ms[length] = float(np.median(single)) * 1000
+            probs = softmax(adaptive.run(windows))
+            preds[idx, step] = probs.argmax(1)
+            conf[idx, step] = probs.max(1)
+            lengths[idx, step] = length
+
+    last = np.array([len(p) - 1 for p in plans])
+    rows_idx = np.arange(n)
+    # Windows with fewer prefixes repeat their last one; the rules stop there at the latest
+    fixed_pred = preds[rows_idx, last]
+    fixed_len = lengths[rows_idx, last]
+    fixed_ttfw = fixed_len / args.fps * 1000 + np.array([single_ms[L] for L in fixed_len])
+    fixed_compute = np.array([batched_ms[L] for L in fixed_len])
+
+    rules = [AdaptiveConfig(prefixes, s, c) for s in (2, 3) for c in (0.0, 0.3, 0.5, 0.7, 0.9)]
+    rows = []
+    for rule in rules:
+        stop = stop_index(preds, conf, rule)
+        stop = np.minimum(stop, last)
+        pred = preds[rows_idx, stop]
+        used = lengths[rows_idx, stop]
+        compute = np.array([sum(batched_ms[lengths[i, k]] for k in range(stop[i] + 1)) for i in range(n)])
+        ttfw = used / args.fps * 1000 + np.array([sum(single_ms[lengths[i, k]] for k in range(stop[i] + 1))
+                                                  for i in range(n)])
+        attention = np.array([sum(int(lengths[i, k]) ** 2 for k in range(stop[i] + 1)) for i in range(n)])
+        rows.append({
+            "stable": rule.stable,
+            "min_confidence": rule.min_confidence,
+            "accuracy": float((pred == labels).mean()),
+            "agreement_with_fixed": float((pred == fixed_pred).mean()),
+            "mean_frames": float(used.mean()),
+            "ttfw_mean_ms": float(ttfw.mean()),
+            "ttfw_p95_ms": float(np.percentile(ttfw, 95)),
+            "compute_ms": float(compute.mean()),
+            "attention_ratio": float(attention.mean() / prefixes[-1] ** 2),
+        })
+
+    fixed = {
+        "accuracy": float((fixed_pred == labels).mean()),
+        "mean_frames": float(fixed_len.mean()),
+        "ttfw_mean_ms": float(fixed_ttfw.mean()),
+        "ttfw_p95_ms": float(np.percentile(fixed_ttfw, 95)),
+        "compute_ms": float(fixed_compute.mean()),
+        "attention_ratio": float((fixed_len ** 2).mean() / prefixes[-1] ** 2),
+    }
+    print(f"\n{'rule':>12}  {'acc':>6}  {'agree':>6}  {'frames':>6}  {'ttfw ms':>8}  {'p95':>7}  "
+          f"{'compute ms':>10}  {'attention':>9}")
+    print(f"{'fixed':>12}  {fixed['accuracy']:6.3f}  {1:6.3f}  {fixed['mean_frames']:6.1f}  "
+          f"{fixed['ttfw_mean_ms']:8.1f}  {fixed['ttfw_p95_ms']:7.1f}  {fixed['compute_ms']:10.3f}  "
+          f"{fixed['attention_ratio']:9.2f}")
+    for r in rows:
+        label = f"{r['stable']}x>={r['min_confidence']:g}"
+        print(f"{label:>12}  {r['accuracy']:6.3f}  {r['agreement_with_fixed']:6.3f}  {r['mean_frames']:6.1f}  "
+              f"{r['ttfw_mean_ms']:8.1f}  {r['ttfw_p95_ms']:7.1f}  {r['compute_ms']:10.3f}  "
+              f"{r['attention_ratio']:9.2f}")
+
+    # The real engine with one rule: wall time against one fixed-length batched pass
+    default = AdaptiveConfig(prefixes, args.stable, args.min_confidence)
+    fixed_s, _ = _timed(_fixed_batched, adaptive, frames, prefixes[-1])
+    adaptive_s, results = _timed(adaptive.classify_many, frames, default)
+    derived = preds[rows_idx, np.minimum(stop_index(preds, conf, default), last)]
+    engine = np.array([adaptive.recognizer.labels.index(r["word"]) for r in results])
+    same = (engine == derived).mean()
+    print(f"\nclassify_many ({default.stable}x>={default.min_confidence:g}): {adaptive_s * 1000:.1f} ms "
+          f"vs fixed-length {fixed_s * 1000:.1f} ms for {n} windows ({fixed_s / adaptive_s:.2f}x); "
+          f"matches derived rule on {same:.1%} {'✓' if same > 0.99 else '✗'}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"windows": n, "fps": args.fps, "prefixes": prefixes,
+                                           "batched_ms": batched_ms, "single_ms": single_ms,
+                                           "fixed": fixed, "rules": rows}, indent=2))
+        print(f"Saved {args.output}")
+    return 0
+
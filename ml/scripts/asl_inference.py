@@ -0,0 +1,206 @@
+"""
+Python inference path for the DeBERTa ASL model.
+
+Mirrors the client pipeline (landmarkAssembler.ts -> gestureBuffer.ts ->
+classifierService.ts) so models can be served, tested and benchmarked outside
+the browser:
+
+  holistic frames [T, 543, 3] --assemble--> [T, 5, 100] --normalize--> model --> softmax
+
+Preprocessing is driven by the compiled landmark mapping, and ASLRecognizer
+refuses a model whose stamped mapping version differs from it. Sessions use the
+autotuned <model>.ort.json settings when present (ort_tune.py).
+
+Fused models (export_deberta_onnx.py --fused) take the raw holistic frames and
+do assemble + normalize inside the graph; ASLRecognizer detects them by their
+[seq_len, 543, 3] input and skips the Python preprocessing.
+
+An optional window_cache.WindowCache reuses logits for windows whose hand
+landmarks barely moved since an earlier window of the same room. Assemble,
+normalize and infer latencies go to metrics.REGISTRY (or the `metrics` passed in).
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+from landmark_mapping import MAPPING_PATH, check_model_version, load_mapping
+from metrics import REGISTRY
+from ort_tune import create_session
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_PATH = PROJECT_DIR / "models" / "saved_model" / "asl_deberta.onnx"
+LABEL_MAP_PATH = PROJECT_DIR / "data" / "processed" / "label_map.json"
+
+TOP_N = 5
+
+
+class LandmarkAssembler:
+    """Vectorized [T, 543, 3] -> [T, 5, 100] using the compiled mapping tables."""
+
+    def __init__(self, mapping: dict):
+        self.version = mapping["version"]
+        self.n_holistic = mapping["n_holistic"]
+        self.n_landmarks = mapping["n_landmarks"]
+        self.gather = np.asarray(mapping["gather"], dtype=np.intp)
+        self.avg_matrix = np.zeros((len(mapping["avg_index"]), self.n_holistic), dtype=np.float32)
+        for row, (idx, w) in enumerate(zip(mapping["avg_index"], mapping["avg_weight"])):
+            self.avg_matrix[row, idx] = w
+        self.type_ids = np.asarray(mapping["type_ids"], dtype=np.float32)
+        self.landmark_ids = np.asarray(mapping["landmark_ids"], dtype=np.float32)
+
+    def __call__(self, holistic: np.ndarray) -> np.ndarray:
+        """
+        holistic: [T, 543, 3] float, NaN where a landmark was not detected.
+        Returns [T, 5, 100] float32 with channels [type, x, y, z, landmark_id];
+        coordinates stay NaN where missing (normalize_window zero-fills them).
+        """
+        holistic = np.asarray(holistic, dtype=np.float32)
+        n = holistic.shape[0]
+        out = np.empty((n, 5, self.n_landmarks), dtype=np.float32)
+        out[:, 0] = self.type_ids
+        out[:, 4] = self.landmark_ids
+
+        n_kept = len(self.gather)
+        out[:, 1:4, :n_kept] = holistic[:, self.gather].transpose(0, 2, 1)
+
+        # Averaged landmarks ignore missing points, like the client's running mean
+        present = ~np.isnan(holistic)
+        filled = np.where(present, holistic, 0.0)
+        num = np.einsum("ak,tkc->tca", self.avg_matrix, filled)
+        den = np.einsum("ak,tkc->tca", self.avg_matrix, present.astype(np.float32))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:, 1:4, n_kept:] = np.where(den > 0, num / den, np.nan)
+        return out
+
+
+def normalize_window(frames: np.ndarray) -> np.ndarray:
+    """
+    Per-coordinate normalization over the window (separate mean/std for x, y, z,
+    ignoring NaN), then NaN -> 0. Same as GestureBuffer.buildTensor.
+    frames: [T, 5, 100] -> new [T, 5, 100] float32 array.
+    """
+    out = np.array(frames, dtype=np.float32, copy=True)
+    coords = out[:, 1:4, :]                                 # view [T, 3, 100]
+    valid = ~np.isnan(coords)
+    count = valid.sum(axis=(0, 2))                           # [3]
+    filled = np.where(valid, coords, 0.0)
+    total = filled.sum(axis=(0, 2))
+    total_sq = (filled * filled).sum(axis=(0, 2))
+    mean = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+    var = np.where(count > 1, total_sq / np.maximum(count, 1) - mean * mean, 1.0)
+    std = np.sqrt(np.maximum(var, 1e-8))
+    coords[:] = np.where(valid, (coords - mean[None, :, None]) / std[None, :, None], 0.0)
+    return out
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    e = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def load_labels(path: Path = LABEL_MAP_PATH) -> list[str]:
+    import json
+
+    with open(path) as f:
+        label_map = json.load(f)
+    labels = [""] * (max(int(k) for k in label_map) + 1)
+    for idx, word in label_map.items():
+        labels[int(idx)] = word
+    return labels
+
+
+def load_kaggle_windows(max_files: int | None = None, seed: int = 0, normalize: bool = True):
+    """
+    Model inputs from the Kaggle parquet files, preprocessed like ASLRecognizer
+    (assemble, last seq_len frames, normalize). Returns ([L, 5, 100] windows,
+    class indices from sign_to_prediction_index_map.json, sign names).
+    normalize=False keeps the assembled frames (NaN = missing), e.g. to
+    normalize sub-windows separately.
+    """
+    import json
+
+    import pandas as pd
+
+    from collect_landmarks import DATA_DIR, SIGN_MAP_FILE, TRAIN_CSV, load_parquet_holistic
+
+    df = pd.read_csv(TRAIN_CSV)
+    if max_files and len(df) > max_files:
+        df = df.sample(max_files, random_state=seed)
+    with open(SIGN_MAP_FILE) as f:
+        sign_map = json.load(f)
+
+    mapping = load_mapping()
+    assembler = LandmarkAssembler(mapping)
+    seq_len = mapping["seq_len"]
+    windows = [assembler(load_parquet_holistic(DATA_DIR / path)[-seq_len:]) for path in df["path"]]
+    if normalize:
+        windows = [normalize_window(w) for w in windows]
+    return windows, df["sign"].map(sign_map).to_numpy(), df["sign"].to_numpy()
+
+
+class ASLRecognizer:
+    """ONNX Runtime session + mapping-checked preprocessing + label lookup."""
+
+    def __init__(self, model_path: Path = MODEL_PATH, mapping_path: Path = MAPPING_PATH,
+                 label_map_path: Path = LABEL_MAP_PATH, session_options=None,
+                 strict_mapping: bool = False, cache=None, metrics=REGISTRY):
+        self.model_path = Path(model_path)
+        self.mapping = load_mapping(mapping_path)
+        self.session = create_session(self.model_path, session_options)
+        check_model_version(self.session.get_modelmeta().custom_metadata_map,
+                            self.mapping, strict=strict_mapping)
+        self.assembler = LandmarkAssembler(self.mapping)
+        self.labels = load_labels(label_map_path)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.fused = list(model_input.shape[-2:]) == [self.mapping["n_holistic"], 3]
+        self.seq_len = self.mapping["seq_len"]
+        self.cache = cache   # optional window_cache.WindowCache
+        self.metrics = metrics
+
+    def logits(self, window: np.ndarray) -> np.ndarray:
+        """window: normalized [L, 5, 100] (raw [L, 543, 3] for a fused model) -> logits [NUM_CLASSES]."""
+        with self.metrics.time("infer"):
+            return self.session.run(None, {self.input_name: np.ascontiguousarray(window, dtype=np.float32)})[0][0]
+
+    def normalize(self, frames: np.ndarray) -> np.ndarray:
+        with self.metrics.time("normalize"):
+            return normalize_window(frames)
+
+    def classify_window(self, frames: np.ndarray, room=None) -> dict:
+        """
+        frames: assembled (un-normalized) [L, 5, 100]; only the last seq_len frames are used.
+        room: cache partition (participant / room id) when a cache is attached.
+        """
+        if self.fused:
+            raise ValueError(f"{self.model_path.name} is a fused model; pass raw frames to classify_holistic")
+        frames = frames[-self.seq_len:]
+        if self.cache is None:
+            return self._result(self.logits(self.normalize(frames)))
+        key = self.cache.key(frames)
+        logits = self.cache.get(room, key)
+        if logits is None:
+            start = time.perf_counter()
+            logits = self.logits(self.normalize(frames))
+            self.cache.put(room, key, logits, (time.perf_counter() - start) * 1000)
+        return self._result(logits)
+
+    def classify_holistic(self, holistic: np.ndarray, room=None) -> dict:
+        """holistic: [T, 543, 3] raw landmarks (NaN = missing)."""
+        if self.fused:
+            return self._result(self.logits(holistic[-self.seq_len:]))
+        with self.metrics.time("assemble"):
+            frames = self.assembler(holistic[-self.seq_len:])
+        return self.classify_window(frames, room)
+
+    def _result(self, logits: np.ndarray) -> dict:
+        probs = softmax(logits)
+        top = np.argsort(probs)[::-1][:TOP_N]
+        return {
+            "word": self.labels[top[0]],
+            "confidence": float(probs[top[0]]),
+            "topN": [{"word": self.labels[i], "confidence": float(probs[i])} for i in top],
+        }
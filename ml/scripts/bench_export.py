@@ -0,0 +1,396 @@
+"""
+Parity + latency benchmark for every exported DeBERTa ONNX artifact.
+
+Runs each artifact (fp32, ORT-optimized, int8-quantized, batched) over a fixed,
+seeded landmark corpus at every sequence length 1..SEQ_LEN, for each requested
+thread count, and compares logits against a reference (PyTorch weights when
+given, otherwise the fp32 asl_deberta.onnx). Fused artifacts (raw holistic
+input) run over a seeded holistic corpus instead, and their reference is the
+Python preprocessing (asl_inference) followed by the reference model. Reports parity, p50/p99 latency,
+throughput and peak RSS, and writes everything to JSON.
+
+Usage:
+    python bench_export.py [--weights model.pt] [--make-variants]
+                           [--threads 1,2,4] [--windows 16]
+                           [--baseline old.json] [--max-regression 1.25]
+                           [--out models/saved_model/bench_export.json]
+
+Exit code is 1 when any artifact fails its parity tolerance or, with
+--baseline, when its p50 latency regressed by more than --max-regression.
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing as mp
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from landmark_config import SEQ_LEN, N_HOLISTIC, N_LANDMARKS, NUM_FEATURES, TYPE_ARRAY
+
+SCRIPT_DIR = Path(__file__).parent
+MODEL_DIR = SCRIPT_DIR.parent / "models" / "saved_model"
+FP32_MODEL = MODEL_DIR / "asl_deberta.onnx"
+DEFAULT_OUT = MODEL_DIR / "bench_export.json"
+
+CORPUS_SEED = 1234
+CORPUS_WINDOWS = 16
+
+# Parity tolerances per artifact kind: (max abs logit diff, min top-1 agreement)
+TOLERANCES = {
+    "fp32": (1e-4, 1.0),
+    "optimized": (1e-3, 1.0),
+    "batched": (1e-4, 1.0),
+    "fused": (1e-3, 1.0),
+    "int8": (float("inf"), 0.9),
+}
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def landmark_corpus(n_windows: int = CORPUS_WINDOWS, seed: int = CORPUS_SEED) -> np.ndarray:
+    """
+    Deterministic [n_windows, SEQ_LEN, 5, 100] model inputs shaped like real ones:
+    smooth per-landmark trajectories, normalized coords, NaN-zeroed dropouts of a
+    whole hand for some frames, type ids and 1-indexed landmark ids.
+    """
+    rng = np.random.default_rng(seed)
+    out = np.zeros((n_windows, SEQ_LEN, NUM_FEATURES, N_LANDMARKS), dtype=np.float32)
+    out[:, :, 0, :] = np.asarray(TYPE_ARRAY, dtype=np.float32)
+    out[:, :, 4, :] = np.arange(1, N_LANDMARKS + 1, dtype=np.float32)
+
+    base = rng.normal(0, 1, (n_windows, 1, 3, N_LANDMARKS))
+    drift = rng.normal(0, 0.08, (n_windows, SEQ_LEN, 3, N_LANDMARKS)).cumsum(axis=1)
+    out[:, :, 1:4, :] = (base + drift).astype(np.float32)
+
+    # One hand missing for a random span in half the windows
+    hand_cols = {1: slice(0, 21), 2: slice(21, 42)}
+    for w in range(0, n_windows, 2):
+        cols = hand_cols[int(rng.integers(1, 3))]
+        start = int(rng.integers(0, SEQ_LEN))
+        out[w, start:, 1:4, cols] = 0.0
+    return out
+
+
+def holistic_corpus(n_windows: int = CORPUS_WINDOWS, seed: int = CORPUS_SEED) -> np.ndarray:
+    """
+    Deterministic raw holistic windows [n_windows, SEQ_LEN, 543, 3] for fused
+    artifacts: smooth trajectories in image coordinates, one hand NaN (not
+    detected) for a random span in half the windows.
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.2, 0.8, (n_windows, 1, N_HOLISTIC, 3))
+    drift = rng.normal(0, 0.01, (n_windows, SEQ_LEN, N_HOLISTIC, 3)).cumsum(axis=1)
+    out = (base + drift).astype(np.float32)
+
+    hand_rows = {1: slice(468, 489), 2: slice(522, 543)}
+    for w in range(0, n_windows, 2):
+        rows = hand_rows[int(rng.integers(1, 3))]
+        start = int(rng.integers(0, SEQ_LEN))
+        out[w, start:, rows] = np.nan
+    return out
+
+
+@functools.lru_cache(maxsize=1)
+def _assembler():
+    from asl_inference import LandmarkAssembler
+    from landmark_mapping import load_mapping
+
+    return LandmarkAssembler(load_mapping())
+
+
+def holistic_to_input(holistic: np.ndarray) -> np.ndarray:
+    """Reference preprocessing for fused artifacts: [L, 543, 3] -> normalized [L, 5, 100]."""
+    from asl_inference import normalize_window
+
+    return normalize_window(_assembler()(holistic))
+
+
+# ---------------------------------------------------------------------------
+# Artifacts & reference
+# ---------------------------------------------------------------------------
+
+def artifact_kind(path: Path) -> str:
+    name = path.name
+    if "_embedding" in name:
+        return "embedding"
+    if "fused" in name:
+        return "fused"
+    if "int8" in name or "quant" in name:
+        return "int8"
+    if ".opt." in name or "optimized" in name:
+        return "optimized"
+    if "batched" in name:
+        return "batched"
+    return "fp32"
+
+
+def discover_artifacts(model_dir: Path = MODEL_DIR) -> list[Path]:
+    """Every asl_deberta*.onnx classifier (embedding exports output features, not logits)."""
+    return sorted(p for p in model_dir.glob("asl_deberta*.onnx")
+                  if p.is_file() and artifact_kind(p) != "embedding")
+
+
+def make_variants(src: Path = FP32_MODEL) -> list[Path]:
+    """Write ORT-optimized and dynamic-int8 variants of the fp32 model next to it."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    opt_path = src.with_name(f"{src.stem}.opt.onnx")
+    so = ort.SessionOptions()
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    so.optimized_model_filepath = str(opt_path)
+    ort.InferenceSession(str(src), so, providers=["CPUExecutionProvider"])
+    print(f"Wrote {opt_path.name}")
+
+    int8_path = src.with_name(f"{src.stem}.int8.onnx")
+    quantize_dynamic(str(src), str(int8_path), weight_type=QuantType.QInt8)
+    print(f"Wrote {int8_path.name}")
+    return [opt_path, int8_path]
+
+
+def reference_logits(corpus: np.ndarray, weights: str | None, prepare=None) -> np.ndarray:
+    """
+    Logits [SEQ_LEN, n_windows, NUM_CLASSES]; index L-1 holds length-L prefixes.
+    `prepare` maps each prefix to model input first (holistic_to_input for fused).
+    """
+    if weights:
+        import torch
+        from export_deberta_onnx import build_model, load_weights
+
+        model = load_weights(build_model(), weights).eval()
+        run = lambda x: model(torch.from_numpy(x)).numpy()
+        with torch.no_grad():
+            return _run_all_lengths(run, corpus, prepare)
+
+    import onnxruntime as ort
+
+    sess = ort.InferenceSession(str(FP32_MODEL), providers=["CPUExecutionProvider"])
+    name = sess.get_inputs()[0].name
+    return _run_all_lengths(lambda x: sess.run(None, {name: x})[0], corpus, prepare)
+
+
+def _run_all_lengths(run, corpus: np.ndarray, prepare=None) -> np.ndarray:
+    prepare = prepare or (lambda x: x)
+    out = []
+    for length in range(1, SEQ_LEN + 1):
+        out.append(np.concatenate([run(prepare(w[-length:])) for w in corpus], axis=0))
+    return np.stack(out)
+
+
+def parity(ref: np.ndarray, got: np.ndarray) -> dict:
+    """ref/got: [SEQ_LEN, n_windows, NUM_CLASSES]."""
+    diff = np.abs(ref - got)
+    agree = ref.argmax(-1) == got.argmax(-1)
+    worst_len = int(diff.reshape(SEQ_LEN, -1).max(1).argmax()) + 1
+    return {
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "top1_agreement": float(agree.mean()),
+        "worst_seq_len": worst_len,
+    }
+
+
+def check_parity(ref_run, run, name: str = "onnx", kind: str = "fp32", n_windows: int = 4) -> bool:
+    """
+    Quick export-time check: compare `run` against `ref_run` (both numpy
+    [L, 5, 100] -> logits) over the corpus at every length 1..SEQ_LEN. For
+    kind "fused", `run` takes raw [L, 543, 3] windows from the holistic corpus
+    and `ref_run` gets them through holistic_to_input.
+    """
+    if kind == "fused":
+        corpus = holistic_corpus(n_windows)
+        ref = _run_all_lengths(ref_run, corpus, holistic_to_input)
+    else:
+        corpus = landmark_corpus(n_windows)
+        ref = _run_all_lengths(ref_run, corpus)
+    p = parity(ref, _run_all_lengths(run, corpus))
+    ok = _parity_ok(p, kind)
+    print(f"{name} parity over lengths 1..{SEQ_LEN} × {n_windows} windows: "
+          f"max abs diff = {p['max_abs_diff']:.2e} (worst at L={p['worst_seq_len']}), "
+          f"top-1 agreement = {p['top1_agreement']:.3f} {'✓' if ok else '✗'}")
+    return ok
+
+
+def _parity_ok(p: dict, kind: str) -> bool:
+    max_diff, min_agree = TOLERANCES[kind]
+    return p["max_abs_diff"] <= max_diff and p["top1_agreement"] >= min_agree
+
+
+# ---------------------------------------------------------------------------
+# Per-artifact benchmark (runs in a fresh process so peak RSS is per-artifact)
+# ---------------------------------------------------------------------------
+
+def _peak_rss_mb() -> float | None:
+    # VmHWM is per address space, so it resets on exec; ru_maxrss survives exec
+    # and would report the parent's peak in a spawned worker.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _bench_one(path: str, threads: int, corpus: np.ndarray) -> dict:
+    import onnxruntime as ort
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = threads
+    so.inter_op_num_threads = 1
+    sess = ort.InferenceSession(path, so, providers=["CPUExecutionProvider"])
+    inp = sess.get_inputs()[0]
+    batched = len(inp.shape) == 4
+
+    def run(x):
+        if batched:
+            return sess.run(None, {inp.name: x})[0]
+        return np.concatenate([sess.run(None, {inp.name: w})[0] for w in x], axis=0)
+
+    run(corpus[:1, -SEQ_LEN:])  # warm-up
+
+    logits, per_len = [], []
+    for length in range(1, SEQ_LEN + 1):
+        x = np.ascontiguousarray(corpus[:, -length:])
+        lat = []
+        outs = []
+        if batched:
+            t0 = time.perf_counter()
+            outs.append(run(x))
+            lat.append((time.perf_counter() - t0) * 1000 / len(x))
+        else:
+            for w in x:
+                t0 = time.perf_counter()
+                outs.append(run(w[None]))
+                lat.append((time.perf_counter() - t0) * 1000)
+        logits.append(np.concatenate(outs, axis=0))
+        per_len.append(lat)
+
+    all_lat = np.concatenate([np.asarray(l) for l in per_len])
+    full = np.asarray(per_len[-1])
+    return {
+        "logits": np.stack(logits),
+        "p50_ms": float(np.percentile(all_lat, 50)),
+        "p99_ms": float(np.percentile(all_lat, 99)),
+        "full_len_p50_ms": float(np.percentile(full, 50)),
+        "full_len_p99_ms": float(np.percentile(full, 99)),
+        "throughput_windows_s": float(1000.0 / full.mean()),
+        "p50_ms_by_len": [float(np.percentile(l, 50)) for l in per_len],
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def bench(artifacts: list[Path], threads: list[int], corpus: np.ndarray, ref: np.ndarray,
+          fused: tuple[np.ndarray, np.ndarray] | None = None) -> list[dict]:
+    """fused: (holistic corpus, its reference logits), used for fused artifacts."""
+    ctx = mp.get_context("spawn")
+    rows = []
+    for path in artifacts:
+        kind = artifact_kind(path)
+        inputs, expected = fused if kind == "fused" else (corpus, ref)
+        for t in threads:
+            with ctx.Pool(1) as pool:
+                r = pool.apply(_bench_one, (str(path), t, inputs))
+            p = parity(expected, r.pop("logits"))
+            rows.append({
+                "artifact": path.name,
+                "kind": kind,
+                "size_mb": path.stat().st_size / (1024 * 1024),
+                "threads": t,
+                **p,
+                "parity_ok": _parity_ok(p, kind),
+                **r,
+            })
+            print(f"  {path.name:<28} t={t:<2} p50={r['p50_ms']:7.2f}ms p99={r['p99_ms']:7.2f}ms "
+                  f"{r['throughput_windows_s']:7.1f} win/s  rss={r['peak_rss_mb'] or 0:6.0f}MB  "
+                  f"maxdiff={p['max_abs_diff']:.1e} top1={p['top1_agreement']:.3f}"
+                  f"{'' if rows[-1]['parity_ok'] else '  ✗ PARITY'}")
+    return rows
+
+
+def compare_baseline(rows: list[dict], baseline: dict, max_regression: float) -> list[str]:
+    old = {(r["artifact"], r["threads"]): r for r in baseline.get("results", [])}
+    failures = []
+    for r in rows:
+        prev = old.get((r["artifact"], r["threads"]))
+        if prev and r["full_len_p50_ms"] > prev["full_len_p50_ms"] * max_regression:
+            failures.append(
+                f"{r['artifact']} t={r['threads']}: p50 {prev['full_len_p50_ms']:.2f} -> "
+                f"{r['full_len_p50_ms']:.2f} ms (> {max_regression:.2f}x)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", help="PyTorch .pt to use as reference (default: fp32 ONNX)")
+    parser.add_argument("--make-variants", action="store_true", help="write .opt and .int8 variants first")
+    parser.add_argument("--threads", default="1,2,4", help="comma-separated intra-op thread counts")
+    parser.add_argument("--windows", type=int, default=CORPUS_WINDOWS)
+    parser.add_argument("--baseline", type=Path, help="previous JSON to compare latency against")
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    args = parser.parse_args(argv)
+
+    if not FP32_MODEL.exists():
+        print(f"ONNX model not found at {FP32_MODEL}")
+        print("Run export_deberta_onnx.py first.")
+        sys.exit(1)
+    if args.make_variants:
+        make_variants()
+
+    artifacts = discover_artifacts()
+    threads = [int(t) for t in args.threads.split(",")]
+    corpus = landmark_corpus(args.windows)
+
+    print(f"Reference: {'PyTorch ' + args.weights if args.weights else FP32_MODEL.name}")
+    ref = reference_logits(corpus, args.weights)
+    fused = None
+    if any(artifact_kind(p) == "fused" for p in artifacts):
+        holistic = holistic_corpus(args.windows)
+        fused = (holistic, reference_logits(holistic, args.weights, holistic_to_input))
+    print(f"Benchmarking {len(artifacts)} artifacts × threads {threads} "
+          f"× lengths 1..{SEQ_LEN} × {args.windows} windows")
+    rows = bench(artifacts, threads, corpus, ref, fused)
+
+    failures = [f"{r['artifact']} t={r['threads']}: parity "
+                f"(max diff {r['max_abs_diff']:.1e}, top-1 {r['top1_agreement']:.3f})"
+                for r in rows if not r["parity_ok"]]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += compare_baseline(rows, json.load(f), args.max_regression)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "cpus": mp.cpu_count()},
+        "reference": args.weights or FP32_MODEL.name,
+        "corpus": {"seed": CORPUS_SEED, "windows": args.windows, "seq_len": SEQ_LEN},
+        "results": rows,
+        "failures": failures,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved: {args.out}")
+
+    if failures:
+        print("\nFAILED:")
+        for msg in failures:
+            print(f"  {msg}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup-cost benchmark for the ml CLI.
+
+Times fresh interpreter runs of `cli.py <command> --help` (what CI/deploy hooks
+pay on every call) against importing each underlying script module directly
+(what the old `python <script>.py` entry points paid before doing any work).
+
+Usage:
+    python bench_startup.py [--repeats 5] [--out startup.json]
+    python cli.py bench startup [--repeats 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+CLI = SCRIPT_DIR / "cli.py"
+
+# (label, argv after the interpreter)
+CLI_RUNS = [
+    ("cli --help", [str(CLI), "--help"]),
+    ("cli collect --help", [str(CLI), "collect", "--help"]),
+    ("cli train --help", [str(CLI), "train", "--help"]),
+    ("cli export --help", [str(CLI), "export", "--help"]),
+    ("cli deploy --help", [str(CLI), "deploy", "--help"]),
+    ("cli bench --list", [str(CLI), "bench", "--list"]),
+]
+MODULE_IMPORTS = [
+    "collect_landmarks", "train_model", "export_deberta_onnx",
+    "convert_to_tfjs", "embed_onnx",
+]
+
+
+def _time_run(argv: list[str], repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, *argv], cwd=SCRIPT_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        times.append((time.perf_counter() - t0) * 1000)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.decode(errors="replace").strip().splitlines()[-1:]}
+    return {"median_ms": statistics.median(times), "min_ms": min(times)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench startup", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--out", type=Path, help="optional JSON output path")
+    args = parser.parse_args(argv)
+
+    results = {"baseline": _time_run(["-c", "pass"], args.repeats), "cli": {}, "modules": {}}
+    for label, run_argv in CLI_RUNS:
+        results["cli"][label] = _time_run(run_argv, args.repeats)
+    for module in MODULE_IMPORTS:
+        results["modules"][module] = _time_run(["-c", f"import {module}"], args.repeats)
+
+    base = results["baseline"]["median_ms"]
+    print(f"Interpreter baseline: {base:.0f} ms (median of {args.repeats})\n")
+    print(f"  {'command':<28}{'median ms':>12}{'over baseline':>16}")
+    for section in ("cli", "modules"):
+        for label, r in results[section].items():
+            name = label if section == "cli" else f"import {label}"
+            if "error" in r:
+                print(f"  {name:<28}{'failed':>12}  {r['error']}")
+                continue
+            print(f"  {name:<28}{r['median_ms']:>12.0f}{r['median_ms'] - base:>16.0f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved: {args.out}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Cascade inference: the BiLSTM on every window, DeBERTa only when it's unsure.
+
+ASLClassifier (train_model.py, asl_model.onnx) is a few hundred K parameters
+over hand landmarks only; the DeBERTa export is several times the cost per
+window. CascadeRecognizer runs the small model on every window in one batch
+and escalates the windows whose top-1 / top-2 softmax margin is below the
+threshold to DeBERTa — batched by length through asl_deberta_batched.onnx
+when it exists:
+
+    cascade = CascadeRecognizer()                  # threshold from cascade.json
+    results = cascade([clip1, clip2, ...])         # holistic [T, 543, 3] each
+    results[0]  # {"word", "confidence", "margin", "model": "bilstm" | "deberta"}
+
+The threshold comes from a validation sweep (main): both models run once over
+held-out Kaggle clips (participants the BiLSTM never trained on when the
+participant shards exist), every threshold is scored on accuracy and mean cost
+per window (small model + escalation rate x DeBERTa, both per window at full
+batches), and the cheapest threshold within --max-drop of DeBERTa-only accuracy
+is saved to models/saved_model/cascade.json.
+
+Usage:
+    python cascade.py [--files 1000] [--max-drop 0.005] [--no-holdout]
+    python cli.py cascade ...
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from asl_inference import ASLRecognizer, LABEL_MAP_PATH, MODEL_PATH, load_labels, softmax
+from landmark_config import KEPT_LANDMARKS
+from metrics import REGISTRY
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
+SMALL_MODEL_PATH = MODEL_DIR / "asl_model.onnx"
+BATCHED_MODEL_PATH = MODEL_PATH.with_name("asl_deberta_batched.onnx")
+CASCADE_PATH = MODEL_DIR / "cascade.json"
+
+HAND_ROWS = np.array(KEPT_LANDMARKS[0] + KEPT_LANDMARKS[1])   # left then right, as collect_landmarks
+SMALL_SEQ_LEN = 32              # train_model.SEQ_LEN (not imported: train_model pulls in torch)
+THRESHOLDS = (0.0, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.01)
+DEFAULT_THRESHOLD = 0.3         # used until a sweep writes cascade.json
+MAX_DROP = 0.005                # accuracy the cascade may give up against DeBERTa alone
+MAX_BATCH = 32
+
+
+def small_input(holistic: np.ndarray, seq_len: int = SMALL_SEQ_LEN) -> np.ndarray:
+    """holistic [T, 543, 3] -> [seq_len, 126] hand features, like collect_landmarks + pad_or_truncate."""
+    from collect_landmarks import pad_or_truncate
+
+    hands = np.nan_to_num(np.asarray(holistic, dtype=np.float32)[:, HAND_ROWS], nan=0.0)
+    return pad_or_truncate(hands.reshape(len(hands), -1), seq_len)
+
+
+def margin(probs: np.ndarray) -> np.ndarray:
+    """Top-1 minus top-2 probability along the last axis."""
+    top2 = np.partition(probs, -2, axis=-1)[..., -2:]
+    return top2[..., 1] - top2[..., 0]
+
+
+def load_threshold(path: Path = CASCADE_PATH) -> float | None:
+    if not Path(path).exists():
+        return None
+    with open(path) as f:
+        return float(json.load(f)["threshold"])
+
+
+class CascadeRecognizer:
+    """BiLSTM session for every window + an ASLRecognizer for the escalated ones."""
+
+    def __init__(self, small_path: Path = SMALL_MODEL_PATH, large_path: Path | None = None,
+                 threshold: float | None = None, max_batch: int = MAX_BATCH,
+                 small_label_map: Path | None = None, metrics=REGISTRY, **recognizer_kwargs):
+        from ort_tune import create_session
+
+        if large_path is None:
+            large_path = BATCHED_MODEL_PATH if BATCHED_MODEL_PATH.exists() else MODEL_PATH
+        self.small = create_session(Path(small_path), recognizer_kwargs.get("session_options"))
+        self.small_name = self.small.get_inputs()[0].name
+        self.small_seq_len = self.small.get_inputs()[0].shape[1]
+        # train_model.py copies the BiLSTM's label map next to its weights
+        if small_label_map is None:
+            small_label_map = Path(small_path).with_name("label_map.json")
+            if not small_label_map.exists():
+                small_label_map = LABEL_MAP_PATH
+        self.small_labels = load_labels(small_label_map)
+
+        self.large = ASLRecognizer(large_path, metrics=metrics, **recognizer_kwargs)
+        if self.large.fused:
+            raise ValueError(f"{Path(large_path).name} is a fused model; the cascade needs [L, 5, 100] input")
+        self.batched = len(self.large.session.get_inputs()[0].shape) == 4
+        self.max_batch = max_batch
+        if threshold is None:
+            threshold = load_threshold()
+        self.threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        self.metrics = metrics
+        self.windows = 0
+        self.escalated = 0
+
+    def small_logits(self, holistics: list) -> np.ndarray:
+        """[N, small classes] for the BiLSTM, in batches of max_batch."""
+        x = np.stack([small_input(h, self.small_seq_len) for h in holistics])
+        out = []
+        for start in range(0, len(x), self.max_batch):
+            with self.metrics.time("infer_small"):
+                out.append(self.small.run(None, {self.small_name: x[start:start + self.max_batch]})[0])
+        return np.concatenate(out)
+
+    def large_logits(self, holistics: list) -> np.ndarray:
+        """[N, NUM_CLASSES] for DeBERTa; windows of equal length share a batch."""
+        rec = self.large
+        windows = []
+        for h in holistics:
+            with self.metrics.time("assemble"):
+                frames = rec.assembler(h[-rec.seq_len:])
+            windows.append(rec.normalize(frames))
+        logits = [None] * len(windows)
+        by_len: dict[int, list[int]] = {}
+        for i, w in enumerate(windows):
+            by_len.setdefault(len(w), []).append(i)
+
+        batch_size = self.max_batch if self.batched else 1
+        for idx in by_len.values():
+            for start in range(0, len(idx), batch_size):
+                chunk = idx[start:start + batch_size]
+                batch = np.stack([windows[i] for i in chunk])
+                with self.metrics.time("infer"):
+                    out = rec.session.run(None, {rec.input_name: batch if self.batched else batch[0]})[0]
+                if self.batched:
+                    self.metrics.batch_fill.observe(len(chunk) / batch_size)
+                for i, row in zip(chunk, out):
+                    logits[i] = row
+        return np.stack(logits)
+
+    def __call__(self, holistics: list, threshold: float | None = None) -> list[dict]:
+        """Holistic clips [T, 543, 3] -> [{word, confidence, margin, model}] in input order."""
+        if not len(holistics):
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        probs = softmax(self.small_logits(holistics))
+        margins = margin(probs)
+        results = [{"word": self.small_labels[int(p.argmax())], "confidence": float(p.max()),
+                    "margin": float(m), "model": "bilstm"} for p, m in zip(probs, margins)]
+
+        escalate = np.flatnonzero(margins < threshold)
+        if len(escalate):
+            large = softmax(self.large_logits([holistics[i] for i in escalate]))
+            for i, p in zip(escalate, large):
+                results[i] = {"word": self.large.labels[int(p.argmax())], "confidence": float(p.max()),
+                              "margin": float(margin(p)), "model": "deberta"}
+        self.windows += len(holistics)
+        self.escalated += len(escalate)
+        return results
+
+    def classify_holistic(self, holistic: np.ndarray) -> dict:
+        return self([holistic])[0]
+
+    def stats(self) -> dict:
+        return {"windows": self.windows, "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.windows if self.windows else 0.0,
+                "threshold": self.threshold}
+
+
+# ---------------------------------------------------------------------------
+# Calibration
+# ---------------------------------------------------------------------------
+
+def load_validation(max_files: int | None = 1000, seed: int = 0, holdout: bool = True):
+    """
+    Kaggle clips as holistic [T, 543, 3] arrays + sign names. With `holdout`
+    and participant shards present, only the participants train_model.py held
+    out of BiLSTM training (same split and seed).
+    """
+    import pandas as pd
+
+    from collect_landmarks import DATA_DIR, MAX_SAMPLES_PER_SIGN, TRAIN_CSV, load_parquet_holistic
+    from landmark_dataset import INDEX_NAME, SHARD_DIR, ShardedLandmarks
+
+    df = pd.read_csv(TRAIN_CSV)
+    if holdout and (SHARD_DIR / INDEX_NAME).exists():
+        dataset = ShardedLandmarks(SHARD_DIR, SMALL_SEQ_LEN, max_per_sign=MAX_SAMPLES_PER_SIGN)
+        _, test_ds = dataset.split_by_participant(holdout_frac=0.15, seed=42)
+        df = df[df["participant_id"].isin(test_ds.participants)]
+        print(f"Held-out participants: {test_ds.participants.tolist()}")
+    elif holdout:
+        print("No participant shards found — validating on a random sample (may overlap BiLSTM training)")
+    if max_files and len(df) > max_files:
+        df = df.sample(max_files, random_state=seed)
+    clips = [load_parquet_holistic(DATA_DIR / path) for path in df["path"]]
+    return clips, df["sign"].to_numpy()
+
+
+def _per_window_ms(fn, holistics: list, repeats: int = 3) -> float:
+    fn(holistics[:MAX_BATCH])   # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(holistics)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / len(holistics)
+
+
+def calibrate(cascade: CascadeRecognizer, holistics: list, signs: np.ndarray,
+              thresholds=THRESHOLDS, max_drop: float = MAX_DROP) -> dict:
+    """
+    Run both models once over the validation clips, then score every threshold:
+    accuracy, agreement with DeBERTa alone, escalation rate and mean cost per
+    window. Picks the cheapest threshold within max_drop of DeBERTa's accuracy.
+    """
+    small_probs = softmax(cascade.small_logits(holistics))
+    large_logits = cascade.large_logits(holistics)
+    small_words = np.array([cascade.small_labels[i] for i in small_probs.argmax(1)])
+    large_words = np.array([cascade.large.labels[i] for i in large_logits.argmax(1)])
+    margins = margin(small_probs)
+
+    small_ms = _per_window_ms(cascade.small_logits, holistics)
+    large_ms = _per_window_ms(cascade.large_logits, holistics)
+    large_acc = float((large_words == signs).mean())
+
+    rows = []
+    for threshold in thresholds:
+        escalate = margins < threshold
+        words = np.where(escalate, large_words, small_words)
+        rate = float(escalate.mean())
+        cost = small_ms + rate * large_ms
+        rows.append({
+            "threshold": threshold,
+            "accuracy": float((words == signs).mean()),
+            "agreement_with_large": float((words == large_words).mean()),
+            "escalation_rate": rate,
+            "ms_per_window": cost,
+            "speedup": large_ms / cost,
+        })
+    eligible = [r for r in rows if r["accuracy"] >= large_acc - max_drop] or [rows[-1]]
+    best = min(eligible, key=lambda r: r["ms_per_window"])
+    return {
+        "threshold": best["threshold"],
+        "max_drop": max_drop,
+        "windows": len(holistics),
+        "small_accuracy": float((small_words == signs).mean()),
+        "large_accuracy": large_acc,
+        "small_ms_per_window": small_ms,
+        "large_ms_per_window": large_ms,
+        "curve": rows,
+    }
+
+
+def print_curve(report: dict):
+    print(f"\n  BiLSTM only   acc {report['small_accuracy']:.3f}   {report['small_ms_per_window']:.3f} ms/window")
+    print(f"  DeBERTa only  acc {report['large_accuracy']:.3f}   {report['large_ms_per_window']:.3f} ms/window")
+    print(f"\n{'margin <':>9}  {'acc':>6}  {'agree':>6}  {'escalated':>9}  {'ms/window':>9}  speedup")
+    for r in report["curve"]:
+        mark = "  <-" if r["threshold"] == report["threshold"] else ""
+        print(f"{r['threshold']:>9g}  {r['accuracy']:6.3f}  {r['agreement_with_large']:6.3f}  "
+              f"{r['escalation_rate']:9.1%}  {r['ms_per_window']:9.3f}  {r['speedup']:5.2f}x{mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000, help="validation clips (0 = all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-holdout", action="store_true",
+                        help="sample all participants, not just those held out of BiLSTM training")
+    parser.add_argument("--thresholds", default=",".join(f"{t:g}" for t in THRESHOLDS))
+    parser.add_argument("--max-drop", type=float, default=MAX_DROP,
+                        help="accuracy the cascade may lose against DeBERTa alone")
+    parser.add_argument("--small", type=Path, default=SMALL_MODEL_PATH)
+    parser.add_argument("--large", type=Path, default=None, help="default: batched export if present")
+    parser.add_argument("--output", type=Path, default=CASCADE_PATH)
+    args = parser.parse_args(argv)
+
+    for path in (args.small, args.large):
+        if path is not None and not path.exists():
+            print(f"Model not found: {path}")
+            return 1
+
+    cascade = CascadeRecognizer(args.small, args.large)
+    print(f"Cascade: {args.small.name} -> {cascade.large.model_path.name}"
+          f"{' (batched)' if cascade.batched else ''}")
+    print("Loading validation clips...")
+    clips, signs = load_validation(args.files or None, args.seed, holdout=not args.no_holdout)
+    if not clips:
+        print("No validation clips")
+        return 1
+    print(f"Clips: {len(clips)}")
+
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    report = calibrate(cascade, clips, signs, thresholds, args.max_drop)
+    print_curve(report)
+    chosen = next(r for r in report["curve"] if r["threshold"] == report["threshold"])
+    print(f"\nThreshold {report['threshold']:g}: accuracy {chosen['accuracy']:.3f} "
+          f"(DeBERTa {report['large_accuracy']:.3f}), {chosen['escalation_rate']:.1%} escalated, "
+          f"{chosen['speedup']:.2f}x DeBERTa-only throughput")
+
+    report.update(created=time.strftime("%Y-%m-%dT%H:%M:%S"), small=args.small.name,
+                  large=cascade.large.model_path.name)
+    tmp = args.output.with_suffix(".tmp")
+    tmp.write_text(json.dumps(report, indent=2))
+    os.replace(tmp, args.output)
+    print(f"Saved: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,217 @@
+"""
+Single entry point for the ml pipeline.
+
+Usage:
+    python scripts/cli.py <command> [options]     (or: python scripts <command>)
+
+Commands:
+    collect   Kaggle parquet landmarks -> data/processed      (collect_landmarks.py)
+    train     train the BiLSTM classifier                      (train_model.py)
+    sweep     parallel hyperparameter sweep + leaderboard      (sweep.py)
+    export    export DeBERTa weights to ONNX                   (export_deberta_onnx.py)
+    deploy    ship model + label map + mapping to the client   (convert_to_tfjs.py)
+    package   embed or shard an ONNX model                     (embed_onnx.py)
+    tune      autotune ORT SessionOptions -> <model>.ort.json  (ort_tune.py)
+    early-exit distill exit heads + staged early-exit export   (early_exit.py)
+    index     embedding prototype index: build / add / eval    (sign_index.py)
+    replay    record / replay landmark sessions, stage latency (session_replay.py)
+    profile   per-operator ORT profile by PyTorch module       (ort_profile.py)
+    cascade   BiLSTM -> DeBERTa cascade threshold sweep        (cascade.py)
+    serve     local recognizer for the server's LLM fallback   (recognize_service.py)
+    registry  per-language model registry: list / load         (model_registry.py)
+    mapping   compile landmark_config.py                       (landmark_mapping.py)
+    bench     run a benchmark: python scripts/cli.py bench --list
+
+Argument parsing lives here and every command imports its module only when it
+runs, so --help, typos and dry runs never pay for torch / pandas / onnx imports.
+"""
+
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+PROCESSED_DIR = PROJECT_DIR / "data" / "processed"
+
+# Commands that hand their whole argv to a module's main(argv); dispatched before
+# parsing so leading options (`sweep --hidden 64`) aren't eaten by argparse.
+PASSTHROUGH = {
+    "package": "embed_onnx:main",
+    "sweep": "sweep:main",
+    "tune": "ort_tune:main",
+    "early-exit": "early_exit:main",
+    "index": "sign_index:main",
+    "replay": "session_replay:main",
+    "profile": "ort_profile:main",
+    "cascade": "cascade:main",
+    "serve": "recognize_service:main",
+    "registry": "model_registry:main",
+}
+
+# bench targets: name -> ("module:function(argv)", help). Functions take an argv list.
+BENCH_TARGETS = {
+    "export": ("bench_export:main", "parity + latency of every exported ONNX artifact"),
+    "startup": ("bench_startup:main", "CLI / script import-time startup cost"),
+    "shards": ("embed_onnx:bench_main", "sharded vs monolithic time-to-first-inference"),
+    "parquet": ("collect_landmarks:bench_main", "full pandas vs projected pyarrow landmark reads"),
+    "augment": ("landmark_augment:bench_main", "training step overhead of batched augmentation"),
+    "stream": ("lstm_stream:bench_main", "per-frame latency, windowed vs stateful streaming LSTM"),
+    "cache": ("window_cache:bench_main", "window cache hit rate / CPU saved / agreement per tolerance"),
+    "ipc": ("ipc_worker:bench_main", "Unix socket + shared-memory ring vs loopback HTTP+JSON transport"),
+    "load": ("load_test:main", "multi-room latency / dropped windows / CPU against a local service"),
+    "segment": ("segmenter:bench_main", "continuous-stream segmentation + batched classification throughput"),
+    "adaptive": ("adaptive_length:bench_main", "prefix-length early stopping vs fixed 25-frame windows"),
+    "registry": ("model_registry:bench_main", "lazy loading / LRU eviction under a RAM budget, shared thread pools"),
+}
+
+
+def _load(target: str):
+    module, func = target.split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def _collect(args):
+    from collect_landmarks import process_dataset
+
+    process_dataset(rebuild=args.rebuild, export_npy=args.npy)
+
+
+def _train(args):
+    if args.dry_run:
+        import numpy as np
+
+        from landmark_dataset import INDEX_NAME, SHARD_DIR, read_index
+
+        index = read_index(SHARD_DIR)
+        if index is not None:
+            participants = len(set(index["participant_id"].to_pylist()))
+            print(f"Dry run: would train on {index.num_rows} sequences from {participants} "
+                  f"participants ({len(set(index['label'].to_pylist()))} classes), "
+                  f"{args.split} split — {SHARD_DIR / INDEX_NAME}")
+            return
+        for name in ["sequences.npy", "labels.npy", "label_map.json"]:
+            path = PROCESSED_DIR / name
+            if not path.exists():
+                print(f"Missing {path} — run `collect` first")
+                sys.exit(1)
+        X = np.load(PROCESSED_DIR / "sequences.npy", mmap_mode="r")
+        y = np.load(PROCESSED_DIR / "labels.npy", mmap_mode="r")
+        print(f"Dry run: would train on {X.shape[0]} samples of shape {X.shape[1:]} "
+              f"({len(np.unique(y))} classes)")
+        return
+    from train_model import train
+
+    train(split=args.split, augment=not args.no_augment, streaming=args.streaming)
+
+
+def _export(args):
+    weights = Path(args.weights)
+    if args.dry_run:
+        if not weights.exists():
+            print(f"Weights not found: {weights}")
+            sys.exit(1)
+        from landmark_mapping import build_mapping
+
+        out = PROJECT_DIR / "models" / "saved_model" / "asl_deberta.onnx"
+        print(f"Dry run: would export {weights} ({weights.stat().st_size / 1e6:.1f} MB) -> {out} "
+              f"with landmark mapping {build_mapping()['version']}")
+        return
+    from export_deberta_onnx import main
+
+    main(str(weights), fused=args.fused, embedding=args.embedding, batched=args.batched)
+
+
+def _deploy(args):
+    from convert_to_tfjs import convert
+
+    convert(force=args.force, dry_run=args.dry_run)
+
+
+def _mapping(args):
+    from landmark_mapping import MAPPING_PATH, compile_mapping
+
+    mapping = compile_mapping()
+    print(f"Compiled landmark mapping {mapping['version']} -> {MAPPING_PATH}")
+
+
+def _bench(args):
+    if args.list or not args.target:
+        for name, (_, help_text) in BENCH_TARGETS.items():
+            print(f"  {name:<10} {help_text}")
+        return
+    if args.target not in BENCH_TARGETS:
+        print(f"Unknown bench target '{args.target}'. Choose from: {', '.join(BENCH_TARGETS)}")
+        sys.exit(2)
+    _load(BENCH_TARGETS[args.target][0])(args.argv)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True, metavar="<command>")
+
+    p = sub.add_parser("collect", help="process Kaggle parquet files into participant shards")
+    p.add_argument("--rebuild", action="store_true", help="rewrite existing participant shards")
+    p.add_argument("--npy", action="store_true", help="also write legacy sequences.npy / labels.npy")
+    p.set_defaults(func=_collect)
+
+    p = sub.add_parser("train", help="train the BiLSTM classifier")
+    p.add_argument("--split", choices=["participant", "random"], default="participant",
+                   help="hold out whole participants (default) or a stratified random 15%%")
+    p.add_argument("--no-augment", action="store_true", help="disable batched landmark augmentation")
+    p.add_argument("--streaming", action="store_true",
+                   help="unidirectional LSTM + stateful single-step ONNX (lstm_stream.py)")
+    p.add_argument("--dry-run", action="store_true", help="check inputs and print the plan only")
+    p.set_defaults(func=_train)
+
+    sub.add_parser("sweep", help="parallel BiLSTM hyperparameter sweep (args passed to sweep.py)")
+
+    p = sub.add_parser("export", help="export DeBERTa weights to ONNX")
+    p.add_argument("weights", help="TheoViel .pt checkpoint")
+    p.add_argument("--fused", action="store_true",
+                   help="also export asl_deberta_fused.onnx (raw holistic landmarks in)")
+    p.add_argument("--embedding", action="store_true",
+                   help="also export asl_deberta_embedding.onnx (pooled features, for sign_index.py)")
+    p.add_argument("--batched", action="store_true",
+                   help="also export asl_deberta_batched.onnx ([batch, seq, 5, 100] input)")
+    p.add_argument("--dry-run", action="store_true", help="check inputs and print the plan only")
+    p.set_defaults(func=_export)
+
+    p = sub.add_parser("deploy", help="deploy model + label map to client/public/models")
+    p.add_argument("--force", action="store_true", help="regenerate labelMap.ts unconditionally")
+    p.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    p.set_defaults(func=_deploy)
+
+    sub.add_parser("package", help="embed or shard an ONNX model (args passed to embed_onnx.py)")
+    sub.add_parser("tune", help="autotune ONNX Runtime session options (args passed to ort_tune.py)")
+    sub.add_parser("early-exit", help="early-exit heads, staged export and curve (args passed to early_exit.py)")
+    sub.add_parser("index", help="open-vocabulary sign prototype index (args passed to sign_index.py)")
+    sub.add_parser("replay", help="session recording + latency regression replay (args passed to session_replay.py)")
+    sub.add_parser("profile", help="per-operator ORT profile mapped to PyTorch modules (args passed to ort_profile.py)")
+    sub.add_parser("cascade", help="BiLSTM -> DeBERTa cascade threshold sweep (args passed to cascade.py)")
+    sub.add_parser("serve", help="local recognizer tried before the LLM (args passed to recognize_service.py)")
+    sub.add_parser("registry", help="per-language / per-vocabulary model registry (args passed to model_registry.py)")
+
+    p = sub.add_parser("mapping", help="compile the landmark mapping artifact")
+    p.set_defaults(func=_mapping)
+
+    p = sub.add_parser("bench", help="run a benchmark target (args passed through)")
+    p.add_argument("--list", action="store_true", help="list bench targets")
+    p.add_argument("target", nargs="?", help=", ".join(BENCH_TARGETS))
+    p.add_argument("argv", nargs=argparse.REMAINDER)
+    p.set_defaults(func=_bench)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in PASSTHROUGH:
+        return _load(PASSTHROUGH[argv[0]])(argv[1:])
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
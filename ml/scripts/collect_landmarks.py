@@ -8,9 +8,15 @@ Input:
   data/asl-signs/sign_to_prediction_index_map.json
 
 Output:
+  data/processed/shards/participant=<id>.arrow  — raw (num_frames, 126) hand frames
+  data/processed/shards/index.arrow             — sign, label, participant, length, offset
+  data/processed/shards/label_map.json          — { "0": "hello", ... }
+  with --npy, also the legacy fixed-length arrays:
   data/processed/sequences.npy    — shape (N, SEQ_LEN, NUM_FEATURES)
   data/processed/labels.npy       — shape (N,) integer class indices
-  data/processed/label_map.json   — { "hello": 0, "book": 1, ... }
+
+Usage:
+  python collect_landmarks.py [--rebuild] [--npy]
 """
 
 import json
@@ -18,7 +24,6 @@ import sys
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -42,45 +47,135 @@ SEQ_LEN = 32
 MAX_SAMPLES_PER_SIGN = 500
 
 
+# Only these columns are decoded; the row filter on `type` is pushed down to the
+# parquet reader so face/pose rows (~92% of each file) are never materialized.
+HAND_COLUMNS = ["frame", "type", "landmark_index", "x", "y", "z"]
+
+# Files per pyarrow.dataset scan in process_dataset, and rows per record batch
+SCAN_CHUNK_FILES = 256
+SCAN_BATCH_ROWS = 1 << 16
+
+
+def _hand_filter():
+    import pyarrow.dataset as ds
+
+    return ds.field("type").isin(sorted(HAND_LANDMARK_TYPES))
+
+
+def hand_table_to_sequence(table) -> np.ndarray | None:
+    """
+    Scatter a hand-only (frame, type, landmark_index, x, y, z) arrow table into
+    shape (num_frames, 126) in one vectorized pass. None if < 3 frames.
+    """
+    import pyarrow.compute as pc
+
+    if table.num_rows == 0:
+        return None
+    frame = table.column("frame").to_numpy()
+    frames, frame_pos = np.unique(frame, return_inverse=True)
+    if len(frames) < 3:
+        return None
+
+    is_right = pc.equal(table.column("type"), "right_hand").to_numpy(zero_copy_only=False)
+    lm_idx = table.column("landmark_index").to_numpy().astype(np.intp)
+    # left_hand landmarks go to indices 0-62, right_hand to 63-125
+    base = np.where(is_right, LANDMARKS_PER_HAND * 3, 0) + lm_idx * 3
+    keep = base + 2 < FEATURES_PER_FRAME
+
+    sequence = np.zeros((len(frames), FEATURES_PER_FRAME), dtype=np.float32)
+    rows, base = frame_pos[keep], base[keep]
+    for c, name in enumerate(("x", "y", "z")):
+        values = table.column(name).to_numpy(zero_copy_only=False)[keep]
+        sequence[rows, base + c] = np.nan_to_num(values, nan=0.0)
+    return sequence
+
+
 def load_parquet_hand_landmarks(parquet_path: Path) -> np.ndarray | None:
     """
     Load a single parquet file and extract hand landmark sequences.
     Returns shape (num_frames, 126) or None if no hand data.
     """
+    import pyarrow.parquet as pq
+
     try:
-        df = pd.read_parquet(parquet_path)
+        table = pq.read_table(parquet_path, columns=HAND_COLUMNS, filters=_hand_filter())
     except Exception:
         return None
+    return hand_table_to_sequence(table)
 
-    # Filter to hand landmarks only
-    hand_df = df[df["type"].isin(HAND_LANDMARK_TYPES)]
-    if hand_df.empty:
-        return None
 
-    frames = sorted(hand_df["frame"].unique())
-    num_frames = len(frames)
-    if num_frames < 3:
-        return None
+def load_parquet_holistic(parquet_path: Path) -> np.ndarray:
+    """
+    All landmarks of a parquet file as [num_frames, 543, 3] (NaN = not detected),
+    the layout asl_inference / the DeBERTa model expect. Relies on the Kaggle
+    files listing every frame's 543 rows in holistic order.
+    """
+    import pyarrow.parquet as pq
 
-    sequence = np.zeros((num_frames, FEATURES_PER_FRAME), dtype=np.float32)
+    from landmark_config import N_HOLISTIC
 
-    for i, frame_num in enumerate(frames):
-        frame_data = hand_df[hand_df["frame"] == frame_num]
+    table = pq.read_table(parquet_path, columns=["x", "y", "z"])
+    xyz = np.stack([table.column(c).to_numpy(zero_copy_only=False) for c in ("x", "y", "z")], axis=-1)
+    return xyz.astype(np.float32, copy=False).reshape(-1, N_HOLISTIC, 3)
 
-        for _, row in frame_data.iterrows():
-            lm_type = row["type"]
-            lm_idx = int(row["landmark_index"])
 
-            # left_hand landmarks go to indices 0-62, right_hand to 63-125
-            offset = 0 if lm_type == "left_hand" else LANDMARKS_PER_HAND * 3
-            base = offset + lm_idx * 3
+def iter_hand_sequences(parquet_paths: list[Path], batch_size: int = SCAN_BATCH_ROWS,
+                        _validated: bool = False):
+    """
+    Scan many parquet files as one pyarrow dataset (threaded readahead, column
+    projection, pushed-down row filter) and yield (path, sequence | None) per file,
+    in input order. Files that fail to open yield None.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
 
-            if base + 2 < FEATURES_PER_FRAME:
-                sequence[i, base] = row["x"] if not np.isnan(row["x"]) else 0.0
-                sequence[i, base + 1] = row["y"] if not np.isnan(row["y"]) else 0.0
-                sequence[i, base + 2] = row["z"] if not np.isnan(row["z"]) else 0.0
+    order = [Path(p).resolve().as_posix() for p in parquet_paths]
+    pending: dict[str, list] = {}
+    next_i = 0
 
-    return sequence
+    def finished(i):
+        batches = pending.pop(order[i], [])
+        table = pa.Table.from_batches(batches) if batches else None
+        return parquet_paths[i], hand_table_to_sequence(table) if table is not None else None
+
+    try:
+        dataset = ds.dataset(order, format="parquet")
+        scanner = dataset.scanner(columns=HAND_COLUMNS, filter=_hand_filter(), batch_size=batch_size)
+        for item in scanner.scan_batches():
+            pending.setdefault(item.fragment.path, []).append(item.record_batch)
+            # Emit every file before the one currently streaming; a file is complete
+            # once a later fragment starts (scan order follows the input order).
+            while next_i < len(order) and order[next_i] != item.fragment.path:
+                yield finished(next_i)
+                next_i += 1
+    except Exception:
+        # A corrupt file aborts the scan where it is reached (opening the dataset
+        # or mid-iteration). Files already yielded are complete; the rest are
+        # rescanned without the files whose footer doesn't read, or read one by one
+        # if the rescan fails too.
+        rest = parquet_paths[next_i:]
+        if _validated:
+            for p in rest:
+                yield p, load_parquet_hand_landmarks(p)
+            return
+        readable = [_parquet_readable(p) for p in rest]
+        good = iter_hand_sequences([p for p, ok in zip(rest, readable) if ok], batch_size, _validated=True)
+        for p, ok in zip(rest, readable):
+            yield next(good) if ok else (p, None)
+        return
+    while next_i < len(order):
+        yield finished(next_i)
+        next_i += 1
+
+
+def _parquet_readable(parquet_path: Path) -> bool:
+    import pyarrow.parquet as pq
+
+    try:
+        pq.read_metadata(parquet_path)
+    except Exception:
+        return False
+    return True
 
 
 def pad_or_truncate(sequence: np.ndarray, target_len: int) -> np.ndarray:
@@ -97,7 +192,22 @@ def pad_or_truncate(sequence: np.ndarray, target_len: int) -> np.ndarray:
     return np.vstack([sequence, pad])
 
 
-def process_dataset():
+def process_dataset(rebuild: bool = False, export_npy: bool = False):
+    """
+    Write one Arrow IPC shard per participant plus the index under
+    data/processed/shards (see landmark_dataset.py). Participants that already
+    have a shard are skipped, so new participants are appended without touching
+    existing shards; `rebuild` rewrites everything. Per-sign balancing happens
+    when the dataset is read. `export_npy` also writes the legacy fixed-length
+    sequences.npy / labels.npy.
+    """
+    import pandas as pd
+
+    from landmark_dataset import (
+        SHARD_DIR, ShardedLandmarks, existing_participants, save_label_map,
+        write_index, write_participant_shard,
+    )
+
     if not TRAIN_CSV.exists():
         print(f"train.csv not found at {TRAIN_CSV}")
         print("Download the dataset first:")
@@ -115,71 +225,122 @@ def process_dataset():
     num_classes = len(sign_map)
     print(f"Number of signs/words: {num_classes}")
 
-    # Count per sign for balancing
-    sign_counts: dict[str, int] = {}
+    done = set() if rebuild else existing_participants(SHARD_DIR)
+    if done:
+        print(f"Keeping {len(done)} existing participant shards")
 
-    all_sequences = []
-    all_labels = []
+    new_rows = []
+    written: set[int] = set()
     skipped = 0
+    processed = 0
 
-    for idx, row in train_df.iterrows():
-        sign = row["sign"]
-        if sign not in sign_map:
-            skipped += 1
-            continue
-
-        # Balance: limit samples per sign
-        sign_counts[sign] = sign_counts.get(sign, 0)
-        if sign_counts[sign] >= MAX_SAMPLES_PER_SIGN:
-            continue
-
-        # Build parquet path
-        parquet_path = LANDMARK_DIR / str(row["participant_id"]) / f"{row['sequence_id']}.parquet"
-        if not parquet_path.exists():
-            skipped += 1
-            continue
-
-        sequence = load_parquet_hand_landmarks(parquet_path)
-        if sequence is None:
-            skipped += 1
+    for participant_id, group in train_df.groupby("participant_id", sort=True):
+        participant_id = int(participant_id)
+        if participant_id in done:
             continue
 
-        # Normalize to fixed length
-        sequence = pad_or_truncate(sequence, SEQ_LEN)
-
-        all_sequences.append(sequence)
-        all_labels.append(sign_map[sign])
-        sign_counts[sign] += 1
-
-        if (idx + 1) % 2000 == 0:
-            print(f"  Processed {idx + 1}/{len(train_df)} "
-                  f"({len(all_sequences)} kept, {skipped} skipped)")
-
-    # Convert to arrays
-    X = np.array(all_sequences, dtype=np.float32)  # (N, SEQ_LEN, 126)
-    y = np.array(all_labels, dtype=np.int32)        # (N,)
-
-    print(f"\nFinal dataset: {X.shape[0]} samples")
-    print(f"  Sequence shape: {X.shape}")
-    print(f"  Labels shape: {y.shape}")
+        entries = []
+        for sequence_id, sign in group[["sequence_id", "sign"]].itertuples(index=False):
+            parquet_path = LANDMARK_DIR / str(participant_id) / f"{sequence_id}.parquet"
+            if sign not in sign_map or not parquet_path.exists():
+                skipped += 1
+                continue
+            entries.append((parquet_path, int(sequence_id), sign))
+
+        # Files are read SCAN_CHUNK_FILES at a time as one dataset scan
+        sequences = []
+        for start in range(0, len(entries), SCAN_CHUNK_FILES):
+            chunk = entries[start:start + SCAN_CHUNK_FILES]
+            for (_, sequence_id, sign), (_, sequence) in zip(
+                    chunk, iter_hand_sequences([p for p, _, _ in chunk])):
+                processed += 1
+                if sequence is None:
+                    skipped += 1
+                    continue
+                sequences.append((sequence_id, sign, sign_map[sign], sequence))
+
+        new_rows += write_participant_shard(SHARD_DIR, participant_id, sequences)
+        written.add(participant_id)
+        print(f"  Participant {participant_id}: {len(sequences)} sequences "
+              f"({processed} files read, {skipped} skipped so far)")
+
+    index = write_index(SHARD_DIR, new_rows, written)
+    save_label_map(SHARD_DIR, sign_map)
+
+    print(f"\nDataset: {index.num_rows} sequences from "
+          f"{len(set(index['participant_id'].to_pylist()))} participants "
+          f"({len(written)} shards written)")
     print(f"  Skipped: {skipped}")
-    print(f"  Signs with data: {len(sign_counts)}/{num_classes}")
-
-    # Save
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    np.save(OUTPUT_DIR / "sequences.npy", X)
-    np.save(OUTPUT_DIR / "labels.npy", y)
-
-    # Save label map (index -> word) for the client
-    index_to_sign = {v: k for k, v in sign_map.items()}
-    with open(OUTPUT_DIR / "label_map.json", "w") as f:
-        json.dump(index_to_sign, f, indent=2)
+    print(f"  Signs with data: {len(set(index['sign'].to_pylist()))}/{num_classes}")
+    print(f"\nSaved to {SHARD_DIR}/")
+
+    if export_npy:
+        dataset = ShardedLandmarks(SHARD_DIR, SEQ_LEN, max_per_sign=MAX_SAMPLES_PER_SIGN)
+        X = np.zeros((len(dataset), SEQ_LEN, FEATURES_PER_FRAME), dtype=np.float32)
+        for i in range(len(dataset)):
+            X[i] = dataset[i][0]
+        y = dataset.labels.astype(np.int32)
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        np.save(OUTPUT_DIR / "sequences.npy", X)
+        np.save(OUTPUT_DIR / "labels.npy", y)
+        save_label_map(OUTPUT_DIR, sign_map)
+        print(f"  sequences.npy: {X.shape}, {X.nbytes / 1024 / 1024:.1f} MB")
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench parquet`: compare the old full pd.read_parquet + pandas filter
+    against projected/filtered pyarrow reads and one dataset scan, over the
+    train_landmark_files tree.
+    """
+    import argparse
+    import time
+
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    parser = argparse.ArgumentParser(prog="bench parquet")
+    parser.add_argument("--dir", type=Path, default=LANDMARK_DIR)
+    parser.add_argument("--limit", type=int, default=0, help="max files (0 = all)")
+    args = parser.parse_args(argv)
+
+    paths = sorted(args.dir.rglob("*.parquet"))
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print(f"No parquet files under {args.dir}")
+        sys.exit(1)
 
-    print(f"\nSaved to {OUTPUT_DIR}/")
-    print(f"  sequences.npy: {X.nbytes / 1024 / 1024:.1f} MB")
-    print(f"  labels.npy")
-    print(f"  label_map.json")
+    def full_pandas(p):
+        df = pd.read_parquet(p)
+        decoded = int(df.memory_usage(deep=True).sum())
+        df[df["type"].isin(HAND_LANDMARK_TYPES)]
+        return decoded
+
+    def projected(p):
+        table = pq.read_table(p, columns=HAND_COLUMNS, filters=_hand_filter())
+        hand_table_to_sequence(table)
+        return table.nbytes
+
+    results = {}
+    for name, fn in [("pandas full read", full_pandas), ("pyarrow projected", projected)]:
+        t0 = time.perf_counter()
+        decoded = sum(fn(p) for p in paths)
+        results[name] = (time.perf_counter() - t0, decoded)
+
+    t0 = time.perf_counter()
+    n = sum(1 for _ in iter_hand_sequences(paths))
+    assert n == len(paths)
+    results["pyarrow dataset scan"] = (time.perf_counter() - t0, results["pyarrow projected"][1])
+
+    on_disk = sum(p.stat().st_size for p in paths)
+    print(f"{len(paths)} files, {on_disk / 1e6:.1f} MB on disk\n")
+    print(f"  {'reader':<24}{'seconds':>10}{'files/s':>10}{'decoded MB':>12}{'KB/file':>10}")
+    for name, (secs, decoded) in results.items():
+        print(f"  {name:<24}{secs:>10.2f}{len(paths) / secs:>10.0f}"
+              f"{decoded / 1e6:>12.1f}{decoded / len(paths) / 1024:>10.0f}")
+    return results
 
 
 if __name__ == "__main__":
-    process_dataset()
+    process_dataset(rebuild="--rebuild" in sys.argv, export_npy="--npy" in sys.argv)
@@ -1,18 +1,34 @@
 """
-Copy the DeBERTa ONNX model + label map to client/public/models and regenerate labelMap.ts.
+Deploy the DeBERTa ONNX model + label map to client/public/models and regenerate labelMap.ts.
 
 Input:  models/saved_model/asl_deberta.onnx + label_map.json
-Output: client/public/models/asl_deberta.onnx + label_map.json + labelMap.ts
+        landmark_config.py (compiled to data/processed/landmark_mapping.json)
+Output: client/public/models/asl_deberta.<sha>.onnx + label_map.<sha>.json
+        + landmark_mapping.<sha>.json + manifest.json
+        client/src/features/asl/_legacyML/models/labelMap.ts
+
+Deployed files carry a content hash in their name so browsers can cache them
+immutably; clients resolve the current names through manifest.json. Every file is
+written to a temp file and swapped in with os.replace, and the manifest goes last,
+so a reader never sees a manifest pointing at a partial copy.
+
+Usage:
+    python convert_to_tfjs.py [--force] [--dry-run]
+
+    --force     regenerate labelMap.ts even when its inputs are unchanged
+    --dry-run   report what would be copied/generated without writing anything
 """
 
+import hashlib
 import json
+import os
 import shutil
 import sys
 from pathlib import Path
 
-from landmark_config import (
-    KEPT_LANDMARKS, TO_AVG, TYPE_ARRAY, KEPT_FLAT,
-    SEQ_LEN, N_LANDMARKS, NUM_CLASSES,
+from landmark_config import NUM_CLASSES
+from landmark_mapping import (
+    MAPPING_PATH, build_mapping, check_model_version, compile_mapping, kept_groups,
 )
 
 SCRIPT_DIR = Path(__file__).parent
@@ -20,92 +36,229 @@ PROJECT_DIR = SCRIPT_DIR.parent
 MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
 OUTPUT_DIR = PROJECT_DIR.parent / "client" / "public" / "models"
 LABEL_MAP_SRC = PROJECT_DIR / "data" / "processed" / "label_map.json"
+TS_PATH = (PROJECT_DIR.parent / "client" / "src" / "features"
+           / "asl" / "_legacyML" / "models" / "labelMap.ts")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+HASH_LEN = 12           # hex chars of sha256 kept in deployed filenames
+KEEP_GENERATIONS = 2    # current + previous, so in-flight clients can finish loading
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _fsync_replace(tmp: Path, dst: Path):
+    """Flush tmp to disk, then atomically rename it over dst."""
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, dst)
+
+
+def atomic_copy(src: Path, dst: Path):
+    tmp = dst.with_name(f".{dst.name}.tmp-{os.getpid()}")
+    try:
+        shutil.copyfile(src, tmp)
+        _fsync_replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def atomic_write_text(path: Path, text: str):
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        _fsync_replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def hashed_name(path: Path, digest: str) -> str:
+    """asl_deberta.onnx + digest -> asl_deberta.<digest[:HASH_LEN]>.onnx"""
+    return f"{path.stem}.{digest[:HASH_LEN]}{path.suffix}"
+
+
+def deploy_file(src: Path, out_dir: Path, dry_run: bool = False) -> dict:
+    """Copy src into out_dir under its content-hashed name; skip if already present."""
+    digest = sha256_file(src)
+    dst = out_dir / hashed_name(src, digest)
+    if dst.exists() and dst.stat().st_size == src.stat().st_size:
+        print(f"  {dst.name} already deployed")
+    elif dry_run:
+        print(f"  Would copy {src.name} -> {dst.name}")
+    else:
+        atomic_copy(src, dst)
+        print(f"  Copied {src.name} -> {dst.name}")
+    return {"file": dst.name, "sha256": digest, "size": src.stat().st_size}
+
+
+def load_manifest(out_dir: Path = OUTPUT_DIR) -> dict | None:
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def codegen_digest(label_map_bytes: bytes, mapping: dict) -> str:
+    """Hash of everything labelMap.ts is generated from."""
+    h = hashlib.sha256()
+    h.update(label_map_bytes)
+    h.update(f"{NUM_CLASSES}:{mapping['version']}".encode())
+    h.update(Path(__file__).read_bytes())  # generator changes invalidate too
+    return h.hexdigest()
 
 
-def convert():
+def render_label_map_ts(label_map: dict, mapping: dict) -> str:
+    max_idx = max(int(k) for k in label_map.keys())
+    labels = [""] * (max_idx + 1)
+    for idx_str, word in label_map.items():
+        labels[int(idx_str)] = word
+
+    lines = [
+        "/**",
+        " * ASL model constants and label map.",
+        " * Auto-generated by convert_to_tfjs.py — do not edit manually.",
+        " */",
+        "",
+        f"export const NUM_CLASSES = {NUM_CLASSES};",
+        f"export const SEQ_LEN = {mapping['seq_len']};",
+        f"export const NUM_LANDMARKS = {mapping['n_landmarks']};",
+        f"export const NUM_FEATURES = {mapping['num_features']}; // [type, x, y, z, landmark_id]",
+        "",
+        "/** Version of the compiled landmark mapping these tables come from (see manifest.json) */",
+        f"export const LANDMARK_MAPPING_VERSION = '{mapping['version']}';",
+        "",
+        "export const ASL_LABELS: string[] = [",
+    ]
+    for i, word in enumerate(labels):
+        comma = "," if i < len(labels) - 1 else ""
+        lines.append(f"  '{word}'{comma}")
+    lines.append("];")
+    lines.append("")
+
+    # Landmark tables (from the compiled landmark_mapping.json)
+    lines.append("/** Holistic indices (from 543) for each kept landmark group */")
+    lines.append("export const KEPT_LANDMARKS: number[][] = [")
+    for group in kept_groups(mapping):
+        lines.append(f"  [{', '.join(str(x) for x in group)}],")
+    lines.append("];")
+    lines.append("")
+
+    lines.append("/** Holistic indices to average into virtual landmarks */")
+    lines.append("export const TO_AVG: number[][] = [")
+    for group in mapping["avg_index"]:
+        lines.append(f"  [{', '.join(str(x) for x in group)}],")
+    lines.append("];")
+    lines.append("")
+
+    lines.append("/** Flat list of all 95 kept holistic indices */")
+    lines.append(f"export const KEPT_FLAT: number[] = [{', '.join(str(x) for x in mapping['gather'])}];")
+    lines.append("")
+
+    lines.append("/** Type ID for each of the 100 landmarks (1=left hand, 2=right hand, 3=silhouette, 4=lips, 5=arms, 6=cheeks/averaged) */")
+    lines.append(f"export const TYPE_ARRAY: number[] = [{', '.join(str(x) for x in mapping['type_ids'])}];")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def prune_stale(out_dir: Path, keep: set[str]):
+    """Remove hashed artifacts not referenced by the last KEEP_GENERATIONS manifests."""
+    for f in out_dir.iterdir():
+        parts = f.name.split(".")
+        is_hashed = len(parts) >= 3 and len(parts[-2]) == HASH_LEN and all(
+            c in "0123456789abcdef" for c in parts[-2])
+        if is_hashed and f.name not in keep:
+            f.unlink()
+            print(f"  Pruned {f.name}")
+
+
+def convert(force: bool = False, dry_run: bool = False):
     onnx_src = MODEL_DIR / "asl_deberta.onnx"
     if not onnx_src.exists():
         print(f"ONNX model not found at {onnx_src}")
         print("Run export_deberta_onnx.py first.")
         sys.exit(1)
 
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    label_map_src = next(
+        (p for p in [LABEL_MAP_SRC, MODEL_DIR / "label_map.json"] if p.exists()), None)
+    if label_map_src is None:
+        print("label_map.json not found — run collect_landmarks.py first.")
+        sys.exit(1)
 
-    shutil.copy(onnx_src, OUTPUT_DIR / "asl_deberta.onnx")
-    print(f"Copied asl_deberta.onnx to {OUTPUT_DIR}")
+    previous = load_manifest() if OUTPUT_DIR.exists() else None
 
-    # Copy label map
-    label_map_json = None
-    for src in [LABEL_MAP_SRC, MODEL_DIR / "label_map.json"]:
-        if src.exists():
-            shutil.copy(src, OUTPUT_DIR / "label_map.json")
-            label_map_json = OUTPUT_DIR / "label_map.json"
-            print(f"Copied label_map.json from {src}")
-            break
+    mapping = build_mapping() if dry_run else compile_mapping()
+    print(f"Landmark mapping {mapping['version']}")
+
+    # Refuse to ship a model exported against different preprocessing tables.
+    # A dry run skips the check so it never imports onnx.
+    if dry_run:
+        print("Dry run: not checking the model's landmark mapping version")
+    else:
+        import onnx
+        model_meta = onnx.load(str(onnx_src), load_external_data=False).metadata_props
+        check_model_version({p.key: p.value for p in model_meta}, mapping)
+
+    print(f"{'Dry run: deploying' if dry_run else 'Deploying'} to {OUTPUT_DIR}")
+    if not dry_run:
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    model_entry = deploy_file(onnx_src, OUTPUT_DIR, dry_run)
+    label_entry = deploy_file(label_map_src, OUTPUT_DIR, dry_run)
+    mapping_entry = {**deploy_file(MAPPING_PATH, OUTPUT_DIR, dry_run), "version": mapping["version"]}
+
+    label_map_bytes = label_map_src.read_bytes()
+    codegen_sha = codegen_digest(label_map_bytes, mapping)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "models": {"asl_deberta": model_entry},
+        "label_map": label_entry,
+        "landmark_mapping": mapping_entry,
+        "seq_len": mapping["seq_len"],
+        "num_classes": NUM_CLASSES,
+        "num_landmarks": mapping["n_landmarks"],
+        "num_features": mapping["num_features"],
+        "codegen_sha256": codegen_sha,
+    }
+
+    if previous == manifest and TS_PATH.exists() and not force:
+        print("\nManifest unchanged — nothing to deploy.")
+        return manifest
+
+    # Generate labelMap.ts only when something it depends on changed
+    needs_codegen = force or not TS_PATH.exists() or (previous or {}).get("codegen_sha256") != codegen_sha
+    if dry_run:
+        print(f"\n{'Would regenerate' if needs_codegen else 'Would skip'} labelMap.ts; would write {MANIFEST_NAME}")
+        return manifest
+    if needs_codegen:
+        TS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(TS_PATH, render_label_map_ts(json.loads(label_map_bytes), mapping))
+        print(f"\nGenerated {TS_PATH}")
+    else:
+        print("\nlabelMap.ts inputs unchanged — skipped codegen")
+
+    atomic_write_text(OUTPUT_DIR / MANIFEST_NAME, json.dumps(manifest, indent=2) + "\n")
+    print(f"Wrote {MANIFEST_NAME}")
+
+    keep = {MANIFEST_NAME, model_entry["file"], label_entry["file"], mapping_entry["file"]}
+    if previous and KEEP_GENERATIONS > 1:
+        keep.add(previous.get("label_map", {}).get("file", ""))
+        keep.add(previous.get("landmark_mapping", {}).get("file", ""))
+        keep.update(m.get("file", "") for m in previous.get("models", {}).values())
+    prune_stale(OUTPUT_DIR, keep)
 
     print("\nOutput files:")
     for f in sorted(OUTPUT_DIR.iterdir()):
         size_kb = f.stat().st_size / 1024
         print(f"  {f.name} ({size_kb:.1f} KB)")
-
-    # Generate labelMap.ts
-    if label_map_json and label_map_json.exists():
-        with open(label_map_json) as f:
-            label_map = json.load(f)
-
-        max_idx = max(int(k) for k in label_map.keys())
-        labels = [""] * (max_idx + 1)
-        for idx_str, word in label_map.items():
-            labels[int(idx_str)] = word
-
-        ts_path = (PROJECT_DIR.parent / "client" / "src" / "features"
-                   / "asl" / "models" / "labelMap.ts")
-
-        lines = [
-            "/**",
-            " * ASL model constants and label map.",
-            " * Auto-generated by convert_to_tfjs.py — do not edit manually.",
-            " */",
-            "",
-            f"export const NUM_CLASSES = {NUM_CLASSES};",
-            f"export const SEQ_LEN = {SEQ_LEN};",
-            f"export const NUM_LANDMARKS = {N_LANDMARKS};",
-            "export const NUM_FEATURES = 5; // [type, x, y, z, landmark_id]",
-            "",
-            "export const ASL_LABELS: string[] = [",
-        ]
-        for i, word in enumerate(labels):
-            comma = "," if i < len(labels) - 1 else ""
-            lines.append(f"  '{word}'{comma}")
-        lines.append("];")
-        lines.append("")
-
-        # Landmark config (mirrored from Python landmark_config.py)
-        lines.append("/** Holistic indices (from 543) for each kept landmark group */")
-        lines.append("export const KEPT_LANDMARKS: number[][] = [")
-        for group in KEPT_LANDMARKS:
-            lines.append(f"  [{', '.join(str(x) for x in group)}],")
-        lines.append("];")
-        lines.append("")
-
-        lines.append("/** Holistic indices to average into virtual landmarks */")
-        lines.append("export const TO_AVG: number[][] = [")
-        for group in TO_AVG:
-            lines.append(f"  [{', '.join(str(x) for x in group)}],")
-        lines.append("];")
-        lines.append("")
-
-        lines.append("/** Flat list of all 95 kept holistic indices */")
-        lines.append(f"export const KEPT_FLAT: number[] = [{', '.join(str(x) for x in KEPT_FLAT)}];")
-        lines.append("")
-
-        lines.append("/** Type ID for each of the 100 landmarks (1=left hand, 2=right hand, 3=silhouette, 4=lips, 5=arms, 6=cheeks/averaged) */")
-        lines.append(f"export const TYPE_ARRAY: number[] = [{', '.join(str(x) for x in TYPE_ARRAY)}];")
-        lines.append("")
-
-        ts_path.write_text("\n".join(lines))
-        print(f"\nGenerated {ts_path}")
+    return manifest
 
 
 if __name__ == "__main__":
-    convert()
+    convert(force="--force" in sys.argv[1:], dry_run="--dry-run" in sys.argv[1:])
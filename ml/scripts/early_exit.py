@@ -0,0 +1,349 @@
+"""
+Early-exit inference for the DeBERTa model.
+
+Adds lightweight classifier heads after frame_transformer_1 and _2, trained by
+distilling from the final head (the base model stays frozen), and exports the
+model as a chain of stages:
+
+    stage1.onnx  [seq_len, 5, 100]       -> (logits, hidden)   embed + transformer 1 + exit head 1
+    stage2.onnx  [1, seq_len, d1]        -> (logits, hidden)   transformer 2 + exit head 2
+    stage3.onnx  [1, seq_len, d2]        -> logits             transformer 3 + final head
+
+EarlyExitRunner runs the stages in order and stops at the first head whose top
+softmax probability reaches the threshold, so easy signs skip the later
+transformers.
+
+Usage:
+    python early_exit.py <weights.pt> [--files 4000] [--epochs 40] [--thresholds 0.5,0.7,0.9]
+
+Input:   data/asl-signs (train.csv + parquet files), DeBERTa .pt weights
+Output:  models/saved_model/early_exit/heads.pt, stage*.onnx,
+         curve.json (accuracy / latency / exit rates per threshold on held-out windows)
+"""
+
+import argparse
+import functools
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+EXIT_DIR = PROJECT_DIR / "models" / "saved_model" / "early_exit"
+
+THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+DEFAULT_THRESHOLD = 0.9
+TEMPERATURE = 2.0
+
+
+@functools.lru_cache(maxsize=1)
+def _modules():
+    """(ExitHead, ExitStage), defined on first use so importing this module (and
+    `cli.py early-exit --help`) doesn't load torch."""
+    import torch.nn as nn
+
+    class ExitHead(nn.Module):
+        """Mean-pooled transformer features -> logits (LayerNorm + Linear)."""
+
+        def __init__(self, dim: int, num_classes: int, dropout: float = 0.1):
+            super().__init__()
+            self.norm = nn.LayerNorm(dim)
+            self.drop = nn.Dropout(dropout)
+            self.fc = nn.Linear(dim, num_classes)
+
+        def forward(self, pooled):
+            return self.fc(self.drop(self.norm(pooled)))
+
+    class ExitStage(nn.Module):
+        """
+        One stage of the chain: stage 0 embeds the landmarks, later stages take the
+        previous stage's hidden states. Returns (logits, hidden), or logits only for
+        the last stage (which uses the model's own head).
+        """
+
+        def __init__(self, model, stage: int, head=None):
+            super().__init__()
+            self.model = model
+            self.stage = stage
+            self.head = head
+
+        def forward(self, x):
+            fts = self.model.embed(x) if self.stage == 0 else x
+            ids, ids_t = self.model.position_ids(fts.shape[1])
+            fts = self.model.encoders()[self.stage](fts, ids=ids, ids_t=ids_t)
+            if self.head is None:
+                return self.model.logits(fts.mean(1))
+            return self.head(fts.mean(1)), fts
+
+    return ExitHead, ExitStage
+
+
+def exit_head(dim: int, num_classes: int, dropout: float = 0.1):
+    return _modules()[0](dim, num_classes, dropout)
+
+
+def exit_stage(model, stage: int, head=None):
+    return _modules()[1](model, stage, head)
+
+
+# ---------------------------------------------------------------------------
+# Distillation
+# ---------------------------------------------------------------------------
+
+def stage_features(model, windows: list[np.ndarray]):
+    """
+    Frozen-model pass over every window: mean-pooled hidden states after each
+    non-final transformer ([N, d_k] per exit) and the final head's logits [N, C].
+    """
+    import torch
+
+    pooled = [[] for _ in model.encoders()[:-1]]
+    teacher = []
+    with torch.no_grad():
+        for window in windows:
+            fts = model.embed(torch.from_numpy(window))
+            ids, ids_t = model.position_ids(fts.shape[1])
+            for k, encoder in enumerate(model.encoders()):
+                fts = encoder(fts, ids=ids, ids_t=ids_t)
+                if k < len(pooled):
+                    pooled[k].append(fts.mean(1))
+            teacher.append(model.logits(fts.mean(1)))
+    return [torch.cat(p) for p in pooled], torch.cat(teacher)
+
+
+def distill(pooled: list, teacher, epochs: int = 40, lr: float = 1e-3,
+            temperature: float = TEMPERATURE, batch_size: int = 128, seed: int = 0, log=print):
+    """
+    Train one exit head per exit on cached pooled features against the teacher's
+    softened distribution (KL * T^2). Returns the heads in eval mode.
+    """
+    import torch
+    import torch.nn as nn
+    import torch.nn.functional as F
+
+    torch.manual_seed(seed)
+    heads = nn.ModuleList(exit_head(p.shape[1], teacher.shape[1]) for p in pooled)
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=lr, weight_decay=1e-4)
+    target = F.softmax(teacher / temperature, dim=-1)
+    n = len(teacher)
+
+    for epoch in range(epochs):
+        heads.train()
+        order = torch.randperm(n)
+        totals = [0.0] * len(heads)
+        for start in range(0, n, batch_size):
+            idx = order[start:start + batch_size]
+            losses = [
+                F.kl_div(F.log_softmax(head(p[idx]) / temperature, dim=-1), target[idx],
+                         reduction="batchmean") * temperature ** 2
+                for head, p in zip(heads, pooled)
+            ]
+            optimizer.zero_grad()
+            sum(losses).backward()
+            optimizer.step()
+            for k, loss in enumerate(losses):
+                totals[k] += loss.item() * len(idx)
+        if log and (epoch == 0 or (epoch + 1) % 10 == 0 or epoch == epochs - 1):
+            log(f"Epoch {epoch + 1:3d} | distill KL " + "  ".join(
+                f"exit{k + 1} {t / n:.4f}" for k, t in enumerate(totals)))
+    return heads.eval()
+
+
+# ---------------------------------------------------------------------------
+# Staged export & runner
+# ---------------------------------------------------------------------------
+
+def export_stages(model, heads, out_dir: Path = EXIT_DIR) -> list[Path]:
+    """Write stage<k>.onnx for every transformer (exit heads on all but the last)."""
+    import onnx
+    import torch
+
+    from bench_export import landmark_corpus
+    from landmark_mapping import METADATA_KEY, compile_mapping
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    version = compile_mapping()["version"]
+
+    x = torch.from_numpy(landmark_corpus(1)[0])
+    paths = []
+    for k in range(len(model.encoders())):
+        last = k == len(heads)
+        stage = exit_stage(model, k, None if last else heads[k]).eval()
+        path = out_dir / f"stage{k + 1}.onnx"
+        input_name = "input" if k == 0 else "hidden"
+        seq_axis = 0 if k == 0 else 1
+        output_names = ["logits"] if last else ["logits", "hidden_out"]
+        dynamic_axes = {input_name: {seq_axis: "seq_len"}}
+        if not last:
+            dynamic_axes["hidden_out"] = {1: "seq_len"}
+        with torch.no_grad():
+            torch.onnx.export(stage, x, str(path), input_names=[input_name], output_names=output_names,
+                              dynamic_axes=dynamic_axes, opset_version=17, dynamo=False)
+            if not last:
+                x = stage(x)[1]
+        onnx_model = onnx.load(str(path))
+        onnx.helper.set_model_props(onnx_model, {METADATA_KEY: version})
+        onnx.save(onnx_model, str(path))
+        paths.append(path)
+        print(f"Saved: {path}")
+    return paths
+
+
+class EarlyExitRunner:
+    """ORT sessions for stage*.onnx; stops at the first exit that is confident enough."""
+
+    def __init__(self, exit_dir: Path = EXIT_DIR, threshold: float = DEFAULT_THRESHOLD,
+                 session_options=None):
+        from ort_tune import create_session
+
+        paths = sorted(Path(exit_dir).glob("stage*.onnx"))
+        if not paths:
+            raise FileNotFoundError(f"No stage*.onnx in {exit_dir}; run early_exit.py first")
+        self.sessions = [create_session(p, session_options) for p in paths]
+        self.input_names = [s.get_inputs()[0].name for s in self.sessions]
+        self.threshold = threshold
+
+    def stages(self, window: np.ndarray):
+        """Yield (stage index, logits [NUM_CLASSES]) for every stage in order."""
+        x = np.ascontiguousarray(window, dtype=np.float32)
+        for k, (sess, name) in enumerate(zip(self.sessions, self.input_names)):
+            outs = sess.run(None, {name: x})
+            yield k, outs[0][0]
+            if len(outs) > 1:
+                x = outs[1]
+
+    def __call__(self, window: np.ndarray, threshold: float | None = None) -> tuple[np.ndarray, int]:
+        """window: normalized [L, 5, 100] -> (logits, 1-based stage it exited at)."""
+        from asl_inference import softmax
+
+        threshold = self.threshold if threshold is None else threshold
+        for k, logits in self.stages(window):
+            if softmax(logits).max() >= threshold:
+                break
+        return logits, k + 1
+
+
+def exit_curve(runner: EarlyExitRunner, windows: list[np.ndarray], labels: np.ndarray,
+               thresholds=THRESHOLDS) -> list[dict]:
+    """
+    Run every stage once per window (timing each), then derive, for each
+    threshold, where each window would exit: accuracy, top-1 agreement with the
+    full model, exit rates and latency (cumulative stage time at the exit).
+    """
+    from asl_inference import softmax
+
+    for k, _ in runner.stages(windows[0]):  # warm-up
+        pass
+    confidence, preds, elapsed = [], [], []
+    for window in windows:
+        conf, pred, cum = [], [], []
+        t0 = time.perf_counter()
+        for k, logits in runner.stages(window):
+            cum.append((time.perf_counter() - t0) * 1000)
+            probs = softmax(logits)
+            conf.append(probs.max())
+            pred.append(probs.argmax())
+        confidence.append(conf)
+        preds.append(pred)
+        elapsed.append(cum)
+    confidence, preds, elapsed = (np.asarray(a) for a in (confidence, preds, elapsed))
+    n_stages = confidence.shape[1]
+
+    rows = []
+    for threshold in [*thresholds, None]:
+        if threshold is None:  # full model, no exits
+            stage = np.full(len(windows), n_stages - 1)
+        else:
+            passed = confidence[:, :-1] >= threshold
+            stage = np.where(passed.any(1), passed.argmax(1), n_stages - 1)
+        rows_idx = np.arange(len(windows))
+        pred = preds[rows_idx, stage]
+        latency = elapsed[rows_idx, stage]
+        rows.append({
+            "threshold": threshold,
+            "accuracy": float((pred == labels).mean()),
+            "agreement_with_full": float((pred == preds[:, -1]).mean()),
+            "exit_rates": [float((stage == k).mean()) for k in range(n_stages)],
+            "mean_ms": float(latency.mean()),
+            "p50_ms": float(np.percentile(latency, 50)),
+            "p95_ms": float(np.percentile(latency, 95)),
+        })
+    return rows
+
+
+def print_curve(rows: list[dict]):
+    full = rows[-1]["mean_ms"]
+    print(f"\n{'threshold':>9}  {'acc':>6}  {'agree':>6}  {'exit rates':<20} {'mean ms':>8}  {'p95 ms':>7}  speedup")
+    for r in rows:
+        label = "full" if r["threshold"] is None else f"{r['threshold']:g}"
+        rates = "/".join(f"{x:.2f}" for x in r["exit_rates"])
+        print(f"{label:>9}  {r['accuracy']:6.3f}  {r['agreement_with_full']:6.3f}  {rates:<20} "
+              f"{r['mean_ms']:8.2f}  {r['p95_ms']:7.2f}  {full / r['mean_ms']:5.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("weights", help="DeBERTa .pt checkpoint")
+    parser.add_argument("--files", type=int, default=4000, help="parquet files to sample (0 = all)")
+    parser.add_argument("--eval-frac", type=float, default=0.2, help="held-out share for the curve")
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--thresholds", default=",".join(str(t) for t in THRESHOLDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", type=Path, default=EXIT_DIR)
+    args = parser.parse_args(argv)
+
+    import torch
+
+    from asl_inference import load_kaggle_windows
+    from export_deberta_onnx import build_model, load_weights
+
+    model = load_weights(build_model(), args.weights).eval()
+    for p in model.parameters():
+        p.requires_grad_(False)
+
+    print("Loading windows...")
+    windows, labels, _ = load_kaggle_windows(args.files or None, args.seed)
+    order = np.random.default_rng(args.seed).permutation(len(windows))
+    n_eval = max(1, int(len(windows) * args.eval_frac))
+    eval_idx, train_idx = order[:n_eval], order[n_eval:]
+    print(f"Windows: {len(train_idx)} distill, {len(eval_idx)} held out")
+
+    print("Caching frozen stage features...")
+    pooled, teacher = stage_features(model, [windows[i] for i in train_idx])
+    heads = distill(pooled, teacher, epochs=args.epochs, lr=args.lr,
+                    temperature=args.temperature, seed=args.seed)
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    torch.save({
+        "heads": heads.state_dict(),
+        "dims": [p.shape[1] for p in pooled],
+        "num_classes": teacher.shape[1],
+        "temperature": args.temperature,
+    }, args.out_dir / "heads.pt")
+    export_stages(model, heads, args.out_dir)
+
+    # The chain without exits must reproduce the full model
+    runner = EarlyExitRunner(args.out_dir)
+    sample = [windows[i] for i in eval_idx[:8]]
+    with torch.no_grad():
+        ref = np.stack([model(torch.from_numpy(w)).numpy()[0] for w in sample])
+    got = np.stack([runner(w, threshold=2.0)[0] for w in sample])
+    diff = np.abs(ref - got).max()
+    print(f"Staged chain vs full model on {len(sample)} windows: max abs diff = {diff:.2e} "
+          f"{'✓' if diff < 1e-4 else '✗'}")
+
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    rows = exit_curve(runner, [windows[i] for i in eval_idx], labels[eval_idx], thresholds)
+    print_curve(rows)
+    with open(args.out_dir / "curve.json", "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "weights": str(args.weights),
+                   "eval_windows": int(n_eval), "curve": rows}, f, indent=2)
+    print(f"\nSaved: {args.out_dir / 'curve.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,242 @@
-"""Re-save the ONNX model with all weights embedded (no external .data file)."""
+"""
+Package an ONNX model for the browser.
+
+Default mode re-saves the model with all weights embedded (no external .data file).
+--shard splits it instead into a small graph file plus one external-data weight
+shard per top-level module (frame_transformer_1, lstm, ...), ordered by first use
+in the graph, with a manifest. Shards can be cached individually and the graph
+file parses before any weights arrive.
+
+Usage:
+    python embed_onnx.py [model.onnx] [--shard] [--min-shard-bytes N] [--bench]
+
+Output (default): models/saved_model/<stem>_embedded.onnx
+Output (--shard): models/saved_model/<stem>_sharded/
+                    <stem>.onnx             graph + tensors < --min-shard-bytes
+                    shards/<group>.bin      raw little-endian weights per module
+                    manifest.json           file/sha256/size per shard, load order
+"""
+import argparse
+import json
 import os
+import time
+from collections import OrderedDict
 from pathlib import Path
+
 import onnx
+from onnx.external_data_helper import set_external_data
+
+from convert_to_tfjs import sha256_file
+
+MODEL_DIR = Path(__file__).parent.parent / "models" / "saved_model"
+SRC = MODEL_DIR / "asl_model.onnx"
+
+# Tensors smaller than this stay inline in the graph file (biases, norms, shape consts)
+MIN_SHARD_BYTES = 4096
+
+
+def embed(src: Path, dst: Path):
+    model = onnx.load(str(src), load_external_data=True)
+    onnx.save_model(model, str(dst), save_as_external_data=False)
+    size = os.path.getsize(dst)
+    print(f"Saved embedded model: {dst} ({size:,} bytes)")
+
+
+def _module_scope(node_name: str) -> str | None:
+    """'/frame_transformer_1/layer.0/attention/.../MatMul' -> 'frame_transformer_1'"""
+    parts = [p for p in node_name.split("/") if p]
+    return parts[0] if len(parts) > 1 else None
+
+
+def group_initializers(graph: onnx.GraphProto) -> "OrderedDict[str, list[str]]":
+    """
+    Assign each initializer to the top-level module of its first real consumer,
+    following Identity aliases the TorchScript exporter inserts for shared weights.
+    Groups are ordered by the first node (topological order) that needs them.
+    """
+    consumers: dict[str, list[tuple[int, onnx.NodeProto]]] = {}
+    for i, node in enumerate(graph.node):
+        for name in node.input:
+            consumers.setdefault(name, []).append((i, node))
+
+    def first_use(name: str, depth: int = 0) -> tuple[int, str | None]:
+        best = (len(graph.node), None)
+        for i, node in consumers.get(name, []):
+            if node.op_type == "Identity" and depth < 4:
+                cand = first_use(node.output[0], depth + 1)
+            else:
+                cand = (i, _module_scope(node.name))
+            if cand[0] < best[0]:
+                best = cand
+        return best
+
+    placed = []
+    for init in graph.initializer:
+        order, scope = first_use(init.name)
+        if scope is None:
+            scope = init.name.split(".")[0] if "." in init.name else "root"
+        placed.append((order, scope, init.name))
+
+    groups: OrderedDict[str, list[str]] = OrderedDict()
+    for _, scope, name in sorted(placed):
+        groups.setdefault(scope, []).append(name)
+    return groups
+
+
+def shard(src: Path, out_dir: Path, min_shard_bytes: int = MIN_SHARD_BYTES) -> dict:
+    model = onnx.load(str(src), load_external_data=True)
+    groups = group_initializers(model.graph)
+    by_name = {init.name: init for init in model.graph.initializer}
+
+    shard_dir = out_dir / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    for stale in shard_dir.glob("*.bin"):
+        stale.unlink()
+
+    shards = []
+    inline_bytes = 0
+    for group, names in groups.items():
+        rel = f"shards/{group}.bin"
+        offset = 0
+        n_tensors = 0
+        with open(out_dir / rel, "wb") as f:
+            for name in names:
+                tensor = by_name[name]
+                raw = tensor.raw_data
+                if not raw or len(raw) < min_shard_bytes:
+                    inline_bytes += len(raw)
+                    continue
+                # 64-byte alignment so runtimes can mmap tensors in place
+                pad = (-offset) % 64
+                f.write(b"\0" * pad)
+                offset += pad
+                f.write(raw)
+                set_external_data(tensor, location=rel, offset=offset, length=len(raw))
+                tensor.ClearField("raw_data")
+                tensor.data_location = onnx.TensorProto.EXTERNAL
+                offset += len(raw)
+                n_tensors += 1
+        if n_tensors == 0:
+            (out_dir / rel).unlink()
+            continue
+        shards.append({
+            "group": group,
+            "file": rel,
+            "tensors": n_tensors,
+            "size": offset,
+            "sha256": sha256_file(out_dir / rel),
+        })
+
+    graph_path = out_dir / src.name
+    onnx.save_model(model, str(graph_path), save_as_external_data=False)
+
+    manifest = {
+        "source": src.name,
+        "graph": {
+            "file": graph_path.name,
+            "size": graph_path.stat().st_size,
+            "sha256": sha256_file(graph_path),
+            "inline_bytes": inline_bytes,
+        },
+        "shards": shards,  # already in load order
+    }
+    with open(out_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Sharded {src.name} -> {out_dir}/")
+    print(f"  {graph_path.name}: {manifest['graph']['size']:,} bytes "
+          f"({inline_bytes:,} inline weight bytes)")
+    for s in shards:
+        print(f"  {s['file']}: {s['size']:,} bytes ({s['tensors']} tensors)")
+    return manifest
+
+
+def _dummy_feed(sess):
+    import numpy as np
+
+    feed = {}
+    for inp in sess.get_inputs():
+        shape = [d if isinstance(d, int) else 1 for d in inp.shape]
+        feed[inp.name] = np.zeros(shape, dtype=np.float32)
+    return feed
+
+
+def time_to_first_inference(model_path: Path, repeats: int = 5) -> dict:
+    """Cold session creation + first run, median over `repeats` fresh sessions."""
+    import onnxruntime as ort
+
+    load_ms, run_ms = [], []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        sess = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+        t1 = time.perf_counter()
+        sess.run(None, _dummy_feed(sess))
+        t2 = time.perf_counter()
+        load_ms.append((t1 - t0) * 1000)
+        run_ms.append((t2 - t1) * 1000)
+        del sess
+    load_ms.sort()
+    run_ms.sort()
+    return {
+        "load_ms": load_ms[len(load_ms) // 2],
+        "first_run_ms": run_ms[len(run_ms) // 2],
+        "ttfi_ms": load_ms[len(load_ms) // 2] + run_ms[len(run_ms) // 2],
+    }
+
+
+def bench(monolithic: Path, sharded_dir: Path, repeats: int = 5) -> dict:
+    with open(sharded_dir / "manifest.json") as f:
+        manifest = json.load(f)
+    graph = sharded_dir / manifest["graph"]["file"]
+    first_shard = manifest["shards"][0]["size"] if manifest["shards"] else 0
+
+    results = {
+        "monolithic": time_to_first_inference(monolithic, repeats),
+        "sharded": time_to_first_inference(graph, repeats),
+    }
+    results["monolithic"]["bytes_before_parse"] = monolithic.stat().st_size
+    results["sharded"]["bytes_before_parse"] = manifest["graph"]["size"]
+    results["sharded"]["bytes_first_shard"] = first_shard
+
+    print(f"\nTime to first inference (median of {repeats}, local disk):")
+    print(f"  {'':<12}{'load ms':>10}{'run ms':>10}{'ttfi ms':>10}{'graph bytes':>14}")
+    for name, r in results.items():
+        print(f"  {name:<12}{r['load_ms']:>10.1f}{r['first_run_ms']:>10.1f}"
+              f"{r['ttfi_ms']:>10.1f}{r['bytes_before_parse']:>14,}")
+    return results
+
+
+def bench_main(argv=None):
+    """`cli.py bench shards [model.onnx]` — shard (if needed) and compare."""
+    parser = argparse.ArgumentParser(prog="bench shards")
+    parser.add_argument("src", nargs="?", type=Path, default=MODEL_DIR / "asl_deberta.onnx")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    out_dir = args.src.with_name(f"{args.src.stem}_sharded")
+    if not (out_dir / "manifest.json").exists():
+        shard(args.src, out_dir)
+    bench(args.src, out_dir, args.repeats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("src", nargs="?", type=Path, default=SRC)
+    parser.add_argument("--shard", action="store_true", help="split weights into per-module shards")
+    parser.add_argument("--min-shard-bytes", type=int, default=MIN_SHARD_BYTES)
+    parser.add_argument("--bench", action="store_true", help="compare time-to-first-inference against the monolithic file")
+    args = parser.parse_args(argv)
+
+    src = args.src
+    if not args.shard:
+        embed(src, src.with_name(f"{src.stem}_embedded.onnx"))
+        return
+
+    out_dir = src.with_name(f"{src.stem}_sharded")
+    shard(src, out_dir, args.min_shard_bytes)
+    if args.bench:
+        bench(src, out_dir)
 
-SRC = Path(__file__).parent.parent / "models" / "saved_model" / "asl_model.onnx"
-DST = Path(__file__).parent.parent / "models" / "saved_model" / "asl_model_embedded.onnx"
 
-model = onnx.load(str(SRC), load_external_data=True)
-onnx.save_model(model, str(DST), save_as_external_data=False)
-size = os.path.getsize(DST)
-print(f"Saved embedded model: {DST} ({size:,} bytes)")
+if __name__ == "__main__":
+    main()
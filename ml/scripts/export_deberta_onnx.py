@@ -2,7 +2,7 @@
 Export TheoViel's distilled DeBERTa ASL model to ONNX for browser inference.
 
 Usage:
-    python export_deberta_onnx.py <path_to_weights.pt>
+    python export_deberta_onnx.py <path_to_weights.pt> [--fused] [--embedding] [--batched]
 
 Example:
     # 1. Clone the TheoViel repo and grab the weights:
@@ -13,6 +13,12 @@ Example:
     python export_deberta_onnx.py /tmp/kaggle_islr/logs/2023-04-30/7/mlp_bert_3_distilled_fullfit_0.pt
 
 Output:  models/saved_model/asl_deberta.onnx
+         models/saved_model/asl_deberta_fused.onnx   (--fused: raw [seq, 543, 3]
+         holistic landmarks in, preprocessing done inside the graph)
+         models/saved_model/asl_deberta_embedding.onnx   (--embedding: pooled
+         fts.mean(1) features instead of logits, for sign_index.py)
+         models/saved_model/asl_deberta_batched.onnx   (--batched: [batch, seq_len,
+         5, 100] stacks of equal-length windows -> [batch, 250])
 """
 
 import sys
@@ -128,6 +134,14 @@ class DisentangledSelfAttention(nn.Module):
             if "p2c" in self.pos_att_type:
                 pos_query_layer = self.transpose_for_scores(self.pos_query_proj(rel_embeddings), self.num_attention_heads)
 
+        # Batched input: every sample shares the positional projections (ids carry per-block offsets)
+        batch = _shape(query_layer)[0] // self.num_attention_heads
+        if batch > 1:
+            if "c2p" in self.pos_att_type:
+                pos_key_layer = pos_key_layer.repeat(batch, 1, 1)
+            if "p2c" in self.pos_att_type:
+                pos_query_layer = pos_query_layer.repeat(batch, 1, 1)
+
         if "c2p" in self.pos_att_type:
             sc = torch.sqrt(self.scale_mult * scale_factor)
             c2p_att = torch.bmm(query_layer, pos_key_layer.transpose(-1, -2))
@@ -359,9 +373,39 @@ class SignMLPBert3Export(nn.Module):
             self._ids_t[k - 1, :, :k, :k] = compute_ids(True, k, max_len)
         self.register_buffer("_offset", torch.arange(transfo_heads, dtype=torch.int) * 2 * max_len)
 
+        # Optional HolisticPreprocess; set for the fused export only
+        self.preprocess = None
+        # Return the pooled features instead of logits (embedding export)
+        self.output_embedding = False
+
     def forward(self, x):
-        # x: [n_frames, 5, 100]
-        x = x.unsqueeze(0)  # [1, sz, 5, 100]
+        # x: [n_frames, 5, 100], or [n_frames, 543, 3] raw holistic with self.preprocess
+        if self.preprocess is not None:
+            x = self.preprocess(x)
+        fts = self.embed(x)
+        ids, ids_t = self.position_ids(fts.shape[1], fts.shape[0] if x.dim() == 4 else None)
+
+        # Transformer layers
+        for encoder in self.encoders():
+            fts = encoder(fts, ids=ids, ids_t=ids_t)
+
+        fts = fts.mean(1)
+        if self.output_embedding:
+            return fts
+        return self.logits(fts)
+
+    def encoders(self) -> list:
+        """The frame transformers that exist in this config, in order."""
+        return [e for e in (self.frame_transformer_1, self.frame_transformer_2, self.frame_transformer_3)
+                if e is not None]
+
+    def embed(self, x):
+        """
+        [n_frames, 5, 100] -> per-frame features [1, n_frames, transfo_dim] (transformer
+        input). A [batch, n_frames, 5, 100] stack of equal-length windows gives [batch, ...].
+        """
+        if x.dim() == 3:
+            x = x.unsqueeze(0)  # [1, sz, 5, 100]
         bs = x.shape[0]
         sz = x.shape[1]
         n_landmarks = x.shape[3]
@@ -405,30 +449,94 @@ class SignMLPBert3Export(nn.Module):
         fts = self.full_mlp(fts.view(-1, n_fts * n_landmarks))
         fts = torch.cat([fts, hand_fts, lips_fts, face_fts], -1)
         fts = self.landmark_mlp(fts)
-        fts = fts.view(bs, -1, self.transfo_dim)
+        return fts.view(bs, -1, self.transfo_dim)
 
-        # Position IDs
+    def position_ids(self, sz, batch=None):
+        """
+        Flattened relative position ids (ids, ids_t) for a length-sz sequence; with
+        `batch`, for that many stacked windows (one id block per sample and head).
+        """
         ids_t = self._ids_t[sz - 1, :, :sz, :sz].contiguous()
         ids = self._ids[sz - 1, :, :sz, :sz].contiguous()
-        offset = (self._offset.unsqueeze(1).unsqueeze(1) * sz)
+        offset = self._offset
+        if batch is not None:
+            block = self._offset.shape[0] * 2 * self.max_len
+            offset = (torch.arange(batch).to(offset.dtype).unsqueeze(1) * block + offset.unsqueeze(0)).view(-1)
+        offset = (offset.unsqueeze(1).unsqueeze(1) * sz)
         ids = (ids + offset).view(-1)
         ids_t = (ids_t + offset).view(-1)
+        return ids, ids_t
 
-        # Transformer layers
-        fts = self.frame_transformer_1(fts, ids=ids, ids_t=ids_t)
-        if self.frame_transformer_2 is not None:
-            fts = self.frame_transformer_2(fts, ids=ids, ids_t=ids_t)
-        if self.frame_transformer_3 is not None:
-            fts = self.frame_transformer_3(fts, ids=ids, ids_t=ids_t)
 
-        fts = fts.mean(1)
-        return self.logits(fts)
+class HolisticPreprocess(nn.Module):
+    """
+    Raw holistic landmarks [n_frames, 543, 3] (NaN = not detected) -> model input
+    [n_frames, 5, 100], as graph ops with constant index tensors from the compiled
+    landmark mapping: gather the kept points, NaN-ignoring averages, per-coordinate
+    window normalization (NaN -> 0), type and landmark id channels. Same math as
+    asl_inference.LandmarkAssembler + normalize_window and the client's
+    landmarkAssembler.ts + GestureBuffer.buildTensor.
+    """
+    def __init__(self, mapping: dict):
+        super().__init__()
+        n_holistic = mapping["n_holistic"]
+        avg = torch.zeros(len(mapping["avg_index"]), n_holistic)
+        for row, (idx, w) in enumerate(zip(mapping["avg_index"], mapping["avg_weight"])):
+            avg[row, idx] = torch.tensor(w)
+        self.register_buffer("gather", torch.tensor(mapping["gather"], dtype=torch.long))
+        self.register_buffer("avg", avg)
+        self.register_buffer("type_ids", torch.tensor(mapping["type_ids"], dtype=torch.float32))
+        self.register_buffer("landmark_ids", torch.tensor(mapping["landmark_ids"], dtype=torch.float32))
+
+    def forward(self, holistic):
+        present = ~torch.isnan(holistic)                               # [T, 543, 3]
+        filled = torch.where(present, holistic, torch.zeros_like(holistic))
+        kept = holistic.index_select(1, self.gather)                   # [T, 95, 3]
+        num = torch.matmul(self.avg, filled)                           # [T, 5, 3]
+        den = torch.matmul(self.avg, present.float())
+        averaged = torch.where(den > 0, num / den.clamp(min=1e-12), torch.full_like(num, float("nan")))
+        coords = torch.cat([kept, averaged], 1).transpose(1, 2)        # [T, 3, 100]
+
+        valid = ~torch.isnan(coords)
+        count = valid.float().sum((0, 2))                              # [3]
+        filled = torch.where(valid, coords, torch.zeros_like(coords))
+        total = filled.sum((0, 2))
+        total_sq = (filled * filled).sum((0, 2))
+        mean = torch.where(count > 0, total / count.clamp(min=1), torch.zeros_like(total))
+        var = torch.where(count > 1, total_sq / count.clamp(min=1) - mean * mean, torch.ones_like(total))
+        std = torch.sqrt(var.clamp(min=1e-8))
+        coords = torch.where(valid, (coords - mean[None, :, None]) / std[None, :, None], torch.zeros_like(coords))
+
+        n = holistic.shape[0]
+        type_ids = self.type_ids.view(1, 1, -1).expand(n, 1, -1)
+        landmark_ids = self.landmark_ids.view(1, 1, -1).expand(n, 1, -1)
+        return torch.cat([type_ids, coords, landmark_ids], 1)         # [T, 5, 100]
 
 
 # ---------------------------------------------------------------------------
 # Weight loading & export
 # ---------------------------------------------------------------------------
 
+def build_model() -> SignMLPBert3Export:
+    """Instantiate the export model with the distilled config from landmark_config."""
+    from landmark_config import (
+        SEQ_LEN, NUM_CLASSES, EMBED_DIM, DENSE_DIM,
+        TRANSFO_DIM, TRANSFO_HEADS, TRANSFO_LAYERS, N_LANDMARKS,
+    )
+
+    return SignMLPBert3Export(
+        embed_dim=EMBED_DIM,
+        dense_dim=DENSE_DIM,
+        transfo_dim=TRANSFO_DIM,
+        transfo_layers=TRANSFO_LAYERS,
+        transfo_heads=TRANSFO_HEADS,
+        num_classes=NUM_CLASSES,
+        drop_rate=0,  # inference
+        n_landmarks=N_LANDMARKS,
+        max_len=SEQ_LEN,
+    )
+
+
 def load_weights(model: SignMLPBert3Export, pt_path: str):
     """Load TheoViel .pt weights into our export model, handling key name differences."""
     state = torch.load(pt_path, map_location="cpu", weights_only=False)
@@ -468,34 +576,28 @@ def load_weights(model: SignMLPBert3Export, pt_path: str):
     return model
 
 
-def main():
-    if len(sys.argv) < 2:
-        print(__doc__)
-        sys.exit(1)
-
-    weights_path = sys.argv[1]
+def main(weights_path: str | None = None, fused: bool | None = None, embedding: bool | None = None,
+         batched: bool | None = None):
+    if weights_path is None:
+        args = [a for a in sys.argv[1:] if not a.startswith("--")]
+        if not args:
+            print(__doc__)
+            sys.exit(1)
+        weights_path = args[0]
+    if fused is None:
+        fused = "--fused" in sys.argv[1:]
+    if embedding is None:
+        embedding = "--embedding" in sys.argv[1:]
+    if batched is None:
+        batched = "--batched" in sys.argv[1:]
     script_dir = Path(__file__).parent
     out_path = script_dir.parent / "models" / "saved_model" / "asl_deberta.onnx"
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    from landmark_config import (
-        SEQ_LEN, NUM_CLASSES, EMBED_DIM, DENSE_DIM,
-        TRANSFO_DIM, TRANSFO_HEADS, TRANSFO_LAYERS, N_LANDMARKS,
-        TYPE_ARRAY,
-    )
+    from landmark_config import SEQ_LEN, N_LANDMARKS, TYPE_ARRAY
 
     print("Building model...")
-    model = SignMLPBert3Export(
-        embed_dim=EMBED_DIM,
-        dense_dim=DENSE_DIM,
-        transfo_dim=TRANSFO_DIM,
-        transfo_layers=TRANSFO_LAYERS,
-        transfo_heads=TRANSFO_HEADS,
-        num_classes=NUM_CLASSES,
-        drop_rate=0,  # inference
-        n_landmarks=N_LANDMARKS,
-        max_len=SEQ_LEN,
-    )
+    model = build_model()
 
     n_params = sum(p.numel() for p in model.parameters())
     print(f"Model parameters: {n_params:,}")
@@ -527,17 +629,190 @@ def main():
         dynamo=False,
     )
 
+    # Stamp the landmark mapping version so inference can refuse mismatched preprocessing
+    import onnx
+    from landmark_mapping import METADATA_KEY, compile_mapping
+
+    mapping = compile_mapping()
+    onnx_model = onnx.load(str(out_path))
+    onnx.helper.set_model_props(onnx_model, {METADATA_KEY: mapping["version"]})
+    onnx.save(onnx_model, str(out_path))
+    print(f"Stamped {METADATA_KEY} = {mapping['version']}")
+
     import os
     size_mb = os.path.getsize(out_path) / (1024 * 1024)
     print(f"\nSaved: {out_path} ({size_mb:.1f} MB)")
 
-    # Verify with onnxruntime
+    # Verify with onnxruntime over every sequence length, not just the dummy
     try:
         import onnxruntime as ort
+        from bench_export import check_parity
+
+        sess = ort.InferenceSession(str(out_path))
+        with torch.no_grad():
+            check_parity(
+                lambda x: model(torch.from_numpy(x)).numpy(),
+                lambda x: sess.run(None, {"input": x})[0],
+            )
+    except ImportError:
+        print("(Install onnxruntime for verification)")
+
+    if fused:
+        export_fused(model, out_path.with_name("asl_deberta_fused.onnx"))
+    if embedding:
+        export_embedding(model, out_path.with_name("asl_deberta_embedding.onnx"))
+    if batched:
+        export_batched(model, out_path.with_name("asl_deberta_batched.onnx"))
+
+
+def export_fused(model: SignMLPBert3Export, out_path: Path):
+    """
+    Export with HolisticPreprocess in front: input "landmarks" [seq_len, 543, 3]
+    raw holistic frames (NaN = not detected), output logits [1, 250]. Verified
+    against the plain model fed through the Python preprocessing.
+    """
+    import onnx
+    from landmark_config import SEQ_LEN, N_HOLISTIC
+    from landmark_mapping import METADATA_KEY, compile_mapping
+
+    mapping = compile_mapping()
+    model.preprocess = HolisticPreprocess(mapping)
+    print("\nExporting fused (raw holistic input) model...")
+    dummy = torch.rand(SEQ_LEN, N_HOLISTIC, 3)
+    dummy[SEQ_LEN // 2:, 468:489] = float("nan")
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                dummy,
+                str(out_path),
+                input_names=["landmarks"],
+                output_names=["output"],
+                dynamic_axes={"landmarks": {0: "seq_len"}, "output": {0: "batch_size"}},
+                opset_version=17,
+                dynamo=False,
+            )
+    finally:
+        model.preprocess = None
+
+    onnx_model = onnx.load(str(out_path))
+    onnx.helper.set_model_props(onnx_model, {METADATA_KEY: mapping["version"], "input_layout": "holistic"})
+    onnx.save(onnx_model, str(out_path))
+
+    import os
+    size_mb = os.path.getsize(out_path) / (1024 * 1024)
+    print(f"Saved: {out_path} ({size_mb:.1f} MB)")
+
+    try:
+        import onnxruntime as ort
+        from bench_export import check_parity
+
+        sess = ort.InferenceSession(str(out_path))
+        with torch.no_grad():
+            check_parity(
+                lambda x: model(torch.from_numpy(x)).numpy(),
+                lambda x: sess.run(None, {"landmarks": x})[0],
+                name="fused onnx", kind="fused",
+            )
+    except ImportError:
+        print("(Install onnxruntime for verification)")
+
+
+def export_embedding(model: SignMLPBert3Export, out_path: Path):
+    """
+    Export the pooled representation the logits head sees: input [seq_len, 5, 100],
+    output "embedding" [1, D]. Verified against PyTorch at every length.
+    """
+    import onnx
+    from landmark_mapping import METADATA_KEY, compile_mapping
+    from bench_export import landmark_corpus
+
+    print("\nExporting embedding model...")
+    dummy = torch.from_numpy(landmark_corpus(1)[0])
+    model.output_embedding = True
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                dummy,
+                str(out_path),
+                input_names=["input"],
+                output_names=["embedding"],
+                dynamic_axes={"input": {0: "seq_len"}, "embedding": {0: "batch_size"}},
+                opset_version=17,
+                dynamo=False,
+            )
+
+        onnx_model = onnx.load(str(out_path))
+        onnx.helper.set_model_props(onnx_model, {METADATA_KEY: compile_mapping()["version"]})
+        onnx.save(onnx_model, str(out_path))
+        print(f"Saved: {out_path}")
+
+        try:
+            import onnxruntime as ort
+            from bench_export import check_parity
+
+            sess = ort.InferenceSession(str(out_path))
+            with torch.no_grad():
+                check_parity(
+                    lambda x: model(torch.from_numpy(x)).numpy(),
+                    lambda x: sess.run(None, {"input": x})[0],
+                    name="embedding onnx",
+                )
+        except ImportError:
+            print("(Install onnxruntime for verification)")
+    finally:
+        model.output_embedding = False
+
+
+def export_batched(model: SignMLPBert3Export, out_path: Path):
+    """
+    Export with a batch axis: input [batch, seq_len, 5, 100] (windows of one
+    length stacked), output [batch, 250]. Traced at batch 2 so the per-sample
+    position id blocks are in the graph; verified per window and as a batch.
+    """
+    import onnx
+    from landmark_mapping import METADATA_KEY, compile_mapping
+    from bench_export import landmark_corpus
+
+    print("\nExporting batched model...")
+    dummy = torch.from_numpy(landmark_corpus(2))
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            dummy,
+            str(out_path),
+            input_names=["input"],
+            output_names=["output"],
+            dynamic_axes={"input": {0: "batch_size", 1: "seq_len"}, "output": {0: "batch_size"}},
+            opset_version=17,
+            dynamo=False,
+        )
+
+    onnx_model = onnx.load(str(out_path))
+    onnx.helper.set_model_props(onnx_model, {METADATA_KEY: compile_mapping()["version"]})
+    onnx.save(onnx_model, str(out_path))
+    print(f"Saved: {out_path}")
+
+    try:
+        import numpy as np
+        import onnxruntime as ort
+        from bench_export import check_parity
+
         sess = ort.InferenceSession(str(out_path))
-        ort_out = sess.run(None, {"input": dummy.numpy()})
-        diff = np.abs(out.numpy() - ort_out[0]).max()
-        print(f"ONNX verification: max abs diff = {diff:.2e} {'✓' if diff < 1e-4 else '✗'}")
+        with torch.no_grad():
+            check_parity(
+                lambda x: model(torch.from_numpy(x)).numpy(),
+                lambda x: sess.run(None, {"input": x[None]})[0],
+                name="batched onnx (batch 1)", kind="batched",
+            )
+            windows = landmark_corpus(8)
+            diff = max(
+                np.abs(sess.run(None, {"input": np.ascontiguousarray(windows[:, -n:])})[0]
+                       - model(torch.from_numpy(windows[:, -n:])).numpy()).max()
+                for n in (1, 8, windows.shape[1])
+            )
+        print(f"batched onnx (batch 8) max abs diff = {diff:.2e} {'✓' if diff < 1e-4 else '✗'}")
     except ImportError:
         print("(Install onnxruntime for verification)")
 
@@ -0,0 +1,436 @@
+"""
+Local IPC transport between the Node server and a Python inference worker.
+
+Instead of POSTing every window as JSON, the server keeps one shared-memory
+ring of assembled [5, 100] frames per stream (participant) and only sends tiny
+control messages over a Unix domain socket. The worker maps the rings and
+classifies windows straight out of shared memory.
+
+Ring file (/dev/shm/asl-<pid>-<stream>.ring, little-endian):
+
+    header   b"ASLRING1" | u32 slots | u32 frame floats (500) | 48 bytes reserved
+    seq      u64[2 * slots]           frame sequence number per slot
+    frames   f32[2 * slots, 5, 100]
+
+Frame n is written to slot n % slots *and* n % slots + slots (a mirrored
+ring), so any window of up to `slots` frames is one contiguous numpy view: no
+wrap-around copy. Every writer follows the same seqlock order: it zeroes both
+copies of the slot's sequence number, then writes the frame, then stores the
+final sequence number. A reader therefore never sees a valid number over a
+half-written frame. The worker checks the window's sequence numbers before and
+after inference and reports an overrun if the writer touched it meanwhile.
+
+Control channel (Unix socket, every message = u32 length + payload):
+
+    {"op": "open", "stream": "<id>", "slots": 64}   -> {"ring": path, "slots": n, "stream_id": k}
+    {"op": "close", "stream_id": k}                 -> {"ok": true}
+    {"op": "stats"}                                 -> {"windows": ..., "overruns": ...}
+    {"op": "metrics"}                               -> metrics.REGISTRY.to_json()
+    binary "<BxxxIQI" (1, stream_id, end_seq, len)  -> {"word", "confidence", "seq"} | {"error"}
+
+IPCClient is the Python client. The Node server has no client yet: its
+recognize route only receives the client's landmark snapshots, not assembled
+frames, so wiring the worker into it is out of scope here. A Node writer would
+use positional writes on the ring file (Node core has no mmap) and follow the
+same write order as FrameRing.write.
+
+Usage:
+    python ipc_worker.py [--socket /tmp/asl-worker.sock] [--backend onnx|stub] [--model m.onnx]
+                         [--metrics-port 9464]      (GET /metrics, /metrics.json)
+    python cli.py bench ipc [--windows 2000] [--streams 4]    (vs loopback HTTP + JSON)
+"""
+
+import argparse
+import json
+import mmap
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from landmark_config import SEQ_LEN
+from metrics import REGISTRY, serve_metrics
+
+SOCKET_PATH = Path(tempfile.gettempdir()) / "asl-worker.sock"
+SHM_DIR = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+RING_MAGIC = b"ASLRING1"
+FRAME_SHAPE = (5, 100)
+FRAME_FLOATS = FRAME_SHAPE[0] * FRAME_SHAPE[1]
+HEADER_BYTES = 64
+DEFAULT_SLOTS = 64
+
+OP_INFER = 1
+_LEN = struct.Struct("<I")
+_INFER = struct.Struct("<BxxxIQI")
+_RING_HEADER = struct.Struct("<8sII")
+
+
+def ring_bytes(slots: int) -> int:
+    return HEADER_BYTES + 2 * slots * (8 + 4 * FRAME_FLOATS)
+
+
+class FrameRing:
+    """Mirrored ring of [5, 100] frames in a memory-mapped file."""
+
+    def __init__(self, path: Path, slots: int = DEFAULT_SLOTS, create: bool = False):
+        self.path = Path(path)
+        if create:
+            with open(self.path, "wb") as f:
+                f.truncate(ring_bytes(slots))
+                f.write(_RING_HEADER.pack(RING_MAGIC, slots, FRAME_FLOATS))
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.slots, floats = _RING_HEADER.unpack_from(self._map)
+        if magic != RING_MAGIC or floats != FRAME_FLOATS:
+            raise ValueError(f"{self.path} is not a frame ring")
+        self.seq = np.frombuffer(self._map, dtype="<u8", count=2 * self.slots, offset=HEADER_BYTES)
+        self.frames = np.frombuffer(self._map, dtype="<f4", count=2 * self.slots * FRAME_FLOATS,
+                                    offset=HEADER_BYTES + 16 * self.slots).reshape(2 * self.slots, *FRAME_SHAPE)
+
+    def write(self, n: int, frame: np.ndarray):
+        """Store frame number n (Python-side writer, used by the benchmark)."""
+        i = n % self.slots
+        self.seq[i] = self.seq[i + self.slots] = 0        # invalid while the frame is torn
+        self.frames[i] = self.frames[i + self.slots] = frame
+        self.seq[i] = self.seq[i + self.slots] = n + 1    # 0 = never written / being written
+
+    def window(self, end: int, length: int) -> np.ndarray:
+        """Zero-copy view of frames [end - length, end)."""
+        if not 0 < length <= self.slots:
+            raise ValueError(f"window length {length} outside 1..{self.slots}")
+        start = (end - length) % self.slots
+        return self.frames[start:start + length]
+
+    def intact(self, end: int, length: int) -> bool:
+        """True while every frame of the window is still the one requested."""
+        start = (end - length) % self.slots
+        expected = np.arange(end - length + 1, end + 1, dtype=np.uint64)
+        return np.array_equal(self.seq[start:start + length], expected)
+
+    def close(self):
+        self.seq = self.frames = None
+        self._map.close()
+        self._file.close()
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def make_backend(backend: str, model: Path | None):
+    """(classify(window [L, 5, 100], room) -> dict) for the worker and the HTTP baseline."""
+    if backend == "stub":
+        return lambda window, room=None: {"word": "", "confidence": 0.0}
+    from asl_inference import ASLRecognizer, MODEL_PATH
+
+    recognizer = ASLRecognizer(model or MODEL_PATH)
+
+    def classify(window, room=None):
+        result = recognizer.classify_window(window, room)
+        return {"word": result["word"], "confidence": result["confidence"]}
+    return classify
+
+
+def _recv_exact(sock, n: int) -> bytes | None:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def _send(sock, payload: dict):
+    body = json.dumps(payload).encode()
+    sock.sendall(_LEN.pack(len(body)) + body)
+
+
+class InferenceWorker(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, classify):
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            socket_path.unlink()
+        self.classify = classify
+        self.rings: dict[int, FrameRing] = {}
+        self.names: dict[int, str] = {}
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.windows = 0
+        self.overruns = 0
+        super().__init__(str(socket_path), _Handler)
+
+    def open_ring(self, stream: str, slots: int) -> dict:
+        with self.lock:
+            stream_id, self.next_id = self.next_id, self.next_id + 1
+        path = SHM_DIR / f"asl-{os.getpid()}-{stream_id}.ring"
+        self.rings[stream_id] = FrameRing(path, slots, create=True)
+        self.names[stream_id] = stream
+        return {"ring": str(path), "slots": slots, "stream_id": stream_id}
+
+    def close_ring(self, stream_id: int):
+        ring = self.rings.pop(stream_id, None)
+        self.names.pop(stream_id, None)
+        if ring is not None:
+            ring.close()
+            ring.path.unlink(missing_ok=True)
+
+    def infer(self, stream_id: int, end: int, length: int) -> dict:
+        with REGISTRY.in_flight():
+            return self._infer(stream_id, end, length)
+
+    def _infer(self, stream_id: int, end: int, length: int) -> dict:
+        ring = self.rings.get(stream_id)
+        if ring is None:
+            return {"error": f"unknown stream {stream_id}"}
+        with REGISTRY.time("decode"):
+            if not ring.intact(end, length):
+                self.overruns += 1
+                return {"error": "window not in ring", "seq": end}
+            window = ring.window(end, length)
+        result = self.classify(window, self.names[stream_id])
+        if not ring.intact(end, length):
+            self.overruns += 1
+            return {"error": "overrun", "seq": end}
+        self.windows += 1
+        return {**result, "seq": end}
+
+    def server_close(self):
+        for stream_id in list(self.rings):
+            self.close_ring(stream_id)
+        super().server_close()
+        Path(self.server_address).unlink(missing_ok=True)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        worker: InferenceWorker = self.server
+        sock = self.request
+        opened = []
+        try:
+            while True:
+                head = _recv_exact(sock, _LEN.size)
+                if head is None:
+                    return
+                body = _recv_exact(sock, _LEN.unpack(head)[0])
+                if body is None:
+                    return
+                if body[0] == OP_INFER:
+                    _, stream_id, end, length = _INFER.unpack(body)
+                    _send(sock, worker.infer(stream_id, end, length))
+                    continue
+                msg = json.loads(body)
+                if msg["op"] == "open":
+                    reply = worker.open_ring(msg.get("stream", ""), int(msg.get("slots", DEFAULT_SLOTS)))
+                    opened.append(reply["stream_id"])
+                    _send(sock, reply)
+                elif msg["op"] == "close":
+                    worker.close_ring(msg["stream_id"])
+                    _send(sock, {"ok": True})
+                elif msg["op"] == "metrics":
+                    _send(sock, REGISTRY.to_json())
+                elif msg["op"] == "stats":
+                    _send(sock, {"windows": worker.windows, "overruns": worker.overruns,
+                                 "streams": len(worker.rings)})
+                else:
+                    _send(sock, {"error": f"unknown op {msg['op']}"})
+        finally:
+            for stream_id in opened:   # a disconnected server drops its rings
+                worker.close_ring(stream_id)
+
+
+class IPCClient:
+    """Client side of the worker protocol (benchmarks, tests, Python callers)."""
+
+    def __init__(self, socket_path: Path = SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(str(socket_path))
+        self.rings: dict[int, FrameRing] = {}
+        self.written: dict[int, int] = {}
+
+    def _call(self, payload: bytes) -> dict:
+        self.sock.sendall(_LEN.pack(len(payload)) + payload)
+        head = _recv_exact(self.sock, _LEN.size)
+        return json.loads(_recv_exact(self.sock, _LEN.unpack(head)[0]))
+
+    def open(self, stream: str, slots: int = DEFAULT_SLOTS) -> int:
+        reply = self._call(json.dumps({"op": "open", "stream": stream, "slots": slots}).encode())
+        self.rings[reply["stream_id"]] = FrameRing(reply["ring"])
+        self.written[reply["stream_id"]] = 0
+        return reply["stream_id"]
+
+    def push(self, stream_id: int, frame: np.ndarray):
+        self.rings[stream_id].write(self.written[stream_id], frame)
+        self.written[stream_id] += 1
+
+    def classify(self, stream_id: int, length: int = SEQ_LEN) -> dict:
+        return self._call(_INFER.pack(OP_INFER, stream_id, self.written[stream_id], length))
+
+    def stats(self) -> dict:
+        return self._call(b'{"op": "stats"}')
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.sock.close()
+
+
+# ---------------------------------------------------------------------------
+# Loopback HTTP + JSON baseline
+# ---------------------------------------------------------------------------
+
+def serve_http(port: int, classify):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True   # headers and body go out as separate writes
+
+        def do_POST(self):
+            msg = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            window = np.asarray(msg["frames"], dtype=np.float32)
+            payload = json.dumps(classify(window, msg.get("stream"))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    print(f"Serving HTTP on 127.0.0.1:{port}", flush=True)
+    server.serve_forever()
+
+
+def _spawn(args: list[str]):
+    import subprocess
+
+    proc = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), *args],
+                            cwd=Path(__file__).parent, stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.startswith("Serving"):
+            return proc
+    raise RuntimeError("worker failed to start")
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench ipc`: messages/sec and latency percentiles of classifying
+    SEQ_LEN windows over Unix socket + shared-memory rings vs loopback HTTP with
+    the window as JSON, each against a worker subprocess. Streams advance
+    `stride` frames between windows, as the client does.
+    """
+    import http.client
+
+    parser = argparse.ArgumentParser(prog="bench ipc")
+    parser.add_argument("--windows", type=int, default=2000)
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--stride", type=int, default=4)
+    parser.add_argument("--backend", choices=["stub", "onnx"], default="stub",
+                        help="stub isolates transport cost; onnx includes inference")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    frames = rng.uniform(0, 1, (256, *FRAME_SHAPE)).astype(np.float32)
+    sock_path = Path(tempfile.gettempdir()) / f"asl-bench-{os.getpid()}.sock"
+    results = {}
+
+    def measure(name, push, classify):
+        lat = []
+        n = 0
+        for w in range(args.windows + 50):
+            stream = w % args.streams
+            for _ in range(args.stride if w >= args.streams else SEQ_LEN):
+                push(stream, frames[n % len(frames)])
+                n += 1
+            t0 = time.perf_counter()
+            reply = classify(stream)
+            if w >= 50:   # warm-up
+                lat.append((time.perf_counter() - t0) * 1000)
+            if "error" in reply:
+                raise RuntimeError(f"{name}: {reply['error']}")
+        lat = np.asarray(lat)
+        results[name] = {"msgs_per_s": 1000 / lat.mean(), "p50_ms": float(np.percentile(lat, 50)),
+                         "p99_ms": float(np.percentile(lat, 99))}
+
+    worker = _spawn(["--socket", str(sock_path), "--backend", args.backend])
+    try:
+        client = IPCClient(sock_path)
+        ids = [client.open(f"bench-{i}") for i in range(args.streams)]
+        measure("unix+shm", lambda s, f: client.push(ids[s], f), lambda s: client.classify(ids[s]))
+        stats = client.stats()
+        client.close()
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    http_worker = _spawn(["--http", str(args.port), "--backend", args.backend])
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", args.port)
+        buffers = [[] for _ in range(args.streams)]
+
+        def push(s, f):
+            buffers[s] = (buffers[s] + [f])[-SEQ_LEN:]
+
+        def classify(s):
+            body = json.dumps({"stream": s, "frames": np.stack(buffers[s]).tolist()})
+            conn.request("POST", "/classify", body=body, headers={"Content-Type": "application/json"})
+            return json.loads(conn.getresponse().read())
+
+        measure("http+json", push, classify)
+        conn.close()
+    finally:
+        http_worker.terminate()
+        http_worker.wait()
+
+    base = results["http+json"]["p50_ms"]
+    print(f"{args.windows} windows of {SEQ_LEN} frames over {args.streams} streams, backend {args.backend} "
+          f"(worker overruns: {stats['overruns']})")
+    for name, r in results.items():
+        print(f"  {name:<10} {r['msgs_per_s']:8,.0f} msg/s  p50 {r['p50_ms']:6.3f} ms  "
+              f"p99 {r['p99_ms']:6.3f} ms  ({base / r['p50_ms']:4.1f}x)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Python inference worker over Unix socket + shared memory")
+    parser.add_argument("--socket", type=Path, default=SOCKET_PATH)
+    parser.add_argument("--backend", choices=["onnx", "stub"], default="onnx")
+    parser.add_argument("--model", type=Path, default=None)
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve /metrics and /metrics.json")
+    parser.add_argument("--http", type=int, default=None, help=argparse.SUPPRESS)   # benchmark baseline
+    args = parser.parse_args(argv)
+
+    classify = make_backend(args.backend, args.model)
+    if args.http:
+        serve_http(args.http, classify)
+        return
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    worker = InferenceWorker(args.socket, classify)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))   # still clean up rings + socket
+    print(f"Serving {args.backend} on {args.socket} (rings in {SHM_DIR})", flush=True)
+    try:
+        worker.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        worker.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Batched on-the-fly landmark augmentation.
+
+Every transform runs on a whole batch tensor at once (per-sample random
+parameters, no Python loop over samples), so it can live in the DataLoader's
+collate_fn and run inside the worker processes:
+
+    loader = DataLoader(ds, batch_size=64, num_workers=2,
+                        collate_fn=AugmentCollate(BatchAugment("hands")))
+
+Layouts:
+    "hands"  [B, T, 126]      collect_landmarks / train_model; left hand 0-62,
+                              right hand 63-125; missing points are 0
+    "kept"   [B, T, 5, 100]   DeBERTa input (type, x, y, z, landmark_id);
+                              missing points are NaN
+
+Transforms (each applied to a random subset of the batch):
+    affine     scale, in-plane rotation and shift around each sample's centroid
+    resample   temporal speed change (nearest-frame, like pad_or_truncate)
+    mirror     x -> 1 - x and swap left/right landmarks (MIRROR_PAIRS)
+    dropout    drop individual landmarks per frame
+
+Benchmark: python cli.py bench augment
+"""
+
+import math
+
+import torch
+from torch.utils.data import default_collate
+
+from landmark_config import KEPT_FLAT, MIRROR_AVG_PAIRS, MIRROR_PAIRS, N_KEPT
+
+LANDMARKS_PER_HAND = 21
+
+
+def mirror_permutation(layout: str) -> list[int]:
+    """Landmark order after mirroring: out[i] = in[perm[i]]."""
+    if layout == "hands":
+        n = LANDMARKS_PER_HAND
+        return list(range(n, 2 * n)) + list(range(n))
+    mirror = {}
+    for a, b in MIRROR_PAIRS:
+        mirror[a], mirror[b] = b, a
+    position = {idx: i for i, idx in enumerate(KEPT_FLAT)}
+    perm = [position[mirror.get(idx, idx)] for idx in KEPT_FLAT]
+    avg = list(range(N_KEPT, N_KEPT + 5))
+    for a, b in MIRROR_AVG_PAIRS:
+        avg[a], avg[b] = N_KEPT + b, N_KEPT + a
+    return perm + avg
+
+
+class BatchAugment:
+    """Random landmark augmentation of a float batch in the given layout."""
+
+    def __init__(self, layout: str = "hands", p_affine: float = 0.8, scale: tuple = (0.85, 1.15),
+                 rotate_deg: float = 15.0, shift: float = 0.05, p_resample: float = 0.5,
+                 speed: tuple = (0.8, 1.25), p_mirror: float = 0.5, p_dropout: float = 0.5,
+                 drop_rate: float = 0.05):
+        if layout not in ("hands", "kept"):
+            raise ValueError(f"Unknown layout '{layout}' (expected 'hands' or 'kept')")
+        self.layout = layout
+        self.p_affine, self.scale, self.rotate = p_affine, scale, math.radians(rotate_deg)
+        self.shift = shift
+        self.p_resample, self.speed = p_resample, speed
+        self.p_mirror = p_mirror
+        self.p_dropout, self.drop_rate = p_dropout, drop_rate
+        self.mirror_perm = torch.tensor(mirror_permutation(layout))
+
+    # layout <-> (coords [B, T, 3, L], valid [B, T, L]). Channels-first keeps the
+    # landmark axis innermost, so masks broadcast over contiguous rows.
+    def _split(self, x: torch.Tensor):
+        if self.layout == "hands":
+            points = x.reshape(*x.shape[:2], -1, 3)
+            return points.transpose(2, 3).contiguous(), points.ne(0).any(-1)
+        coords = x[:, :, 1:4, :].clone()
+        valid = ~coords.isnan().any(2)
+        return coords.nan_to_num_(), valid
+
+    def _join(self, x: torch.Tensor, coords: torch.Tensor, valid: torch.Tensor) -> torch.Tensor:
+        if self.layout == "hands":
+            return coords.mul_(valid.unsqueeze(2)).transpose(2, 3).reshape(x.shape)
+        coords.masked_fill_(~valid.unsqueeze(2), math.nan)
+        out = x.clone()
+        out[:, :, 1:4, :] = coords
+        return out
+
+    # Each transform edits only the chosen samples (an index tensor) in place,
+    # via index_select / index_copy_ (much cheaper than advanced indexing here).
+    def affine(self, coords, valid, idx):
+        n = len(idx)
+        sub, w = coords.index_select(0, idx), valid.index_select(0, idx).unsqueeze(2).float()
+        center = (sub * w).sum((1, 3)) / w.sum((1, 3)).clamp(min=1)        # [n, 3]
+        s = torch.empty(n).uniform_(*self.scale)
+        theta = torch.empty(n).uniform_(-self.rotate, self.rotate)
+        cos, sin = torch.cos(theta) * s, torch.sin(theta) * s
+        shift = torch.empty(n, 2).uniform_(-self.shift, self.shift)
+        # p' = M (p - c) + c + shift with M = s * [[cos, -sin], [sin, cos]] on x/y and s on z
+        px, py, pz = (sub[:, :, i] - center[:, i, None, None] for i in range(3))
+        cos, sin, s = cos[:, None, None], sin[:, None, None], s[:, None, None]
+        out = torch.stack([
+            cos * px - sin * py + (center[:, 0] + shift[:, 0])[:, None, None],
+            sin * px + cos * py + (center[:, 1] + shift[:, 1])[:, None, None],
+            s * pz + center[:, 2, None, None],
+        ], dim=2)
+        coords.index_copy_(0, idx, out)
+
+    def resample(self, coords, valid, idx):
+        t = coords.shape[1]
+        rate = torch.empty(len(idx)).uniform_(*self.speed)
+        src = torch.round(torch.arange(t).unsqueeze(0) * rate.unsqueeze(1)).long()   # [n, T]
+        inside = src < t
+        src = src.clamp(max=t - 1)
+        sub_valid = torch.gather(valid.index_select(0, idx), 1,
+                                 src[:, :, None].expand(-1, -1, valid.shape[2]))
+        sub = torch.gather(coords.index_select(0, idx), 1,
+                           src[:, :, None, None].expand(-1, -1, *coords.shape[2:]))
+        coords.index_copy_(0, idx, sub)
+        valid.index_copy_(0, idx, sub_valid & inside.unsqueeze(-1))
+
+    def mirror(self, coords, valid, idx):
+        sub = coords.index_select(0, idx).index_select(3, self.mirror_perm)
+        sub[:, :, 0] = 1.0 - sub[:, :, 0]
+        coords.index_copy_(0, idx, sub)
+        valid.index_copy_(0, idx, valid.index_select(0, idx).index_select(2, self.mirror_perm))
+
+    def dropout(self, coords, valid, idx):
+        keep = torch.rand(len(idx), *valid.shape[1:]) >= self.drop_rate
+        valid.index_copy_(0, idx, valid.index_select(0, idx) & keep)
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        coords, valid = self._split(x)
+        for transform, p in ((self.mirror, self.p_mirror), (self.affine, self.p_affine),
+                             (self.resample, self.p_resample), (self.dropout, self.p_dropout)):
+            idx = torch.nonzero(torch.rand(x.shape[0]) < p).squeeze(1)
+            if len(idx):
+                transform(coords, valid, idx)
+        return self._join(x, coords, valid)
+
+
+class AugmentCollate:
+    """collate_fn that batches (x, y) samples, then augments x as one tensor."""
+
+    def __init__(self, augment: BatchAugment):
+        self.augment = augment
+
+    def __call__(self, batch):
+        x, y = default_collate(batch)
+        with torch.no_grad():
+            return self.augment(x.float()), y
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench augment`: BiLSTM training step time with and without
+    augmentation in the loader workers, plus the raw per-batch augment cost.
+    """
+    import argparse
+    import statistics
+    import time
+
+    import numpy as np
+    from torch.utils.data import DataLoader, TensorDataset
+
+    from train_model import ASLClassifier, NUM_FEATURES, SEQ_LEN
+
+    parser = argparse.ArgumentParser(prog="bench augment")
+    parser.add_argument("--samples", type=int, default=4096)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--epochs", type=int, default=5, help="timed epochs per side")
+    args = parser.parse_args(argv)
+
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.2, 0.8, (args.samples, SEQ_LEN, NUM_FEATURES)).astype(np.float32)
+    X[:, SEQ_LEN * 3 // 4:] = 0.0            # padded tail
+    X[rng.random((args.samples, SEQ_LEN)) < 0.3, :63] = 0.0  # missing left hand
+    ds = TensorDataset(torch.from_numpy(X), torch.from_numpy(rng.integers(0, 250, args.samples)))
+
+    augment = BatchAugment("hands")
+    batch = torch.from_numpy(X[:args.batch_size])
+    augment(batch)
+    t0 = time.perf_counter()
+    for _ in range(50):
+        augment(batch)
+    per_batch_ms = (time.perf_counter() - t0) / 50 * 1000
+
+    torch.manual_seed(0)
+    model = ASLClassifier(NUM_FEATURES, 250)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    criterion = torch.nn.CrossEntropyLoss()
+    loaders = {
+        name: DataLoader(ds, batch_size=args.batch_size, shuffle=True, num_workers=args.workers,
+                         persistent_workers=args.workers > 0, collate_fn=collate_fn)
+        for name, collate_fn in [("plain", None), ("augmented", AugmentCollate(augment))]
+    }
+
+    def epoch_ms(loader) -> float:
+        t0, steps = time.perf_counter(), 0
+        for batch_x, batch_y in loader:
+            optimizer.zero_grad()
+            loss = criterion(model(batch_x), batch_y)
+            loss.backward()
+            optimizer.step()
+            steps += 1
+        return (time.perf_counter() - t0) / steps * 1000
+
+    # Alternate epochs so drift (thermal, other load) hits both sides; the
+    # first round only warms up the workers. Medians of the rest.
+    times = {name: [] for name in loaders}
+    for round_ in range(args.epochs + 1):
+        for name, loader in loaders.items():
+            ms = epoch_ms(loader)
+            if round_:
+                times[name].append(ms)
+    plain, augmented = (statistics.median(times[n]) for n in ("plain", "augmented"))
+    overhead = (augmented - plain) / plain * 100
+    print(f"Augment cost: {per_batch_ms:.2f} ms per batch of {args.batch_size} (in-process)")
+    print(f"Train step, {args.workers} loader workers: plain {plain:.1f} ms, "
+          f"augmented {augmented:.1f} ms ({overhead:+.1f}%) "
+          f"{'✓' if overhead < 5 else '✗'} (target < 5%)")
+    return {"augment_ms_per_batch": per_batch_ms, "step_ms_plain": plain,
+            "step_ms_augmented": augmented, "overhead_pct": overhead}
@@ -2,10 +2,11 @@
 Landmark configuration for TheoViel DeBERTa ASL model.
 
 Maps 543 MediaPipe holistic landmarks -> 100 kept landmarks (95 selected + 5 averaged).
-Mirrors client/src/features/asl/models/labelMap.ts — keep in sync.
-"""
 
-import numpy as np
+This file is the single source of truth. landmark_mapping.py compiles it into a
+versioned artifact (data/processed/landmark_mapping.json) that the Python
+inference code and the generated client labelMap.ts both consume.
+"""
 
 # Indices into the 543-point MediaPipe holistic coordinate space.
 # Order: pose 0-32, face 33-500(468 mesh pts offset by 33 in holistic), left hand 468-488, right hand 522-542 (but below are raw holistic indices).
@@ -41,11 +42,28 @@ TO_AVG = [
     [1, 2, 98, 327, 168],                            # nose
 ]
 
+# Left/right mirror pairs in holistic index space (face mesh 0-467, left hand
+# 468-488, pose 489-521, right hand 522-542). Indices not listed mirror onto
+# themselves. Used by landmark_augment.py for hand-swap mirroring; not part of
+# the compiled mapping.
+MIRROR_PAIRS = (
+    [(468 + i, 522 + i) for i in range(21)]                                   # hands
+    + [(500 + 2 * i, 501 + 2 * i) for i in range(6)]                          # arms (pose 11-22)
+    + [(54, 284), (67, 297), (132, 361), (150, 379), (162, 389), (172, 397),  # silhouette
+       (176, 400), (234, 454)]
+    + [(37, 267), (40, 270), (61, 291), (78, 308), (81, 311), (84, 314),      # lips
+       (87, 317), (88, 318), (91, 321), (191, 415)]
+    + [(205, 425)]                                                            # cheeks
+)
+# TO_AVG rows that swap under mirroring (eyes, eyebrows; the nose is central)
+MIRROR_AVG_PAIRS = [(0, 1), (2, 3)]
+
 # Flat list of all 95 kept holistic indices
-KEPT_FLAT = np.concatenate(KEPT_LANDMARKS).tolist()          # len 95
-N_KEPT = len(KEPT_FLAT)                                       # 95
-N_AVG = len(TO_AVG)                                           # 5
-N_LANDMARKS = N_KEPT + N_AVG                                  # 100
+KEPT_FLAT = [idx for group in KEPT_LANDMARKS for idx in group]  # len 95
+N_KEPT = len(KEPT_FLAT)                                         # 95
+N_AVG = len(TO_AVG)                                             # 5
+N_LANDMARKS = N_KEPT + N_AVG                                    # 100
+N_HOLISTIC = 543
 
 # Build the 100-element type array
 TYPE_ARRAY: list[int] = []
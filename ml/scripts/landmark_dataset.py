@@ -0,0 +1,196 @@
+"""
+Participant-sharded Arrow IPC landmark dataset.
+
+Layout (data/processed/shards/):
+    participant=<id>.arrow   one Arrow IPC file per participant; a single
+                             `frames` column of fixed_size_list<float32, 126>,
+                             every sequence's raw frames back to back
+    index.arrow              one row per sequence: sign, label, participant_id,
+                             sequence_id, length, offset (first frame row in
+                             its participant shard)
+    label_map.json           index -> word, as before
+
+Shards are memory-mapped, so a sequence read is a zero-copy slice. Adding a
+participant writes one new shard plus a new (small) index; existing shards are
+never rewritten. Participant-held-out splits are index filters.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+SHARD_DIR = PROJECT_DIR / "data" / "processed" / "shards"
+INDEX_NAME = "index.arrow"
+
+FEATURES_PER_FRAME = 126  # 42 hand landmarks × 3 coords
+INDEX_COLUMNS = ["sign", "label", "participant_id", "sequence_id", "length", "offset"]
+
+
+def shard_name(participant_id) -> str:
+    return f"participant={participant_id}.arrow"
+
+
+def _atomic_write_ipc(path: Path, table):
+    import pyarrow as pa
+
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    try:
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_participant_shard(shard_dir: Path, participant_id, sequences: list[tuple]) -> list[dict]:
+    """
+    sequences: [(sequence_id, sign, label, frames[num_frames, 126]), ...]
+    Writes participant=<id>.arrow and returns its index rows.
+    """
+    import pyarrow as pa
+
+    rows, offset = [], 0
+    for sequence_id, sign, label, frames in sequences:
+        rows.append({
+            "sign": sign, "label": int(label), "participant_id": int(participant_id),
+            "sequence_id": int(sequence_id), "length": len(frames), "offset": offset,
+        })
+        offset += len(frames)
+
+    flat = (np.concatenate([s[3] for s in sequences]) if sequences
+            else np.zeros((0, FEATURES_PER_FRAME), np.float32)).astype(np.float32, copy=False)
+    frames = pa.FixedSizeListArray.from_arrays(pa.array(flat.reshape(-1)), FEATURES_PER_FRAME)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    _atomic_write_ipc(shard_dir / shard_name(participant_id), pa.table({"frames": frames}))
+    return rows
+
+
+def read_index(shard_dir: Path = SHARD_DIR):
+    import pyarrow as pa
+
+    path = shard_dir / INDEX_NAME
+    if not path.exists():
+        return None
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_index(shard_dir: Path, new_rows: list[dict], replace_participants: set[int]):
+    """Merge new rows into the index, replacing rows of re-written participants."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    schema = pa.schema([
+        ("sign", pa.string()), ("label", pa.int32()), ("participant_id", pa.int64()),
+        ("sequence_id", pa.int64()), ("length", pa.int32()), ("offset", pa.int64()),
+    ])
+    added = pa.Table.from_pylist(new_rows, schema=schema)
+    old = read_index(shard_dir)
+    if old is not None and old.num_rows:
+        keep = pc.invert(pc.is_in(old["participant_id"], pa.array(sorted(replace_participants), pa.int64())))
+        added = pa.concat_tables([old.filter(keep).cast(schema), added])
+    added = added.sort_by([("participant_id", "ascending"), ("offset", "ascending")])
+    _atomic_write_ipc(shard_dir / INDEX_NAME, added)
+    return added
+
+
+def existing_participants(shard_dir: Path = SHARD_DIR) -> set[int]:
+    index = read_index(shard_dir)
+    if index is None:
+        return set()
+    return {p for p in index["participant_id"].to_pylist()
+            if (shard_dir / shard_name(p)).exists()}
+
+
+class ShardedLandmarks:
+    """
+    Map-style view over the shard index. __getitem__ returns
+    (frames[seq_len, 126] float32, label) after pad/truncate, reading the
+    participant shard through a per-process memory map.
+    """
+
+    def __init__(self, shard_dir: Path = SHARD_DIR, seq_len: int = 32,
+                 participants=None, max_per_sign: int | None = None, rows=None):
+        self.shard_dir = Path(shard_dir)
+        self.seq_len = seq_len
+        if rows is None:
+            index = read_index(self.shard_dir)
+            if index is None:
+                raise FileNotFoundError(f"No {INDEX_NAME} in {self.shard_dir} — run collect first")
+            rows = {c: index[c].to_numpy(zero_copy_only=False) for c in INDEX_COLUMNS}
+        if participants is not None:
+            mask = np.isin(rows["participant_id"], np.asarray(sorted(participants)))
+            rows = {c: v[mask] for c, v in rows.items()}
+        if max_per_sign:
+            rows = _cap_per_sign(rows, max_per_sign)
+        self.rows = rows
+        self._maps: dict[int, np.ndarray] = {}
+        self._pid = None
+
+    def __len__(self) -> int:
+        return len(self.rows["label"])
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.rows["label"]
+
+    @property
+    def participants(self) -> np.ndarray:
+        return np.unique(self.rows["participant_id"])
+
+    def _frames(self, participant_id: int) -> np.ndarray:
+        # Memory maps are per process: DataLoader workers re-open after fork
+        if self._pid != os.getpid():
+            self._maps, self._pid = {}, os.getpid()
+        view = self._maps.get(participant_id)
+        if view is None:
+            import pyarrow as pa
+
+            source = pa.memory_map(str(self.shard_dir / shard_name(participant_id)))
+            column = pa.ipc.open_file(source).read_all().column("frames").combine_chunks()
+            view = column.values.to_numpy().reshape(-1, FEATURES_PER_FRAME)  # zero-copy
+            self._maps[participant_id] = view
+        return view
+
+    def raw(self, i: int) -> np.ndarray:
+        """Unpadded [length, 126] frames of sequence i (a view into the shard)."""
+        offset, length = int(self.rows["offset"][i]), int(self.rows["length"][i])
+        return self._frames(int(self.rows["participant_id"][i]))[offset:offset + length]
+
+    def __getitem__(self, i: int):
+        from collect_landmarks import pad_or_truncate
+
+        # Copy out of the read-only map (pad_or_truncate returns the view as-is at seq_len)
+        return np.array(pad_or_truncate(self.raw(i), self.seq_len)), int(self.rows["label"][i])
+
+    def subset(self, positions: np.ndarray) -> "ShardedLandmarks":
+        rows = {c: v[positions] for c, v in self.rows.items()}
+        return ShardedLandmarks(self.shard_dir, self.seq_len, rows=rows)
+
+    def split_by_participant(self, holdout_frac: float = 0.15, seed: int = 42):
+        """(train, test) with whole participants held out of train."""
+        rng = np.random.default_rng(seed)
+        people = self.participants.copy()
+        rng.shuffle(people)
+        n_test = max(1, int(round(len(people) * holdout_frac)))
+        test_mask = np.isin(self.rows["participant_id"], people[:n_test])
+        return self.subset(np.flatnonzero(~test_mask)), self.subset(np.flatnonzero(test_mask))
+
+
+def _cap_per_sign(rows: dict, max_per_sign: int) -> dict:
+    order = np.argsort(rows["label"], kind="stable")
+    labels = rows["label"][order]
+    starts = np.searchsorted(labels, labels, side="left")
+    rank = np.arange(len(labels)) - starts
+    keep = np.sort(order[rank < max_per_sign])
+    return {c: v[keep] for c, v in rows.items()}
+
+
+def save_label_map(shard_dir: Path, sign_map: dict):
+    index_to_sign = {v: k for k, v in sign_map.items()}
+    with open(shard_dir / "label_map.json", "w") as f:
+        json.dump(index_to_sign, f, indent=2)
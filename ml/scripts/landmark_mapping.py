@@ -0,0 +1,109 @@
+"""
+Compile landmark_config.py into a versioned mapping artifact.
+
+The artifact holds everything preprocessing needs to turn a [543, 3] holistic
+frame into the model's [5, 100] frame: gather indices, per-group sizes, averaging
+indices + weights, type ids and landmark ids. Its version is a hash of that
+content. export_deberta_onnx.py stamps the version into the ONNX metadata, the
+deploy step ships it to the client, and inference refuses a model whose stamped
+version differs from the mapping it was handed.
+
+Usage:
+    python landmark_mapping.py          # (re)compile data/processed/landmark_mapping.json
+
+Output: data/processed/landmark_mapping.json
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from landmark_config import (
+    KEPT_LANDMARKS, KEPT_FLAT, TO_AVG, TYPE_ARRAY,
+    N_HOLISTIC, N_LANDMARKS, NUM_FEATURES, SEQ_LEN,
+)
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MAPPING_PATH = PROJECT_DIR / "data" / "processed" / "landmark_mapping.json"
+
+FORMAT_VERSION = 1
+METADATA_KEY = "landmark_mapping_version"  # ONNX metadata_props key
+
+
+class MappingVersionError(RuntimeError):
+    """Model and preprocessing were built from different landmark mappings."""
+
+
+def _content_hash(body: dict) -> str:
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(canonical).hexdigest()[:16]
+
+
+def build_mapping() -> dict:
+    body = {
+        "format": FORMAT_VERSION,
+        "n_holistic": N_HOLISTIC,
+        "n_landmarks": N_LANDMARKS,
+        "num_features": NUM_FEATURES,
+        "seq_len": SEQ_LEN,
+        "gather": KEPT_FLAT,
+        "group_sizes": [len(g) for g in KEPT_LANDMARKS],
+        "avg_index": TO_AVG,
+        "avg_weight": [[1.0 / len(g)] * len(g) for g in TO_AVG],
+        "type_ids": TYPE_ARRAY,
+        "landmark_ids": list(range(1, N_LANDMARKS + 1)),
+    }
+    return {"version": _content_hash(body), **body}
+
+
+def compile_mapping(path: Path = MAPPING_PATH) -> dict:
+    mapping = build_mapping()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(mapping, f, separators=(",", ":"))
+        f.write("\n")
+    return mapping
+
+
+def load_mapping(path: Path = MAPPING_PATH) -> dict:
+    """Load and integrity-check a compiled mapping (hash must match its content)."""
+    with open(path) as f:
+        mapping = json.load(f)
+    body = {k: v for k, v in mapping.items() if k != "version"}
+    if mapping.get("format") != FORMAT_VERSION or _content_hash(body) != mapping.get("version"):
+        raise MappingVersionError(
+            f"{path} is corrupt or from another format — rerun landmark_mapping.py")
+    return mapping
+
+
+def kept_groups(mapping: dict) -> list[list[int]]:
+    """Split the flat gather list back into KEPT_LANDMARKS-style groups."""
+    groups, start = [], 0
+    for size in mapping["group_sizes"]:
+        groups.append(mapping["gather"][start:start + size])
+        start += size
+    return groups
+
+
+def check_model_version(metadata: dict, mapping: dict, strict: bool = False):
+    """
+    Compare the version stamped in ONNX metadata (session.get_modelmeta().custom_metadata_map
+    or onnx model.metadata_props) with `mapping`. Raises MappingVersionError on mismatch;
+    models exported before versioning only warn unless `strict`.
+    """
+    stamped = metadata.get(METADATA_KEY)
+    if stamped is None:
+        if strict:
+            raise MappingVersionError("Model has no landmark mapping version — re-export it")
+        print(f"Warning: model has no {METADATA_KEY}; cannot verify preprocessing")
+        return
+    if stamped != mapping["version"]:
+        raise MappingVersionError(
+            f"Model was exported with landmark mapping {stamped}, "
+            f"but preprocessing uses {mapping['version']}")
+
+
+if __name__ == "__main__":
+    m = compile_mapping()
+    print(f"Compiled landmark mapping {m['version']} -> {MAPPING_PATH}")
@@ -0,0 +1,357 @@
+"""
+Multi-room load test for the recognition path.
+
+Simulates N concurrent rooms, each producing a holistic landmark stream at a
+fixed fps and sending the last SEQ_LEN frames every `stride` frames the way the
+client does: one request in flight per room, and a window that comes due while
+the previous request is still pending is dropped. Reports per-room end-to-end
+latency percentiles, dropped windows and server/client CPU as N grows.
+
+Usage:
+    python load_test.py [--rooms 1,2,4,8] [--fps 30] [--duration 10]
+                        [--backend onnx|stub] [--stub-ms 300]
+                        [--source kaggle|procedural] [--url http://host:port]
+
+Backends (started as a local subprocess unless --url is given):
+    onnx    ASLRecognizer over models/saved_model/asl_deberta.onnx (or --model)
+    stub    stands in for the LLM-backed /asl/recognize route: sleeps --stub-ms
+            and returns an empty sign, to size the server side without API calls
+
+Wire format: POST /asl/recognize, body = raw float32 [frames, 543, 3] (NaN =
+missing), response = JSON {word, confidence}. The service also answers
+GET /metrics and /metrics.json (metrics.py), and the run saves the final
+scrape next to the report.
+
+Streams: `kaggle` replays random Kaggle clips with per-room jitter (small
+global shift/scale + noise) separated by hands-down pauses; `procedural`
+needs no data and moves two hand templates along smooth paths in front of a
+static face/pose.
+
+Output: models/saved_model/load_test.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+from landmark_config import KEPT_LANDMARKS, N_HOLISTIC, SEQ_LEN
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
+OUTPUT_PATH = MODEL_DIR / "load_test.json"
+
+ROUTE = "/asl/recognize"
+STRIDE = 4                    # frames between windows, as the client gesture buffer
+LEFT_HAND = np.array(KEPT_LANDMARKS[0])
+RIGHT_HAND = np.array(KEPT_LANDMARKS[1])
+
+
+# ---------------------------------------------------------------------------
+# Synthetic landmark streams
+# ---------------------------------------------------------------------------
+
+def kaggle_stream(n_frames: int, seed: int) -> np.ndarray:
+    """Replayed Kaggle clips with per-room jitter, at least n_frames long."""
+    from segmenter import synthetic_stream
+
+    rng = np.random.default_rng(seed)
+    stream = np.zeros((0, N_HOLISTIC, 3), dtype=np.float32)
+    clips = max(1, n_frames // 40)
+    while len(stream) < n_frames:
+        more, _ = synthetic_stream(clips, seed=int(rng.integers(1 << 31)))
+        stream = np.concatenate([stream, more])
+    stream = stream[:n_frames]
+    shift = rng.normal(0, 0.03, 3).astype(np.float32)
+    shift[2] = 0
+    scale = np.float32(rng.uniform(0.9, 1.1))
+    noise = rng.normal(0, 0.002, stream.shape).astype(np.float32)
+    return (stream - 0.5) * scale + 0.5 + shift + noise
+
+
+def procedural_stream(n_frames: int, seed: int, fps: float = 30.0) -> np.ndarray:
+    """
+    Data-free stream: static face ring and pose skeleton, two 21-point hand fans
+    moving along Lissajous paths for 1-2 s "signs" separated by 0.3-1 s rests
+    (hands NaN).
+    """
+    rng = np.random.default_rng(seed)
+    base = np.full((N_HOLISTIC, 3), np.nan, dtype=np.float32)
+    face, pose = np.arange(468), np.arange(489, 522)   # holistic order: face, left hand, pose, right hand
+    angle = np.linspace(0, 2 * np.pi, len(face), endpoint=False)
+    base[face] = np.c_[0.5 + 0.08 * np.cos(angle), 0.3 + 0.1 * np.sin(angle), np.zeros_like(angle)]
+    base[pose] = np.c_[rng.uniform(0.3, 0.7, len(pose)), rng.uniform(0.3, 0.9, len(pose)), np.zeros(len(pose))]
+
+    fan = np.linspace(-0.6, 0.6, 21)
+    reach = np.tile([0.0, 0.02, 0.04, 0.06], 6)[:21]
+    hand = np.c_[reach * np.sin(fan), -reach * np.cos(fan), np.zeros(21)].astype(np.float32)
+
+    stream = np.repeat(base[None], n_frames, axis=0)
+    t = np.arange(n_frames) / fps
+    active = np.zeros(n_frames, dtype=bool)
+    i = 0
+    while i < n_frames:
+        sign = int(rng.uniform(1, 2) * fps)
+        active[i:i + sign] = True
+        i += sign + int(rng.uniform(0.3, 1.0) * fps)
+    for rows, cx, phase in ((LEFT_HAND, 0.35, 0.0), (RIGHT_HAND, 0.65, np.pi / 2)):
+        fx, fy = rng.uniform(0.5, 2.0, 2)
+        center = np.c_[cx + 0.08 * np.sin(2 * np.pi * fx * t + phase),
+                       0.6 + 0.08 * np.sin(2 * np.pi * fy * t), np.zeros(n_frames)]
+        stream[:, rows] = center[:, None, :] + hand[None]
+        stream[np.ix_(~active, rows)] = np.nan
+    return stream + rng.normal(0, 0.001, stream.shape).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Local service
+# ---------------------------------------------------------------------------
+
+def serve(port: int, backend: str, model: Path | None, stub_ms: float):
+    """Blocking HTTP server for ROUTE (run via `load_test.py --serve`)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from metrics import REGISTRY, handle_metrics_request
+
+    if backend == "onnx":
+        from asl_inference import ASLRecognizer, MODEL_PATH
+
+        recognizer = ASLRecognizer(model or MODEL_PATH)
+
+        def recognize(window: np.ndarray) -> dict:
+            result = recognizer.classify_holistic(window)
+            return {"word": result["word"], "confidence": result["confidence"]}
+    else:
+        def recognize(window: np.ndarray) -> dict:
+            time.sleep(stub_ms / 1000)
+            return {"word": "", "confidence": 0.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, one connection per room
+        disable_nagle_algorithm = True   # else the body write waits on a delayed ACK
+
+        def do_GET(self):
+            if not handle_metrics_request(self):
+                self.send_error(404)
+
+        def do_POST(self):
+            if self.path != ROUTE:
+                self.send_error(404)
+                return
+            with REGISTRY.in_flight():
+                with REGISTRY.time("decode"):
+                    body = self.rfile.read(int(self.headers["Content-Length"]))
+                    window = np.frombuffer(body, dtype=np.float32).reshape(-1, N_HOLISTIC, 3)
+                payload = json.dumps(recognize(window)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    print(f"Serving {backend} on http://127.0.0.1:{port}{ROUTE}", flush=True)
+    server.serve_forever()
+
+
+def _start_server(args) -> tuple[subprocess.Popen, str]:
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--serve", "--port", str(args.port),
+           "--backend", args.backend, "--stub-ms", str(args.stub_ms)]
+    if args.model:
+        cmd += ["--model", str(args.model)]
+    proc = subprocess.Popen(cmd, cwd=SCRIPT_DIR, stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:        # blocks until the model is loaded and the socket is bound
+        if line.startswith("Serving"):
+            break
+        print(f"  server: {line.rstrip()}")
+    else:
+        raise RuntimeError(f"{args.backend} server failed to start")
+    return proc, f"http://127.0.0.1:{args.port}"
+
+
+def _proc_cpu_seconds(pid: int) -> float | None:
+    """utime + stime of another process (Linux /proc only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _scrape(url: str) -> dict | None:
+    """The service's /metrics.json (per-stage histograms, peak queue depth), if it has one."""
+    from urllib.request import urlopen
+
+    try:
+        with urlopen(f"{url}/metrics.json", timeout=5) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Rooms
+# ---------------------------------------------------------------------------
+
+class Room:
+    """One simulated participant: frame clock + at most one request in flight."""
+
+    def __init__(self, url: str, stream: np.ndarray, fps: float, stride: int):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.stream = stream
+        self.fps = fps
+        self.stride = stride
+        self.latencies: list[float] = []
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self._sender = ThreadPoolExecutor(max_workers=1)
+        self._conn = None
+
+    def _post(self, window: np.ndarray, due: float):
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self._conn.request("POST", ROUTE, body=window.tobytes(),
+                               headers={"Content-Type": "application/octet-stream"})
+            response = self._conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(response.status)
+            self.latencies.append((time.perf_counter() - due) * 1000)
+        except Exception:
+            self.errors += 1
+            self._conn = None
+
+    def run(self, start: float):
+        pending = None
+        for i in range(SEQ_LEN, len(self.stream) + 1, self.stride):
+            due = start + i / self.fps     # the frame completing this window has arrived
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if pending is not None and not pending.done():
+                self.dropped += 1
+                continue
+            self.sent += 1
+            pending = self._sender.submit(self._post, self.stream[i - SEQ_LEN:i], due)
+        self._sender.shutdown(wait=True)
+
+
+def run_level(url: str, n_rooms: int, streams: list[np.ndarray], fps: float, stride: int,
+              server_pid: int | None) -> dict:
+    rooms = [Room(url, streams[i], fps, stride) for i in range(n_rooms)]
+    server_cpu0 = _proc_cpu_seconds(server_pid) if server_pid else None
+    client_cpu0 = time.process_time()
+    wall0 = time.perf_counter()
+    start = wall0 + 0.05
+    threads = [threading.Thread(target=room.run, args=(start,)) for room in rooms]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall0
+    server_cpu1 = _proc_cpu_seconds(server_pid) if server_pid else None
+
+    lat = np.concatenate([r.latencies for r in rooms]) if any(r.latencies for r in rooms) else np.zeros(1)
+    room_p95 = [float(np.percentile(r.latencies, 95)) for r in rooms if r.latencies]
+    windows = sum(r.sent + r.dropped for r in rooms)
+    return {
+        "rooms": n_rooms,
+        "windows": windows,
+        "sent": sum(r.sent for r in rooms),
+        "dropped": sum(r.dropped for r in rooms),
+        "dropped_pct": 100 * sum(r.dropped for r in rooms) / max(windows, 1),
+        "errors": sum(r.errors for r in rooms),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "worst_room_p95_ms": max(room_p95, default=0.0),
+        "server_cpu_pct": None if server_cpu0 is None or server_cpu1 is None
+        else 100 * (server_cpu1 - server_cpu0) / wall,
+        "client_cpu_pct": 100 * (time.process_time() - client_cpu0) / wall,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-room load test of the recognition path")
+    parser.add_argument("--rooms", default="1,2,4,8", help="comma-separated room counts")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per room count")
+    parser.add_argument("--stride", type=int, default=STRIDE)
+    parser.add_argument("--backend", choices=["onnx", "stub"], default="onnx")
+    parser.add_argument("--model", type=Path, default=None, help="ONNX model for the onnx backend")
+    parser.add_argument("--stub-ms", type=float, default=300.0, help="stub backend response time")
+    parser.add_argument("--source", choices=["kaggle", "procedural"], default="procedural")
+    parser.add_argument("--url", default=None, help="existing service instead of a local subprocess")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.port, args.backend, args.model, args.stub_ms)
+        return
+
+    levels = [int(n) for n in args.rooms.split(",")]
+    n_frames = int(args.duration * args.fps)
+    make = kaggle_stream if args.source == "kaggle" else procedural_stream
+    print(f"Generating {max(levels)} {args.source} streams of {n_frames} frames...")
+    streams = [make(n_frames, args.seed + i) for i in range(max(levels))]
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = _start_server(args)
+    target = args.url or f"local {args.backend}" + (f" ({args.stub_ms:.0f} ms)" if args.backend == "stub" else "")
+    print(f"Target: {target} at {url}{ROUTE}; {args.fps:g} fps, window every {args.stride} frames\n")
+
+    results = []
+    try:
+        print(f"{'rooms':>5} {'windows':>8} {'dropped':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'worst p95':>9} {'srv CPU':>8} {'cli CPU':>8}")
+        for n in levels:
+            r = run_level(url, n, streams, args.fps, args.stride, proc.pid if proc else None)
+            results.append(r)
+            srv = "n/a" if r["server_cpu_pct"] is None else f"{r['server_cpu_pct']:.0f}%"
+            print(f"{n:>5} {r['windows']:>8} {r['dropped_pct']:>7.1f}% {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                  f"{r['p99_ms']:>8.1f} {r['worst_room_p95_ms']:>9.1f} {srv:>8} {r['client_cpu_pct']:>7.0f}%"
+                  + (f"  ({r['errors']} errors)" if r["errors"] else ""))
+        server_metrics = _scrape(url)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "target": target, "fps": args.fps, "stride": args.stride, "duration_s": args.duration,
+        "source": args.source, "cpu_count": os.cpu_count(), "levels": results,
+        "server_metrics": server_metrics,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = args.output.with_suffix(".tmp")
+    tmp.write_text(json.dumps(report, indent=2))
+    os.replace(tmp, args.output)
+    print(f"\nSaved: {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Stateful streaming inference for the unidirectional LSTM classifier.
+
+`train_model.py --streaming` trains ASLClassifier(bidirectional=False) with the
+usual flow and exports asl_model_stream_step.onnx: one frame plus the LSTM
+hidden/cell state in, logits plus the new state out. A new frame then costs one
+LSTM step instead of re-running the whole 32-frame window on every stride:
+
+    stream = StreamingClassifier()
+    for frame in frames:                # [126] hand landmarks, 0 = not detected
+        logits = stream.push(frame)     # None while idle
+
+Training windows start at sign onset from zero state and end in zero padding,
+so the runner steps through up to `idle_frames` hand-less frames after a sign,
+then resets the state and waits for the hands to come back.
+
+Benchmark: python cli.py bench stream
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
+STEP_MODEL = MODEL_DIR / "asl_model_stream_step.onnx"
+
+IDLE_FRAMES = 8
+
+
+class StreamingClassifier:
+    """ONNX Runtime session over the single-step model + the carried LSTM state."""
+
+    def __init__(self, model_path: Path = STEP_MODEL, idle_frames: int = IDLE_FRAMES,
+                 session_options=None):
+        from ort_tune import create_session
+
+        self.session = create_session(Path(model_path), session_options)
+        layers, _, hidden = self.session.get_inputs()[1].shape
+        self.state_shape = (layers, 1, hidden)
+        self.idle_frames = idle_frames
+        self.reset()
+
+    def reset(self):
+        self.h = np.zeros(self.state_shape, dtype=np.float32)
+        self.c = np.zeros(self.state_shape, dtype=np.float32)
+        self.frames = 0   # frames stepped since the last reset
+        self.idle = 0     # consecutive frames without hands
+
+    def step(self, frame: np.ndarray) -> np.ndarray:
+        """Advance the state by one [126] frame unconditionally; returns logits [NUM_CLASSES]."""
+        feed = {"frame": np.ascontiguousarray(frame, dtype=np.float32).reshape(1, -1),
+                "h": self.h, "c": self.c}
+        logits, self.h, self.c = self.session.run(None, feed)
+        self.frames += 1
+        return logits[0]
+
+    def push(self, frame: np.ndarray) -> np.ndarray | None:
+        """Feed the next frame; returns logits, or None while idle between signs."""
+        if np.any(frame):
+            self.idle = 0
+        else:
+            self.idle += 1
+            if self.frames == 0:
+                return None
+            if self.idle > self.idle_frames:
+                self.reset()
+                return None
+        return self.step(frame)
+
+
+def check_step_parity(model, step_path: Path, windows) -> bool:
+    """
+    Windowed PyTorch logits vs the step model fed each window frame by frame
+    from zero state. model: unidirectional ASLClassifier; windows: [N, T, F].
+    """
+    import torch
+
+    stream = StreamingClassifier(step_path, idle_frames=windows.shape[1])
+    model.eval()
+    with torch.no_grad():
+        ref = model(windows).numpy()
+    got = []
+    for window in windows.numpy():
+        stream.reset()
+        for frame in window:
+            logits = stream.step(frame)
+        got.append(logits)
+    got = np.stack(got)
+    diff = np.abs(ref - got).max()
+    agree = (ref.argmax(1) == got.argmax(1)).mean()
+    ok = diff < 1e-4 and agree == 1.0
+    print(f"Streaming step parity on {len(windows)} windows: max abs diff = {diff:.2e}, "
+          f"top-1 agreement = {agree:.3f} {'✓' if ok else '✗'}")
+    return ok
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench stream`: per-frame latency of the windowed BiLSTM (whole
+    32-frame window re-run for every new frame) vs the stateful step model.
+    Uses random weights at the default size, since latency doesn't depend on them.
+    """
+    import argparse
+    import tempfile
+    import time
+
+    import onnxruntime as ort
+    import torch
+
+    from train_model import (ASLClassifier, NUM_FEATURES, SEQ_LEN, export_onnx,
+                             export_streaming_onnx)
+
+    parser = argparse.ArgumentParser(prog="bench stream")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--hidden", type=int, default=128)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    frames = rng.uniform(0.2, 0.8, (args.frames + SEQ_LEN, NUM_FEATURES)).astype(np.float32)
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = args.threads
+    so.inter_op_num_threads = 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        models = {}
+        for name, bidirectional in [("windowed_bi", True), ("windowed_uni", False)]:
+            models[name] = ASLClassifier(NUM_FEATURES, 250, args.hidden, args.layers,
+                                         bidirectional=bidirectional).eval()
+            export_onnx(models[name], tmp / f"{name}.onnx", "cpu")
+        export_streaming_onnx(models["windowed_uni"], tmp / "step.onnx", "cpu")
+
+        check_step_parity(models["windowed_uni"], tmp / "step.onnx",
+                          torch.from_numpy(frames[:SEQ_LEN * 4].reshape(4, SEQ_LEN, -1)))
+
+        windowed = {name: ort.InferenceSession(str(tmp / f"{name}.onnx"), so,
+                                               providers=["CPUExecutionProvider"])
+                    for name in ("windowed_bi", "windowed_uni")}
+        stream = StreamingClassifier(tmp / "step.onnx", idle_frames=args.frames, session_options=so)
+
+        def per_frame_ms(run) -> np.ndarray:
+            for t in range(SEQ_LEN, SEQ_LEN + 20):  # warm-up
+                run(t)
+            lat = []
+            for t in range(SEQ_LEN, SEQ_LEN + args.frames):
+                t0 = time.perf_counter()
+                run(t)
+                lat.append((time.perf_counter() - t0) * 1000)
+            return np.asarray(lat)
+
+        results = {
+            name: per_frame_ms(lambda t, s=sess: s.run(None, {"input": frames[None, t - SEQ_LEN + 1:t + 1]}))
+            for name, sess in windowed.items()
+        }
+        results["stream_step"] = per_frame_ms(lambda t: stream.step(frames[t]))
+
+    base = np.percentile(results["windowed_bi"], 50)
+    print(f"Per-frame latency over {args.frames} frames (hidden {args.hidden}, "
+          f"{args.layers} layers, {args.threads} thread(s)):")
+    for name, lat in results.items():
+        p50 = np.percentile(lat, 50)
+        print(f"  {name:<13} p50 {p50:6.3f} ms  p99 {np.percentile(lat, 99):6.3f} ms  "
+              f"({base / p50:4.1f}x vs windowed_bi)")
+    return {name: {"p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99))}
+            for name, lat in results.items()}
@@ -0,0 +1,457 @@
+"""
+Per-language / per-vocabulary model registry with lazy loading and LRU eviction.
+
+One host serves several sign vocabularies without holding every model in RAM.
+A manifest (models/saved_model/registry.json) names the models; paths are
+relative to the manifest:
+
+    {
+      "budget_mb": 1024,
+      "models": {
+        "ASL":       {"model": "asl_deberta.onnx", "labels": "../../data/processed/label_map.json"},
+        "ASL/hands": {"model": "asl_model.onnx",   "labels": "label_map.json"},
+        "BSL":       {"model": "bsl/bsl_deberta.onnx", "labels": "bsl/label_map.json",
+                      "mapping": "bsl/landmark_mapping.json"}
+      }
+    }
+
+Keys are a sign language (the server's SignLanguage) optionally followed by
+/<vocabulary>. Without a manifest the registry holds the one ASL model,
+asl_deberta.onnx with data/processed/label_map.json.
+
+    registry = ModelRegistry.from_manifest(shared_threads=True)
+    registry.get("BSL").classify_holistic(holistic)     # loads BSL on first use
+
+Nothing is loaded up front. get() builds the recognizer on first use
+(ASLRecognizer for [L, 5, 100] / fused [L, 543, 3] models, HandRecognizer for
+the BiLSTM's [batch, 32, 126]) and checks the model's class count against its
+label map, so vocabularies of any size work (not just NUM_CLASSES = 250).
+Loaded models are kept in least-recently-used order; before a load, the oldest
+ones are dropped until the new one fits budget_mb. A model's footprint is the
+process RSS growth while loading it (at least its file size, and never less
+than an earlier load measured). Loads are serialized so the RSS deltas don't
+overlap; hits only take a short lock. Freed heap is trimmed back to the OS
+after an eviction, outside that lock.
+
+With shared_threads=True all sessions share ORT's global thread pools
+(ort_tune.use_global_thread_pools), so threads stay constant as models are
+added instead of growing by a pool per session. That switch is process-wide
+and must happen before the first session, so it is opt-in: pass it only from
+the process's entry point (recognize_service.py's registry backend does), and
+create the registry before any other recognizer.
+
+Usage:
+    python model_registry.py [--manifest models/saved_model/registry.json] [--load ASL,BSL]
+    python cli.py registry ...
+    python cli.py bench registry [--vocabularies 8] [--requests 400] [--threads 4] [--budget-mb 0]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from asl_inference import LABEL_MAP_PATH, MODEL_PATH, ASLRecognizer, load_labels, softmax, TOP_N
+from landmark_mapping import MAPPING_PATH
+from metrics import REGISTRY
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
+MANIFEST_PATH = MODEL_DIR / "registry.json"
+DEFAULT_BUDGET_MB = 1024
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str                   # "ASL", "ASL/hands", "BSL"...
+    model: Path
+    labels: Path
+    mapping: Path = MAPPING_PATH
+
+    @property
+    def language(self) -> str:
+        return self.name.split("/", 1)[0]
+
+    def file_mb(self) -> float:
+        """ONNX file plus external weights (<model>.onnx.data / <model>.data)."""
+        files = [self.model, self.model.with_name(self.model.name + ".data"), self.model.with_suffix(".data")]
+        return sum(f.stat().st_size for f in files if f.exists()) / 2**20
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> tuple[dict[str, ModelSpec], float | None]:
+    """(name -> ModelSpec, manifest budget_mb or None). No manifest -> the ASL model alone."""
+    path = Path(path)
+    if not path.exists():
+        return {"ASL": ModelSpec("ASL", MODEL_PATH, LABEL_MAP_PATH)}, None
+    with open(path) as f:
+        manifest = json.load(f)
+    base = path.parent
+    specs = {}
+    for name, entry in manifest["models"].items():
+        specs[name] = ModelSpec(name, base / entry["model"], base / entry["labels"],
+                                base / entry["mapping"] if "mapping" in entry else MAPPING_PATH)
+    return specs, manifest.get("budget_mb")
+
+
+def _proc_status(field: str) -> int | None:
+    """A numeric field of /proc/self/status (VmRSS, VmHWM in kB; Threads), None off Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb() -> float | None:
+    kb = _proc_status("VmRSS")
+    return kb / 1024 if kb is not None else None
+
+
+def _release_memory():
+    """Hand freed heap pages back to the OS (glibc keeps them otherwise, so RSS never drops)."""
+    try:
+        import ctypes
+
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class HandRecognizer:
+    """BiLSTM over hand landmarks ([batch, 32, 126] input), classify_holistic like ASLRecognizer."""
+
+    def __init__(self, session, labels: list[str], metrics=REGISTRY):
+        self.session = session
+        self.labels = labels
+        self.input_name = session.get_inputs()[0].name
+        self.seq_len = session.get_inputs()[0].shape[1]
+        self.metrics = metrics
+
+    def classify_holistic(self, holistic: np.ndarray, room=None) -> dict:
+        from cascade import small_input
+
+        with self.metrics.time("assemble"):
+            x = small_input(holistic, self.seq_len)[None]
+        with self.metrics.time("infer"):
+            probs = softmax(self.session.run(None, {self.input_name: x})[0][0])
+        top = np.argsort(probs)[::-1][:TOP_N]
+        return {
+            "word": self.labels[top[0]],
+            "confidence": float(probs[top[0]]),
+            "topN": [{"word": self.labels[i], "confidence": float(probs[i])} for i in top],
+        }
+
+
+def _io_dims(model_path: Path) -> tuple[list, list]:
+    """(input dims, output dims) from the graph alone, ints for fixed axes and names for dynamic ones."""
+    import onnx
+
+    graph = onnx.load(str(model_path), load_external_data=False).graph
+
+    def dims(value):
+        return [d.dim_value if d.HasField("dim_value") else d.dim_param for d in value.type.tensor_type.shape.dim]
+    return dims(graph.input[0]), dims(graph.output[0])
+
+
+def load_model(spec: ModelSpec, session_options=None, metrics=REGISTRY):
+    """The recognizer for `spec`, chosen by the model's input shape; class count checked against the labels."""
+    from ort_tune import create_session
+
+    if not spec.model.exists():
+        raise FileNotFoundError(f"{spec.name}: model not found: {spec.model}")
+    inputs, outputs = _io_dims(spec.model)
+    labels = load_labels(spec.labels)
+    if isinstance(outputs[-1], int) and outputs[-1] != len(labels):
+        raise ValueError(f"{spec.name}: {spec.model.name} has {outputs[-1]} classes, "
+                         f"{spec.labels.name} has {len(labels)} labels")
+    if len(inputs) == 3 and inputs[-1] == 126:
+        return HandRecognizer(create_session(spec.model, session_options), labels, metrics)
+    return ASLRecognizer(spec.model, spec.mapping, spec.labels, session_options, metrics=metrics)
+
+
+class ModelRegistry:
+    """Lazily loaded recognizers by name, least recently used evicted beyond budget_mb."""
+
+    def __init__(self, specs: dict[str, ModelSpec], budget_mb: float = DEFAULT_BUDGET_MB,
+                 shared_threads: bool = False, intra_op_num_threads: int = 0, inter_op_num_threads: int = 1,
+                 session_options=None, metrics=REGISTRY):
+        if shared_threads:
+            from ort_tune import use_global_thread_pools
+
+            use_global_thread_pools(intra_op_num_threads, inter_op_num_threads)
+        self.specs = dict(specs)
+        self.budget_mb = budget_mb if budget_mb and budget_mb > 0 else float("inf")
+        self.session_options = session_options
+        self.metrics = metrics
+        self._loaded: OrderedDict[str, tuple[object, float]] = OrderedDict()
+        self._footprint: dict[str, float] = {}       # measured MB, kept after eviction
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = self.loads = self.evictions = 0
+        self.load_seconds = 0.0
+
+    @classmethod
+    def from_manifest(cls, path: Path = MANIFEST_PATH, budget_mb: float | None = None, **kwargs):
+        specs, manifest_budget = load_manifest(path)
+        if budget_mb is None:
+            budget_mb = manifest_budget if manifest_budget is not None else DEFAULT_BUDGET_MB
+        return cls(specs, budget_mb, **kwargs)
+
+    def resolve(self, language: str, vocabulary: str | None = None) -> str:
+        """Registry key for a request: "BSL" + "medical" -> "BSL/medical", else the language's default."""
+        name = f"{language}/{vocabulary}" if vocabulary else language
+        if name not in self.specs:
+            raise KeyError(f"no model registered for {name}")
+        return name
+
+    def languages(self) -> list[str]:
+        return sorted({spec.language for spec in self.specs.values()})
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def get(self, name: str):
+        """The recognizer for `name`, loading it (and evicting others) on first use."""
+        if name not in self.specs:
+            raise KeyError(f"no model registered for {name}")
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                self.hits += 1
+                return self._loaded[name][0]
+
+        with self._load_lock:
+            with self._lock:    # loaded by another thread while this one waited
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    self.hits += 1
+                    return self._loaded[name][0]
+                spec = self.specs[name]
+                evicted = self._evict(self._footprint.get(name) or spec.file_mb())
+            if evicted:
+                _release_memory()
+
+            import onnx, onnxruntime  # noqa: F401  (first-use import cost isn't the model's footprint)
+
+            before = rss_mb()
+            start = time.perf_counter()
+            with self.metrics.time("load_model"):
+                recognizer = load_model(spec, self.session_options, self.metrics)
+            elapsed = time.perf_counter() - start
+            after = rss_mb()
+            measured = after - before if before is not None and after is not None else 0.0
+            # A reload can reuse pages freed by an eviction and look cheaper than it is
+            size = max(measured, spec.file_mb(), self._footprint.get(name, 0.0))
+
+            with self._lock:
+                self._footprint[name] = size
+                self._loaded[name] = (recognizer, size)
+                self.loads += 1
+                self.load_seconds += elapsed
+                evicted = self._evict(0.0, keep=name)
+            if evicted:
+                _release_memory()
+            return recognizer
+
+    def _evict(self, incoming_mb: float, keep: str | None = None) -> int:
+        """
+        Drop least recently used models until incoming_mb more fits the budget
+        (caller holds _lock); the number dropped. The caller trims the heap
+        (_release_memory) once it has released the lock: malloc_trim walks the
+        whole heap and would stall every cache hit meanwhile.
+        """
+        evicted = 0
+        while self._loaded and self.used_mb() + incoming_mb > self.budget_mb:
+            name = next(iter(self._loaded))
+            if name == keep:
+                if len(self._loaded) == 1:
+                    print(f"Warning: {name} ({self._loaded[name][1]:.0f} MB) alone exceeds "
+                          f"the {self.budget_mb:.0f} MB budget")
+                    return evicted
+                self._loaded.move_to_end(name)
+                continue
+            # Sessions are freed once in-flight callers drop their reference
+            del self._loaded[name]
+            self.evictions += 1
+            evicted += 1
+        return evicted
+
+    def unload(self, name: str) -> bool:
+        with self._lock:
+            return self._loaded.pop(name, None) is not None
+
+    def used_mb(self) -> float:
+        return sum(size for _, size in self._loaded.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.loads
+            return {
+                "loaded": {name: round(size, 1) for name, (_, size) in self._loaded.items()},
+                "used_mb": round(self.used_mb(), 1),
+                "budget_mb": None if self.budget_mb == float("inf") else self.budget_mb,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else None,
+                "mean_load_ms": 1000 * self.load_seconds / self.loads if self.loads else None,
+                "rss_mb": rss_mb(),
+                "threads": _proc_status("Threads"),
+            }
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _bench_manifest(tmp: Path, vocabularies: int) -> Path:
+    """`vocabularies` entries over the saved models (alternating DeBERTa / BiLSTM), each its own session."""
+    models = [m for m in (MODEL_PATH, MODEL_DIR / "asl_model.onnx") if m.exists()]
+    languages = ["ASL", "BSL", "CSL", "ISL", "FSL", "JSL"]
+    entries = {}
+    for i in range(vocabularies):
+        name = languages[i % len(languages)] + (f"/v{i // len(languages)}" if i >= len(languages) else "")
+        entries[name] = {"model": str(models[i % len(models)]), "labels": str(LABEL_MAP_PATH)}
+    path = tmp / "registry.json"
+    path.write_text(json.dumps({"models": entries}))
+    return path
+
+
+def _bench_child(args) -> dict:
+    """One configuration, in its own process (global thread pools are per process)."""
+    from ort_tune import DEFAULT_OPTIONS, to_session_options
+
+    # Same thread count either way: one shared pool of N, or N per session
+    options = to_session_options(dict(DEFAULT_OPTIONS, intra_op_num_threads=args.threads, inter_op_num_threads=1))
+    registry = ModelRegistry.from_manifest(args.manifest, budget_mb=args.budget_mb,
+                                           shared_threads=bool(args.shared_threads),
+                                           intra_op_num_threads=args.threads, session_options=options)
+    names = list(registry.specs)
+    rng = np.random.default_rng(0)
+    # Zipf-like popularity: a few vocabularies get most of the traffic
+    weights = 1.0 / np.arange(1, len(names) + 1) ** args.zipf
+    order = rng.choice(len(names), size=args.requests, p=weights / weights.sum())
+    holistic = rng.normal(size=(25, 543, 3)).astype(np.float32)
+
+    hit_ms, miss_ms = [], []
+    for i in order:
+        loads = registry.loads
+        start = time.perf_counter()
+        registry.get(names[i]).classify_holistic(holistic)
+        (miss_ms if registry.loads > loads else hit_ms).append(1000 * (time.perf_counter() - start))
+    stats = registry.stats()
+    return {
+        **{k: stats[k] for k in ("loads", "evictions", "hit_rate", "mean_load_ms", "used_mb", "threads")},
+        "loaded": len(stats["loaded"]),
+        "peak_rss_mb": (_proc_status("VmHWM") or 0) / 1024,
+        "hit_p50_ms": float(np.median(hit_ms)) if hit_ms else None,
+        "miss_p50_ms": float(np.median(miss_ms)) if miss_ms else None,
+    }
+
+
+def bench_main(argv=None):
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Model registry: lazy loading / LRU eviction / shared thread pools")
+    parser.add_argument("--vocabularies", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew across vocabularies")
+    parser.add_argument("--threads", type=int, default=4, help="intra-op threads (per session or shared)")
+    parser.add_argument("--budget-mb", type=float, default=0,
+                        help="budget for the evicting run (default: the models' total file size, "
+                             "roughly half their loaded footprint)")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--manifest", type=Path, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--shared-threads", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_bench_child(args)))
+        return 0
+    if not MODEL_PATH.exists():
+        print(f"Model not found: {MODEL_PATH} (run: python cli.py export <weights.pt>)")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = _bench_manifest(Path(tmp), args.vocabularies)
+        specs, _ = load_manifest(manifest)
+        budget = args.budget_mb or sum(s.file_mb() for s in specs.values())
+        configs = [
+            ("all loaded, per-session pools", 0, 0),
+            ("all loaded, shared pools", 0, 1),
+            (f"{budget:.0f} MB budget, shared pools", budget, 1),
+        ]
+        print(f"{args.vocabularies} vocabularies, {args.requests} requests (zipf {args.zipf}), "
+              f"{args.threads} intra-op threads")
+        print(f"\n  {'configuration':<32} {'loaded':>6} {'loads':>5} {'evict':>5} {'hit %':>6} "
+              f"{'load ms':>8} {'hit p50':>8} {'peak RSS':>9} {'threads':>7}")
+        results = []
+        for label, budget_mb, shared in configs:
+            cmd = [sys.executable, str(Path(__file__)), "--child", "--manifest", str(manifest),
+                   "--budget-mb", str(budget_mb), "--shared-threads", str(shared),
+                   "--requests", str(args.requests), "--zipf", str(args.zipf), "--threads", str(args.threads)]
+            out = subprocess.run(cmd, capture_output=True, text=True, cwd=SCRIPT_DIR)
+            if out.returncode != 0:
+                print(f"  {label:<32} failed:\n{out.stderr[-2000:]}")
+                return 1
+            r = {"configuration": label, "budget_mb": budget_mb or None, "shared_threads": bool(shared),
+                 **json.loads(out.stdout.strip().splitlines()[-1])}
+            results.append(r)
+            print(f"  {label:<32} {r['loaded']:>6} {r['loads']:>5} {r['evictions']:>5} "
+                  f"{100 * (r['hit_rate'] or 0):>5.1f}% {r['mean_load_ms'] or 0:>8.1f} "
+                  f"{r['hit_p50_ms'] or 0:>8.2f} {r['peak_rss_mb']:>8.0f}M {r['threads']:>7}")
+
+    if args.output:
+        tmp = args.output.with_suffix(".tmp")
+        tmp.write_text(json.dumps(results, indent=2))
+        os.replace(tmp, args.output)
+        print(f"\nSaved {args.output}")
+    return 0
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if "--child" in argv:
+        return bench_main(argv)
+
+    parser = argparse.ArgumentParser(description="List the model registry, optionally loading entries")
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH)
+    parser.add_argument("--budget-mb", type=float, default=None)
+    parser.add_argument("--load", default="", help="comma-separated names to load, in order")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry.from_manifest(args.manifest, budget_mb=args.budget_mb)
+    source = args.manifest if args.manifest.exists() else "default (no manifest)"
+    print(f"Registry: {source}, budget {registry.stats()['budget_mb'] or 'unlimited'} MB")
+    for name, spec in registry.specs.items():
+        status = "ok" if spec.model.exists() and spec.labels.exists() else "missing"
+        print(f"  {name:<16} {spec.model.name:<28} {spec.file_mb():7.1f} MB  {status}")
+
+    for name in filter(None, args.load.split(",")):
+        try:
+            recognizer = registry.get(name)
+        except (KeyError, FileNotFoundError, ValueError) as e:
+            print(f"✗ {name}: {e}")
+            return 1
+        print(f"✓ {name}: {type(recognizer).__name__}, {len(recognizer.labels)} labels")
+    if args.load:
+        print(json.dumps(registry.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
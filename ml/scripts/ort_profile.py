@@ -0,0 +1,266 @@
+"""
+Per-operator ONNX Runtime profile of an exported model.
+
+Runs the model with ORT profiling enabled over representative inputs, then
+folds the trace JSON into per-op-type, per-module and per-(module, op) time
+so the hot spots are visible by PyTorch module rather than by node id. The
+torch exporter names every node after the module scope it was traced in
+("/frame_transformer_1/layer.0/attention/self/selector/Gather"), so the
+scope maps straight back to build_model().named_modules(); nodes traced in
+SignMLPBert3Export's own forward/embed (the boolean-mask selections of the
+hand and lips features) have no scope and are reported under the root.
+
+Three groups are called out:
+    selector gathers   Selector gathers of DisentangledSelfAttention._disentangled_bias
+    mask selects       Equal / NonZero / GatherND(Elements) of the forward's x[mask]
+    shape arithmetic   nodes computing only on Shape outputs (the _shape() / .view()
+                       plumbing of the dynamic sequence axis), found from the graph
+
+--opt-level disable keeps the graph 1:1 with the export (every node traced
+back); the default (all) profiles what production runs, where fused nodes
+keep the scope of the node they replaced when ORT kept its name.
+
+Usage:
+    python ort_profile.py [models/saved_model/asl_deberta.onnx]
+                          [--windows 32] [--seq-lens 8,16,25] [--kaggle 0]
+                          [--opt-level all|extended|basic|disable] [--top 25]
+                          [--output profile.json]
+    python cli.py profile ...
+"""
+
+import argparse
+import json
+import os
+import re
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+MODEL_DIR = SCRIPT_DIR.parent / "models" / "saved_model"
+DEFAULT_MODEL = MODEL_DIR / "asl_deberta.onnx"
+
+ROOT = "<forward>"          # nodes traced outside any submodule
+UNMAPPED = "<unmapped>"     # nodes ORT created or renamed while optimizing
+MASK_OPS = {"Equal", "NonZero", "GatherND", "GatherElements", "Compress", "Where"}
+
+OPT_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+def node_module(node_name: str) -> str:
+    """'/frame_transformer_1/layer.0/attention/self/selector/Gather' -> 'frame_transformer_1.layer.0.attention.self.selector'"""
+    if not node_name.startswith("/"):
+        return UNMAPPED
+    scope = node_name.strip("/").split("/")[:-1]
+    return ".".join(scope) if scope else ROOT
+
+
+def layer_rollup(module: str) -> str:
+    """Fold the repeated transformers together: frame_transformer_2.layer.0... -> frame_transformer_*.layer.0..."""
+    return re.sub(r"^frame_transformer_\d+", "frame_transformer_*", module)
+
+
+def module_classes() -> dict[str, str]:
+    """Module path -> PyTorch class name from the export model, or {} without torch."""
+    try:
+        from export_deberta_onnx import build_model
+    except ImportError:
+        return {}
+    model = build_model()
+    classes = {name: type(m).__name__ for name, m in model.named_modules() if name}
+    classes[ROOT] = type(model).__name__
+    return classes
+
+
+def _module_class(module: str, classes: dict[str, str]) -> str:
+    # Exporter scopes repeat a module called more than once as name_1, name_2...
+    base = re.sub(r"_\d+$", "", module)
+    return classes.get(module) or classes.get(base) or ""
+
+
+def shape_nodes(model_path: Path) -> set[str]:
+    """
+    Names of nodes that only compute on tensor shapes: Shape itself and anything
+    whose non-constant inputs all come from shape arithmetic (Gather of a dim,
+    Unsqueeze, Concat into a Reshape target...).
+    """
+    import onnx
+
+    graph = onnx.load(str(model_path), load_external_data=False).graph
+    constants = {init.name for init in graph.initializer}
+    shape_tensors, names = set(), set()
+    for node in graph.node:     # ONNX graphs are stored topologically sorted
+        if node.op_type == "Constant":
+            constants.update(node.output)
+            continue
+        inputs = [i for i in node.input if i and i not in constants]
+        if node.op_type == "Shape" or (inputs and all(i in shape_tensors for i in inputs)):
+            shape_tensors.update(node.output)
+            names.add(node.name)
+    return names
+
+
+def profile_inputs(sess, windows: int, seq_lens: list[int], kaggle: int = 0) -> list[np.ndarray]:
+    """Landmark windows at each sequence length (bench_export corpus), or real Kaggle windows."""
+    inp = sess.get_inputs()[0]
+    batched = len(inp.shape) == 4
+    if kaggle:
+        from asl_inference import load_kaggle_windows
+
+        real, _, _ = load_kaggle_windows(max_files=kaggle)
+        feeds = [np.ascontiguousarray(w, dtype=np.float32) for w in real]
+    else:
+        from bench_export import landmark_corpus
+
+        corpus = landmark_corpus(n_windows=windows)
+        feeds = [np.ascontiguousarray(corpus[i, -L:]) for L in seq_lens for i in range(windows)]
+    if batched:
+        feeds = [w[None] for w in feeds]
+    return feeds
+
+
+def run_profile(model_path: Path, feeds: list[np.ndarray], opt_level: str = "all", warmup: int = 3) -> list[dict]:
+    """Run every feed once with profiling on; returns the trace events (warmup runs excluded)."""
+    import onnxruntime as ort
+
+    from ort_tune import DEFAULT_OPTIONS, create_session, load_tuned_options, to_session_options
+
+    options = to_session_options(load_tuned_options(model_path) or DEFAULT_OPTIONS)
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, OPT_LEVELS[opt_level])
+
+    # Warm up on a session without profiling so first-run allocations don't skew the trace
+    warm = create_session(model_path, options)
+    name = warm.get_inputs()[0].name
+    for x in feeds[:warmup]:
+        warm.run(None, {name: x})
+    del warm
+
+    with tempfile.TemporaryDirectory() as tmp:
+        options.enable_profiling = True
+        options.profile_file_prefix = os.path.join(tmp, "ort_profile")
+        sess = create_session(model_path, options)
+        for x in feeds:
+            sess.run(None, {name: x})
+        trace = sess.end_profiling()
+        with open(trace) as f:
+            return json.load(f)
+
+
+def aggregate(events: list[dict], classes: dict[str, str] | None = None, shape_ops: set[str] | None = None) -> dict:
+    """Fold kernel events into per-op, per-module, per-layer-rollup and per-(module, op) totals (µs)."""
+    classes = classes or {}
+    shape_ops = shape_ops or set()
+    runs = [e["dur"] for e in events if e.get("cat") == "Session" and e.get("name") == "model_run"]
+    by_op, by_module, by_rollup, by_pair = (defaultdict(lambda: [0, 0]) for _ in range(4))
+    groups = {"selector gathers": 0, "mask selects": 0, "shape arithmetic": 0}
+    total = 0
+
+    for e in events:
+        if e.get("cat") != "Node" or not e["name"].endswith("_kernel_time"):
+            continue
+        node = e["name"][: -len("_kernel_time")]
+        op = e.get("args", {}).get("op_name", "?")
+        module = node_module(node)
+        dur = e["dur"]
+        total += dur
+        for table, key in ((by_op, op), (by_module, module), (by_rollup, layer_rollup(module)),
+                           (by_pair, (module, op))):
+            table[key][0] += dur
+            table[key][1] += 1
+        if node in shape_ops:
+            groups["shape arithmetic"] += dur
+        elif re.search(r"(^|\.)selector(_\d+)?$", module):
+            groups["selector gathers"] += dur
+        elif module == ROOT and op in MASK_OPS:
+            groups["mask selects"] += dur
+
+    def ranked(table: dict, label) -> list[dict]:
+        rows = [{**label(key), "us": us, "calls": calls, "pct": 100 * us / total if total else 0.0}
+                for key, (us, calls) in table.items()]
+        return sorted(rows, key=lambda r: -r["us"])
+
+    n_runs = len(runs)
+    return {
+        "runs": n_runs,
+        "run_us": sum(runs),
+        "kernel_us": total,
+        "per_run_ms": sum(runs) / n_runs / 1000 if n_runs else None,
+        "groups": {k: {"us": v, "pct": 100 * v / total if total else 0.0} for k, v in groups.items()},
+        "ops": ranked(by_op, lambda k: {"op": k}),
+        "modules": ranked(by_module, lambda k: {"module": k, "class": _module_class(k, classes)}),
+        "layer_rollup": ranked(by_rollup, lambda k: {"module": k}),
+        "hot": ranked(by_pair, lambda k: {"module": k[0], "op": k[1], "class": _module_class(k[0], classes)}),
+    }
+
+
+def _print_table(title: str, rows: list[dict], cols: list[tuple[str, str, int]], top: int):
+    print(f"\n{title}")
+    print("  " + "  ".join(f"{head:<{width}}" for head, _, width in cols) + "      ms   calls       %")
+    for row in rows[:top]:
+        cells = "  ".join(f"{str(row.get(key, ''))[:width]:<{width}}" for _, key, width in cols)
+        print(f"  {cells}  {row['us'] / 1000:6.2f}  {row['calls']:6d}  {row['pct']:5.1f}%")
+
+
+def print_report(report: dict, top: int = 25):
+    print(f"\n  runs {report['runs']}   {report['per_run_ms']:.2f} ms/run   "
+          f"kernels {report['kernel_us'] / max(report['run_us'], 1) * 100:.0f}% of run time")
+    for name, g in report["groups"].items():
+        print(f"  {name:<17} {g['us'] / 1000:8.2f} ms  {g['pct']:5.1f}% of kernel time")
+
+    _print_table("Hot ops (module, op)", report["hot"],
+                 [("module", "module", 58), ("op", "op", 18), ("class", "class", 26)], top)
+    _print_table("By op type", report["ops"], [("op", "op", 24)], min(top, 15))
+    _print_table("By module (transformer layers rolled up)", report["layer_rollup"],
+                 [("module", "module", 58)], min(top, 15))
+
+
+def _ints(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-operator ORT profile mapped back to PyTorch modules")
+    parser.add_argument("model", nargs="?", type=Path, default=DEFAULT_MODEL)
+    parser.add_argument("--windows", type=int, default=32, help="synthetic windows per sequence length")
+    parser.add_argument("--seq-lens", type=_ints, default=None, help="comma-separated (default 8,16,SEQ_LEN)")
+    parser.add_argument("--kaggle", type=int, default=0, metavar="N",
+                        help="profile real windows from N Kaggle parquet files instead")
+    parser.add_argument("--opt-level", choices=list(OPT_LEVELS), default="all")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", type=Path, default=None, help="write the full breakdown as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.model.exists():
+        print(f"Model not found: {args.model} (run: python cli.py export <weights.pt>)")
+        return 1
+
+    from landmark_config import SEQ_LEN
+    from ort_tune import create_session
+
+    seq_lens = args.seq_lens or [8, 16, SEQ_LEN]
+    feeds = profile_inputs(create_session(args.model), args.windows, seq_lens, args.kaggle)
+    print(f"Profiling {args.model.name}: {len(feeds)} runs, opt level {args.opt_level}"
+          + ("" if args.kaggle else f", seq lens {','.join(map(str, seq_lens))}"))
+
+    events = run_profile(args.model, feeds, args.opt_level)
+    report = aggregate(events, module_classes(), shape_nodes(args.model))
+    report.update(model=args.model.name, opt_level=args.opt_level)
+    print_report(report, args.top)
+
+    if args.output:
+        tmp = args.output.with_suffix(".tmp")
+        tmp.write_text(json.dumps(report, indent=2))
+        os.replace(tmp, args.output)
+        print(f"\nSaved {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
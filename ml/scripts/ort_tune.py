@@ -0,0 +1,335 @@
+"""
+ONNX Runtime SessionOptions autotuner.
+
+Sweeps intra/inter-op threads, graph optimization level, CPU memory arena and
+execution mode for a model over its batch sizes / sequence lengths, and writes
+the fastest configuration next to the model as <model>.ort.json. Sessions
+created through create_session() (ASLRecognizer, the Python inference path)
+pick that file up automatically; without it they keep ORT defaults.
+
+Tuning is coordinate descent: threads first, then optimization level, arena
+and execution mode, each stage keeping the best so far, scored by the
+geometric mean of p50 latency across workloads. With --concurrent N, N
+sessions run at once during measurement and thread counts are capped at
+cores / N, so the result doesn't oversubscribe a host shared by N sessions.
+
+Usage:
+    python ort_tune.py models/saved_model/asl_deberta.onnx
+                       [--batch-sizes 1,8] [--seq-lens 8,16,25]
+                       [--concurrent 1] [--runs 50]
+    python cli.py tune <model.onnx> ...
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from convert_to_tfjs import sha256_file
+
+SCRIPT_DIR = Path(__file__).parent
+MODEL_DIR = SCRIPT_DIR.parent / "models" / "saved_model"
+
+TUNE_FORMAT = 1
+DEFAULT_RUNS = 50
+WARMUP_RUNS = 5
+MIN_GAIN = 0.03  # a candidate must beat the current best by 3% to replace it (noise guard)
+
+DEFAULT_OPTIONS = {
+    "intra_op_num_threads": 0,          # 0 = ORT default (one per physical core)
+    "inter_op_num_threads": 0,
+    "graph_optimization_level": "ORT_ENABLE_ALL",
+    "enable_cpu_mem_arena": True,
+    "execution_mode": "ORT_SEQUENTIAL",
+}
+
+
+def tuned_path(model_path: Path) -> Path:
+    """asl_deberta.onnx -> asl_deberta.ort.json"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.ort.json")
+
+
+def _cpu_count() -> int:
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+def to_session_options(options: dict):
+    import onnxruntime as ort
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = int(options["intra_op_num_threads"])
+    so.inter_op_num_threads = int(options["inter_op_num_threads"])
+    so.graph_optimization_level = getattr(ort.GraphOptimizationLevel, options["graph_optimization_level"])
+    so.enable_cpu_mem_arena = bool(options["enable_cpu_mem_arena"])
+    so.execution_mode = getattr(ort.ExecutionMode, options["execution_mode"])
+    return so
+
+
+_global_pools: tuple[int, int] | None = None
+
+
+def use_global_thread_pools(intra_op_num_threads: int = 0, inter_op_num_threads: int = 1) -> tuple[int, int]:
+    """
+    Make every session this process creates through create_session() share one
+    intra-op and one inter-op thread pool instead of spawning its own, so N
+    loaded models cost one set of threads rather than N. ORT sizes the pools
+    when it builds its environment, so call this before the first session is
+    created; later calls keep the first sizes. Per-session thread counts (in
+    SessionOptions or a tuned .ort.json) are ignored from then on.
+    """
+    global _global_pools
+    if _global_pools is None:
+        from onnxruntime.capi import _pybind_state
+
+        _pybind_state.set_global_thread_pool_sizes(int(intra_op_num_threads), int(inter_op_num_threads))
+        _global_pools = (int(intra_op_num_threads), int(inter_op_num_threads))
+    return _global_pools
+
+
+# ---------------------------------------------------------------------------
+# Loading tuned settings
+# ---------------------------------------------------------------------------
+
+def load_tuned_options(model_path: Path, check_hash: bool = True) -> dict | None:
+    """
+    The tuned options for `model_path`, or None when there is no (valid) tune
+    file. Ignores a file tuned for different model bytes; caps thread counts
+    at this host's cores when it was tuned on a bigger machine.
+    """
+    path = tuned_path(model_path)
+    if not path.exists():
+        return None
+    try:
+        with open(path) as f:
+            tuned = json.load(f)
+        options = {**DEFAULT_OPTIONS, **tuned["options"]}
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"Warning: ignoring unreadable {path.name}: {e}")
+        return None
+    if tuned.get("format") != TUNE_FORMAT:
+        return None
+    if check_hash and tuned.get("model_sha256") != sha256_file(Path(model_path)):
+        print(f"Warning: {path.name} was tuned for a different model build — rerun ort_tune.py")
+        return None
+    cpus = _cpu_count()
+    if options["intra_op_num_threads"] > cpus:
+        options["intra_op_num_threads"] = cpus
+    return options
+
+
+def create_session(model_path: Path, session_options=None, providers=("CPUExecutionProvider",)):
+    """InferenceSession with explicit options, else the tuned <model>.ort.json, else ORT defaults."""
+    import onnxruntime as ort
+
+    if session_options is None:
+        tuned = load_tuned_options(model_path)
+        if tuned is not None:
+            session_options = to_session_options(tuned)
+    if _global_pools is not None:
+        # ORT rejects per-session pools once the global ones exist
+        session_options = session_options or ort.SessionOptions()
+        session_options.use_per_session_threads = False
+    return ort.InferenceSession(str(model_path), session_options, providers=list(providers))
+
+
+# ---------------------------------------------------------------------------
+# Workloads
+# ---------------------------------------------------------------------------
+
+def model_workloads(model_path: Path, batch_sizes=None, seq_lens=None) -> list[dict]:
+    """
+    (batch, seq_len) pairs to tune over, from the input's dynamic axes:
+    DeBERTa [seq_len, 5, 100] -> sequence lengths, BiLSTM [batch, 32, 126] ->
+    batch sizes, batched [batch, seq_len, 5, 100] -> both.
+    """
+    import onnx
+
+    from landmark_config import SEQ_LEN
+
+    model = onnx.load(str(model_path), load_external_data=False)
+    dims = model.graph.input[0].type.tensor_type.shape.dim
+    dynamic = [d.dim_param for d in dims if not d.HasField("dim_value")]
+    has_seq = any("seq" in name for name in dynamic)
+    has_batch = any("seq" not in name for name in dynamic)
+    batches = (batch_sizes or [1, 8]) if has_batch else [1]
+    lengths = (seq_lens or [SEQ_LEN // 3, 2 * SEQ_LEN // 3, SEQ_LEN]) if has_seq else [None]
+    return [{"batch": b, "seq_len": s} for b in batches for s in lengths]
+
+
+def make_feed(sess, batch: int, seq_len: int | None) -> dict:
+    """Realistic inputs for landmark models (bench_export corpus), random otherwise."""
+    from bench_export import landmark_corpus
+
+    inp = sess.get_inputs()[0]
+    shape = []
+    for d in inp.shape:
+        if isinstance(d, int):
+            shape.append(d)
+        elif "seq" in str(d):
+            shape.append(seq_len)
+        else:
+            shape.append(batch)
+    if shape[-2:] == [5, 100]:
+        windows = landmark_corpus(n_windows=max(batch, 1))[:, -shape[-3]:]
+        x = windows if len(shape) == 4 else windows[0]
+    else:
+        x = np.random.default_rng(0).normal(0, 1, shape)
+    return {inp.name: np.ascontiguousarray(x, dtype=np.float32)}
+
+
+def measure(model_path: Path, options: dict, workloads: list[dict], runs: int = DEFAULT_RUNS,
+            concurrent: int = 1) -> list[float]:
+    """p50 latency (ms) per workload with `concurrent` sessions running at once."""
+    sessions = [create_session(model_path, to_session_options(options)) for _ in range(concurrent)]
+    p50s = []
+    for w in workloads:
+        feeds = [make_feed(s, w["batch"], w["seq_len"]) for s in sessions]
+        latencies: list[float] = []
+        lock = threading.Lock()
+
+        def worker(sess, feed):
+            for _ in range(WARMUP_RUNS):
+                sess.run(None, feed)
+            mine = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                sess.run(None, feed)
+                mine.append((time.perf_counter() - t0) * 1000)
+            with lock:
+                latencies.extend(mine)
+
+        threads = [threading.Thread(target=worker, args=sf) for sf in zip(sessions, feeds)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        p50s.append(float(np.median(latencies)))
+    return p50s
+
+
+def _score(p50s: list[float]) -> float:
+    return math.exp(sum(math.log(max(p, 1e-6)) for p in p50s) / len(p50s))
+
+
+def candidate_stages(cores: int) -> list[list[dict]]:
+    """Per-stage option overrides, tried in order on top of the best so far."""
+    threads = sorted({t for t in (1, 2, 4, 8, 16, 32) if t <= cores} | {cores})
+    return [
+        [{"intra_op_num_threads": t, "inter_op_num_threads": 1} for t in threads],
+        [{"graph_optimization_level": lvl}
+         for lvl in ("ORT_ENABLE_BASIC", "ORT_ENABLE_EXTENDED", "ORT_ENABLE_ALL")],
+        [{"enable_cpu_mem_arena": arena} for arena in (True, False)],
+        [{"execution_mode": "ORT_SEQUENTIAL", "inter_op_num_threads": 1},
+         {"execution_mode": "ORT_PARALLEL", "inter_op_num_threads": 2}],
+    ]
+
+
+def tune(model_path: Path, workloads: list[dict], runs: int = DEFAULT_RUNS, concurrent: int = 1,
+         log=print) -> dict:
+    cores = max(1, _cpu_count() // concurrent)
+    seen: dict[str, list[float]] = {}
+
+    def evaluate(options: dict) -> list[float]:
+        key = json.dumps(options, sort_keys=True)
+        if key not in seen:
+            seen[key] = measure(model_path, options, workloads, runs, concurrent)
+            log(f"  {_score(seen[key]):8.3f} ms  {_describe(options)}")
+        return seen[key]
+
+    # ORT defaults (capped to our share of the cores when sessions run concurrently)
+    baseline = dict(DEFAULT_OPTIONS)
+    if concurrent > 1:
+        baseline["intra_op_num_threads"] = cores
+    baseline_p50 = evaluate(baseline)
+
+    best = dict(DEFAULT_OPTIONS, intra_op_num_threads=cores, inter_op_num_threads=1)
+    best_p50 = evaluate(best)
+    for stage in candidate_stages(cores):
+        for override in stage:
+            options = {**best, **override}
+            p50 = evaluate(options)
+            if _score(p50) < _score(best_p50) * (1 - MIN_GAIN):
+                best, best_p50 = options, p50
+    if _score(best_p50) > _score(baseline_p50) * (1 - MIN_GAIN):
+        best, best_p50 = baseline, baseline_p50
+
+    return {
+        "options": best,
+        "workloads": [{**w, "default_p50_ms": d, "tuned_p50_ms": t}
+                      for w, d, t in zip(workloads, baseline_p50, best_p50)],
+        "speedup": _score(baseline_p50) / _score(best_p50),
+        "configs_tried": len(seen),
+    }
+
+
+def _describe(options: dict) -> str:
+    return (f"intra={options['intra_op_num_threads']} inter={options['inter_op_num_threads']} "
+            f"{options['graph_optimization_level'].removeprefix('ORT_')} "
+            f"arena={'on' if options['enable_cpu_mem_arena'] else 'off'} "
+            f"{options['execution_mode'].removeprefix('ORT_').lower()}")
+
+
+def save_tuned(model_path: Path, result: dict, concurrent: int, runs: int) -> Path:
+    path = tuned_path(model_path)
+    record = {
+        "format": TUNE_FORMAT,
+        "model": Path(model_path).name,
+        "model_sha256": sha256_file(Path(model_path)),
+        "host": {"cpus": _cpu_count(), "machine": platform.machine(), "processor": platform.processor()},
+        "concurrent_sessions": concurrent,
+        "runs": runs,
+        **result,
+    }
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(record, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+    return path
+
+
+def _ints(text: str) -> list[int]:
+    return [int(v) for v in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ort_tune", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", type=Path,
+                        help="ONNX models (default: every .onnx in models/saved_model)")
+    parser.add_argument("--batch-sizes", type=_ints, help="batch sizes for batch-dynamic models")
+    parser.add_argument("--seq-lens", type=_ints, help="sequence lengths for seq-dynamic models")
+    parser.add_argument("--concurrent", type=int, default=1, help="sessions sharing the host")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args(argv)
+
+    models = args.models or sorted(MODEL_DIR.glob("*.onnx"))
+    if not models:
+        print(f"No ONNX models given or found in {MODEL_DIR}")
+        raise SystemExit(1)
+
+    for model_path in models:
+        workloads = model_workloads(model_path, args.batch_sizes, args.seq_lens)
+        shapes = ", ".join(f"b={w['batch']}" + (f" L={w['seq_len']}" if w["seq_len"] else "")
+                           for w in workloads)
+        print(f"\n{model_path.name}: {len(workloads)} workloads ({shapes}), "
+              f"{args.concurrent} concurrent session(s), {_cpu_count()} cores")
+        result = tune(model_path, workloads, args.runs, args.concurrent)
+        out = save_tuned(model_path, result, args.concurrent, args.runs)
+        print(f"  best: {_describe(result['options'])} — {result['speedup']:.2f}x vs defaults "
+              f"({result['configs_tried']} configs)")
+        for w in result["workloads"]:
+            label = f"b={w['batch']}" + (f" L={w['seq_len']}" if w["seq_len"] else "")
+            print(f"    {label:<12} {w['default_p50_ms']:8.3f} -> {w['tuned_p50_ms']:8.3f} ms")
+        print(f"  Saved: {out}")
+
+
+if __name__ == "__main__":
+    main()
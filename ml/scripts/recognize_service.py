@@ -0,0 +1,229 @@
+"""
+Local sign recognizer for the server's routing layer.
+
+server/src/routes/asl.ts (and api/asl/recognize.ts) ask this service first
+for the sign languages in ASL_LOCAL_LANGUAGES and only fall back to the LLM
+when it is unsure, unreachable, or the language isn't served here (see
+lib/signRouter.ts). The request is the client's own /api/asl/recognize
+body, so the server forwards it as is:
+
+    POST /recognize   {"landmarks": [LandmarkSnapshot, ...], "signLanguage": "ASL"}
+                  ->  {"sign": "hello", "confidence": 0.93, "frames": 2}
+
+An optional "vocabulary" picks a registry entry ("BSL" + "medical" -> BSL/medical);
+a language or vocabulary without a model gets 422. Requests with fewer than
+--min-frames snapshots get an empty answer without running the model: the
+models are trained on SEQ_LEN-frame windows with face landmarks, and the
+current client (useASLVisionPipeline.ts) sends at most 2 snapshots of hands +
+pose, which never clears the server's confidence bar. The server applies the
+same gate (ASL_LOCAL_MIN_FRAMES) before calling this service at all.
+
+Snapshots (visionService.ts: per-hand 21 points + handedness + 25 pose points)
+are scattered into holistic [T, 543, 3] frames, NaN where nothing was
+detected, and classified by one of the backends:
+
+    onnx      ASLRecognizer over asl_deberta.onnx (or --model), ASL only
+    cascade   CascadeRecognizer: BiLSTM first, DeBERTa for low-margin windows, ASL only
+    registry  ModelRegistry over --manifest: every language / vocabulary it lists,
+              loaded on first request, least recently used evicted past --budget-mb
+    stub      fixed --stub-sign / --stub-confidence, for testing the routing
+
+GET /metrics and /metrics.json expose the stage latencies (metrics.py).
+
+Usage:
+    python recognize_service.py [--port 8765] [--backend onnx|cascade|registry|stub] [--model path]
+                                [--min-frames 8]
+                                [--manifest models/saved_model/registry.json] [--budget-mb 1024]
+    python cli.py serve ...
+"""
+
+import argparse
+import json
+import time
+import traceback
+from pathlib import Path
+
+import numpy as np
+
+from landmark_config import KEPT_LANDMARKS, N_HOLISTIC
+
+LEFT_HAND_ROWS = np.array(KEPT_LANDMARKS[0])
+RIGHT_HAND_ROWS = np.array(KEPT_LANDMARKS[1])
+POSE_START = 489                # pose rows 489-521 in the holistic layout
+DEFAULT_PORT = 8765
+MIN_FRAMES = 8                  # shortest prefix adaptive_length.py classifies
+MAX_BODY = 1 << 20              # landmark JSON only; frames (images) are dropped by the server
+
+
+def snapshots_to_holistic(snapshots: list[dict]) -> np.ndarray:
+    """Client LandmarkSnapshots -> [T, 543, 3] float32, NaN where not detected."""
+    out = np.full((len(snapshots), N_HOLISTIC, 3), np.nan, dtype=np.float32)
+    for t, snap in enumerate(snapshots):
+        hands = snap.get("hands") or []
+        handedness = snap.get("handedness") or []
+        for i, hand in enumerate(hands):
+            if len(hand) != len(LEFT_HAND_ROWS):
+                continue
+            side = handedness[i] if i < len(handedness) else "Unknown"
+            # MediaPipe labels the mirrored image: "Right" is the signer's left
+            # hand (landmarkAssembler.ts buildHolisticMap does the same)
+            rows = LEFT_HAND_ROWS if side == "Right" else RIGHT_HAND_ROWS
+            out[t, rows] = [(p["x"], p["y"], p.get("z", 0.0)) for p in hand]
+        pose = snap.get("pose") or []
+        if pose:
+            out[t, POSE_START:POSE_START + len(pose)] = [(p["x"], p["y"], p.get("z", 0.0)) for p in pose]
+    return out
+
+
+def _asl_only(language: str, vocabulary: str | None = None) -> str:
+    if language != "ASL" or vocabulary:
+        raise KeyError(f"no model for {language}{'/' + vocabulary if vocabulary else ''} (only ASL is served)")
+    return "ASL"
+
+
+def parse_request(body: bytes) -> tuple[np.ndarray, str, str | None]:
+    """(holistic [T, 543, 3], signLanguage, vocabulary) from a /recognize body; ValueError if malformed."""
+    msg = json.loads(body)
+    if not isinstance(msg, dict):
+        raise ValueError("body must be a JSON object")
+    snapshots = msg.get("landmarks") or []
+    if not isinstance(snapshots, list) or not all(isinstance(s, dict) for s in snapshots):
+        raise ValueError("landmarks must be a list of snapshot objects")
+    language, vocabulary = msg.get("signLanguage", "ASL"), msg.get("vocabulary")
+    if not isinstance(language, str) or not isinstance(vocabulary, (str, type(None))):
+        raise ValueError("signLanguage / vocabulary must be strings")
+    try:
+        return snapshots_to_holistic(snapshots), language, vocabulary
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"malformed snapshot: {e!r}") from e
+
+
+def make_recognizer(backend: str, model: Path | None = None, stub_sign: str = "hello",
+                    stub_confidence: float = 0.9, stub_ms: float = 0.0,
+                    manifest: Path | None = None, budget_mb: float | None = None):
+    """
+    (resolve, recognize) for the chosen backend: resolve(language, vocabulary)
+    -> model name, KeyError when nothing serves it; recognize(holistic
+    [T, 543, 3], name) -> {sign, confidence}.
+    """
+    if backend == "stub":
+        def recognize(holistic, name):
+            if stub_ms:
+                time.sleep(stub_ms / 1000)
+            return {"sign": stub_sign, "confidence": stub_confidence}
+        return _asl_only, recognize
+
+    if backend == "registry":
+        from model_registry import MANIFEST_PATH, ModelRegistry
+
+        registry = ModelRegistry.from_manifest(manifest or MANIFEST_PATH, budget_mb=budget_mb,
+                                              shared_threads=True)
+        print(f"Registry languages: {', '.join(registry.languages())} ({len(registry.specs)} models)")
+
+        def recognize(holistic, name):
+            result = registry.get(name).classify_holistic(holistic)
+            return {"sign": result["word"], "confidence": result["confidence"]}
+        return registry.resolve, recognize
+
+    if backend == "cascade":
+        from cascade import CascadeRecognizer
+
+        recognizer = CascadeRecognizer(large_path=model)
+    else:
+        from asl_inference import ASLRecognizer, MODEL_PATH
+
+        recognizer = ASLRecognizer(model or MODEL_PATH)
+
+    def recognize(holistic, name):
+        result = recognizer.classify_holistic(holistic)
+        return {"sign": result["word"], "confidence": result["confidence"]}
+    return _asl_only, recognize
+
+
+def serve(port: int, resolve, recognize, host: str = "127.0.0.1", min_frames: int = MIN_FRAMES):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from metrics import REGISTRY, handle_metrics_request
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if not handle_metrics_request(self):
+                self.send_error(404)
+
+        def do_POST(self):
+            if self.path != "/recognize":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY:
+                self.send_error(413)
+                return
+            with REGISTRY.in_flight():
+                try:
+                    with REGISTRY.time("decode"):
+                        holistic, language, vocabulary = parse_request(self.rfile.read(length))
+                except ValueError as e:
+                    self._reply(400, {"error": f"bad request: {e}"})
+                    return
+                try:
+                    name = resolve(language, vocabulary)
+                except KeyError as e:
+                    self._reply(422, {"error": e.args[0]})
+                    return
+                if len(holistic) < max(min_frames, 1):
+                    result = {"sign": "", "confidence": 0.0}
+                else:
+                    try:
+                        result = recognize(holistic, name)
+                    except Exception as e:
+                        traceback.print_exc()
+                        self._reply(500, {"error": f"recognizer failed: {e!r}"})
+                        return
+            self._reply(200, {**result, "frames": len(holistic)})
+
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    print(f"Serving local recognizer on http://{host}:{port}/recognize", flush=True)
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local sign recognizer for the server's LLM-fallback routing")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--backend", choices=["onnx", "cascade", "registry", "stub"], default="onnx")
+    parser.add_argument("--model", type=Path, default=None, help="DeBERTa model (onnx / cascade large model)")
+    parser.add_argument("--manifest", type=Path, default=None, help="registry manifest (registry backend)")
+    parser.add_argument("--budget-mb", type=float, default=None, help="registry RAM budget (default: manifest's)")
+    parser.add_argument("--min-frames", type=int, default=MIN_FRAMES,
+                        help="answer empty without running the model below this many snapshots")
+    parser.add_argument("--stub-sign", default="hello")
+    parser.add_argument("--stub-confidence", type=float, default=0.9)
+    parser.add_argument("--stub-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    resolve, recognize = make_recognizer(args.backend, args.model, args.stub_sign, args.stub_confidence,
+                                         args.stub_ms, args.manifest, args.budget_mb)
+    try:
+        serve(args.port, resolve, recognize, args.host, args.min_frames)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
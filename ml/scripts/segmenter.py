@@ -0,0 +1,249 @@
+"""
+Continuous-signing segmentation over long holistic landmark streams.
+
+The rest of the pipeline assumes one sign per isolated clip. This stage takes a
+whole stream [T, 543, 3] (NaN = not detected), finds candidate sign segments in
+one vectorized pass from hand presence and hand speed, and classifies only those
+segments — batched by length through asl_deberta_batched.onnx when it exists —
+into a timestamped word stream:
+
+    recognizer = ContinuousRecognizer()
+    for word in recognizer(stream, fps=30):
+        print(f"{word['start_s']:6.2f}-{word['end_s']:6.2f}s  {word['word']}")
+
+Segmentation:
+    presence   either hand detected; detection dropouts up to max_gap frames are bridged
+    speed      per-frame displacement of each hand's centroid (max over hands), smoothed
+    segments   presence runs, split where speed stays below pause_speed for min_pause
+               frames; runs shorter than min_len are dropped and runs longer than
+               max_len are cut into equal parts
+
+Benchmark: python cli.py bench segment [--clips 200]
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from asl_inference import ASLRecognizer, MODEL_PATH, normalize_window, softmax
+from landmark_config import KEPT_LANDMARKS, SEQ_LEN
+
+BATCHED_MODEL_PATH = MODEL_PATH.with_name("asl_deberta_batched.onnx")
+HAND_ROWS = np.array(KEPT_LANDMARKS[0] + KEPT_LANDMARKS[1])   # left then right, 21 each
+MAX_BATCH = 32
+
+
+@dataclass
+class SegmenterConfig:
+    max_gap: int = 3            # bridge hand-detection dropouts up to this many frames
+    smooth: int = 5             # box filter width for the speed signal
+    pause_speed: float = 0.004  # normalized image units per frame
+    min_pause: int = 6          # frames below pause_speed that end a sign
+    min_len: int = 6            # shorter candidates are dropped
+    max_len: int = 3 * SEQ_LEN  # longer candidates are cut into equal parts
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start (inclusive) and end (exclusive) indices of every True run."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _fill_short(mask: np.ndarray, value: bool, max_len: int) -> np.ndarray:
+    """Set interior runs of `not value` no longer than max_len to `value`."""
+    out = mask.copy()
+    starts, ends = _runs(mask != value)
+    interior = (starts > 0) & (ends < len(mask)) & (ends - starts <= max_len)
+    for s, e in zip(starts[interior], ends[interior]):
+        out[s:e] = value
+    return out
+
+
+def hand_signals(holistic: np.ndarray, smooth: int = 5) -> tuple[np.ndarray, np.ndarray]:
+    """holistic [T, 543, 3] -> (presence [T] bool, smoothed hand speed [T] float)."""
+    hands = holistic[:, HAND_ROWS, :2].reshape(len(holistic), 2, 21, 2)     # [T, hand, point, xy]
+    valid = ~np.isnan(hands[..., 0])                                          # [T, hand, point]
+    count = valid.sum(-1)                                                     # [T, hand]
+    centroid = np.where(valid[..., None], hands, 0.0).sum(2) / np.maximum(count, 1)[..., None]
+    present = count > 0
+    step = np.linalg.norm(np.diff(centroid, axis=0), axis=-1)                # [T-1, hand]
+    step = np.where(present[1:] & present[:-1], step, 0.0).max(-1)
+    speed = np.concatenate([[0.0], step])
+    if smooth > 1:
+        speed = np.convolve(speed, np.ones(smooth) / smooth, mode="same")
+    return present.any(-1), speed
+
+
+def segment(holistic: np.ndarray, config: SegmenterConfig = SegmenterConfig()) -> list[tuple[int, int]]:
+    """Candidate sign segments [(start, end)] in frame indices (end exclusive)."""
+    presence, speed = hand_signals(holistic, config.smooth)
+    active = _fill_short(presence, True, config.max_gap)
+    paused = active & (speed < config.pause_speed)
+    # A pause only splits a sign once it has lasted min_pause frames
+    starts, ends = _runs(paused)
+    keep_short = ends - starts < config.min_pause
+    for s, e in zip(starts[keep_short], ends[keep_short]):
+        paused[s:e] = False
+    starts, ends = _runs(active & ~paused)
+
+    segments = []
+    for s, e in zip(starts, ends):
+        n = e - s
+        if n < config.min_len:
+            continue
+        parts = -(-n // config.max_len)
+        bounds = np.linspace(s, e, parts + 1).round().astype(int)
+        segments.extend(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+    return segments
+
+
+def segment_window(frames: np.ndarray, seq_len: int = SEQ_LEN) -> np.ndarray:
+    """Assembled [n, 5, 100] segment -> normalized model input of <= seq_len frames
+    (longer segments uniformly sampled, as pad_or_truncate does)."""
+    if len(frames) > seq_len:
+        frames = frames[np.linspace(0, len(frames) - 1, seq_len).astype(int)]
+    return normalize_window(frames)
+
+
+class ContinuousRecognizer:
+    """Segmenter + length-bucketed batch classification of the candidate segments."""
+
+    def __init__(self, model_path: Path | None = None, config: SegmenterConfig = SegmenterConfig(),
+                 min_confidence: float = 0.0, max_batch: int = MAX_BATCH, **recognizer_kwargs):
+        if model_path is None:
+            model_path = BATCHED_MODEL_PATH if BATCHED_MODEL_PATH.exists() else MODEL_PATH
+        self.recognizer = ASLRecognizer(model_path, **recognizer_kwargs)
+        self.batched = len(self.recognizer.session.get_inputs()[0].shape) == 4
+        self.config = config
+        self.min_confidence = min_confidence
+        self.max_batch = max_batch if self.batched else 1
+
+    def classify_segments(self, holistic: np.ndarray, segments: list[tuple[int, int]]) -> np.ndarray:
+        """Logits [n_segments, NUM_CLASSES]; segments of equal length share a batch."""
+        if not segments:
+            return np.zeros((0, len(self.recognizer.labels)), dtype=np.float32)
+        with self.recognizer.metrics.time("assemble"):
+            assembled = self.recognizer.assembler(holistic)     # one pass over the whole stream
+        windows = [segment_window(assembled[s:e], self.recognizer.seq_len) for s, e in segments]
+        logits = [None] * len(windows)
+        by_len: dict[int, list[int]] = {}
+        for i, w in enumerate(windows):
+            by_len.setdefault(len(w), []).append(i)
+
+        session, name = self.recognizer.session, self.recognizer.input_name
+        for idx in by_len.values():
+            for start in range(0, len(idx), self.max_batch):
+                chunk = idx[start:start + self.max_batch]
+                batch = np.stack([windows[i] for i in chunk])
+                with self.recognizer.metrics.time("infer"):
+                    if self.batched:
+                        out = session.run(None, {name: batch})[0]
+                    else:
+                        out = session.run(None, {name: batch[0]})[0]
+                self.recognizer.metrics.batch_fill.observe(len(chunk) / self.max_batch)
+                for i, row in zip(chunk, out):
+                    logits[i] = row
+        return np.stack(logits)
+
+    def __call__(self, holistic: np.ndarray, fps: float = 30.0, timestamps: np.ndarray | None = None) -> list[dict]:
+        """holistic [T, 543, 3] -> [{word, confidence, start_s, end_s, start_frame, end_frame}]."""
+        if timestamps is None:
+            timestamps = np.arange(len(holistic) + 1) / fps
+        segments = segment(holistic, self.config)
+        words = []
+        for (s, e), logits in zip(segments, self.classify_segments(holistic, segments)):
+            probs = softmax(logits)
+            top = int(probs.argmax())
+            if probs[top] < self.min_confidence:
+                continue
+            words.append({
+                "word": self.recognizer.labels[top],
+                "confidence": float(probs[top]),
+                "start_s": float(timestamps[s]),
+                "end_s": float(timestamps[min(e, len(timestamps) - 1)]),
+                "start_frame": int(s),
+                "end_frame": int(e),
+            })
+        return words
+
+
+def synthetic_stream(n_clips: int, seed: int = 0, gap: tuple = (8, 20)):
+    """
+    Concatenate random Kaggle clips into one stream, separated by hands-down
+    gaps (hands NaN, face/pose held). Returns (stream [T, 543, 3], [(start, end, sign)]).
+    """
+    import pandas as pd
+
+    from collect_landmarks import DATA_DIR, TRAIN_CSV, load_parquet_holistic
+
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(TRAIN_CSV)
+    rows = df.iloc[rng.choice(len(df), n_clips, replace=len(df) < n_clips)]
+    pieces, truth, t = [], [], 0
+    for path, sign in zip(rows["path"], rows["sign"]):
+        clip = load_parquet_holistic(DATA_DIR / path)
+        rest = np.repeat(clip[-1:], int(rng.integers(*gap)), axis=0)
+        rest[:, HAND_ROWS] = np.nan
+        pieces += [clip, rest]
+        truth.append((t, t + len(clip), sign))
+        t += len(clip) + len(rest)
+    return np.concatenate(pieces), truth
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench segment`: throughput (frames/sec) of segmentation alone and of
+    segmentation + classification, against the client-style sliding window
+    (every stride frames, classify the last SEQ_LEN), on concatenated Kaggle clips.
+    """
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(prog="bench segment")
+    parser.add_argument("--clips", type=int, default=200)
+    parser.add_argument("--stride", type=int, default=4, help="sliding-window baseline stride (frames)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stream, truth = synthetic_stream(args.clips, args.seed)
+    n = len(stream)
+    print(f"Stream: {args.clips} clips, {n} frames")
+
+    t0 = time.perf_counter()
+    segments = segment(stream)
+    seg_s = time.perf_counter() - t0
+
+    # Boundary quality: a clip counts as found if some segment overlaps it by IoU >= 0.5
+    found = 0
+    for s, e, _ in truth:
+        for a, b in segments:
+            inter = min(e, b) - max(s, a)
+            if inter > 0 and inter / (max(e, b) - min(s, a)) >= 0.5:
+                found += 1
+                break
+
+    recognizer = ContinuousRecognizer()
+    recognizer(stream[:200])  # warm-up
+    t0 = time.perf_counter()
+    words = recognizer(stream)
+    e2e_s = time.perf_counter() - t0
+
+    plain = ASLRecognizer(MODEL_PATH)
+    t0 = time.perf_counter()
+    assembled = plain.assembler(stream)
+    n_windows = 0
+    for end in range(SEQ_LEN, n + 1, args.stride):
+        plain.logits(normalize_window(assembled[end - SEQ_LEN:end]))
+        n_windows += 1
+    slide_s = time.perf_counter() - t0
+
+    model = "batched" if recognizer.batched else "per-window"
+    print(f"Segments: {len(segments)} for {len(truth)} clips, {found / len(truth):.1%} of clips matched (IoU >= 0.5)")
+    rows = [("Segmentation only", seg_s, ""),
+            (f"Segment + classify ({model})", e2e_s, f"  ({len(words)} words)"),
+            (f"Sliding window, stride {args.stride}", slide_s, f"  ({n_windows} windows)")]
+    for label, secs, note in rows:
+        print(f"  {label:<34} {n / secs:12,.0f} frames/s{note}")
+    return {"frames": n, "segments": len(segments), "clips": len(truth), "clip_recall": found / len(truth),
+            "segment_fps": n / seg_s, "end_to_end_fps": n / e2e_s, "sliding_fps": n / slide_s}
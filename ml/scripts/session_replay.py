@@ -0,0 +1,473 @@
+"""
+Record / replay landmark sessions for offline latency regression testing.
+
+Recording format (.aslrec, append-only, little-endian):
+
+    header   b"ASLREC01" | u32 length | JSON {format, frame_shape, mapping_version, fps, meta}
+    chunk*   b"CHNK" | u32 frames | u32 crc32(payload) | payload =
+             float64 timestamps[frames] + float32 frames[frames, 5, 100]
+    index    JSON {"chunks": [[offset, frames, t_first, t_last], ...]}
+    trailer  u64 index offset | b"AIDX"
+
+Frames are the assembled [5, 100] landmarks (LandmarkAssembler output, NaN =
+missing), the same thing the client gesture buffer holds. The index and trailer
+are written on close; reopening a recording for append drops them and keeps
+writing chunks, and a recording whose writer died without closing is recovered
+by scanning chunks up to the last one with a valid CRC.
+
+The replayer feeds a recording through the client's windowing (a window every
+`stride` frames once SEQ_LEN frames are buffered, buffer cleared when the hands
+disappear), normalization, ONNX inference and the gestureBuffer.ts majority vote
+(cooldown measured on recording timestamps, so the word timeline is
+deterministic), at max speed or in real time.
+
+Usage:
+    python session_replay.py record out.aslrec [--clips 40 | --procedural --seconds 60] [--fps 30]
+    python session_replay.py replay rec.aslrec [more.aslrec ...] [--realtime] [--model m.onnx]
+                                   [--out report.json] [--baseline old.json] [--max-regression 1.25]
+                                   [--metrics metrics.json]
+    python session_replay.py info rec.aslrec
+
+With --baseline, replay exits non-zero if a recording's word timeline changed or
+a stage's p50 latency regressed by more than --max-regression.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from landmark_config import SEQ_LEN
+
+MAGIC = b"ASLREC01"
+CHUNK_MAGIC = b"CHNK"
+TRAILER_MAGIC = b"AIDX"
+FORMAT_VERSION = 1
+FRAME_SHAPE = (5, 100)
+CHUNK_FRAMES = 64
+
+_CHUNK_HEAD = struct.Struct("<4sII")
+_TRAILER = struct.Struct("<Q4s")
+
+# gestureBuffer.ts defaults
+STRIDE = 4
+VOTE_WINDOW = 8
+VOTE_QUORUM = 0.5
+MIN_AVG_CONFIDENCE = 0.03
+COOLDOWN_S = 0.8
+N_HAND_COLUMNS = 42      # assembled columns 0-41 are the two hands
+
+
+class RecordingError(Exception):
+    """Malformed or truncated .aslrec file."""
+
+
+# ---------------------------------------------------------------------------
+# Format
+# ---------------------------------------------------------------------------
+
+def _frame_bytes(n: int) -> int:
+    return n * (8 + 4 * FRAME_SHAPE[0] * FRAME_SHAPE[1])
+
+
+def _read_header(f) -> tuple[dict, int]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise RecordingError("not an .aslrec file")
+    (length,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise RecordingError(f"unsupported format {header.get('format')}")
+    return header, len(MAGIC) + 4 + length
+
+
+def _scan_chunks(f, start: int) -> tuple[list[list], int]:
+    """Walk chunks from `start`, stopping at the first torn or corrupt one.
+    Returns (index entries, end offset of the last valid chunk)."""
+    chunks, offset = [], start
+    f.seek(offset)
+    while True:
+        head = f.read(_CHUNK_HEAD.size)
+        if len(head) < _CHUNK_HEAD.size:
+            break
+        magic, n, crc = _CHUNK_HEAD.unpack(head)
+        if magic != CHUNK_MAGIC:
+            break
+        payload = f.read(_frame_bytes(n))
+        if len(payload) < _frame_bytes(n) or zlib.crc32(payload) != crc:
+            break
+        ts = np.frombuffer(payload, dtype="<f8", count=n)
+        chunks.append([offset, n, float(ts[0]), float(ts[-1])])
+        offset += _CHUNK_HEAD.size + len(payload)
+    return chunks, offset
+
+
+def _read_index(f) -> tuple[list[list], int] | None:
+    """(chunks, index offset) from the trailer, or None if the file wasn't closed."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    if size < _TRAILER.size:
+        return None
+    f.seek(size - _TRAILER.size)
+    offset, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+    if magic != TRAILER_MAGIC or offset >= size:
+        return None
+    f.seek(offset)
+    return json.loads(f.read(size - _TRAILER.size - offset))["chunks"], offset
+
+
+class SessionWriter:
+    """Append [5, 100] frames with timestamps; chunks are flushed every `chunk_frames`."""
+
+    def __init__(self, path: Path, mapping_version: str | None = None, fps: float | None = None,
+                 chunk_frames: int = CHUNK_FRAMES, meta: dict | None = None):
+        self.path = Path(path)
+        self.chunk_frames = chunk_frames
+        self._ts: list[float] = []
+        self._frames: list[np.ndarray] = []
+        if self.path.exists() and self.path.stat().st_size > 0:
+            self._f = open(self.path, "r+b")
+            self.header, start = _read_header(self._f)
+            indexed = _read_index(self._f)
+            if indexed is not None:
+                self.chunks, end = indexed
+            else:
+                self.chunks, end = _scan_chunks(self._f, start)
+            self._f.truncate(end)
+            self._f.seek(end)
+        else:
+            self._f = open(self.path, "wb")
+            self.header = {"format": FORMAT_VERSION, "frame_shape": list(FRAME_SHAPE),
+                           "mapping_version": mapping_version, "fps": fps,
+                           "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "meta": meta or {}}
+            body = json.dumps(self.header).encode()
+            self._f.write(MAGIC + struct.pack("<I", len(body)) + body)
+            self.chunks = []
+
+    def append(self, timestamp: float, frame: np.ndarray):
+        self._ts.append(float(timestamp))
+        self._frames.append(np.asarray(frame, dtype=np.float32).reshape(FRAME_SHAPE))
+        if len(self._ts) >= self.chunk_frames:
+            self.flush()
+
+    def extend(self, timestamps, frames):
+        for t, frame in zip(timestamps, frames):
+            self.append(t, frame)
+
+    def flush(self):
+        if not self._ts:
+            return
+        payload = (np.asarray(self._ts, dtype="<f8").tobytes()
+                   + np.stack(self._frames).astype("<f4", copy=False).tobytes())
+        offset = self._f.tell()
+        self._f.write(_CHUNK_HEAD.pack(CHUNK_MAGIC, len(self._ts), zlib.crc32(payload)) + payload)
+        self._f.flush()
+        self.chunks.append([offset, len(self._ts), self._ts[0], self._ts[-1]])
+        self._ts, self._frames = [], []
+
+    def close(self):
+        self.flush()
+        offset = self._f.tell()
+        self._f.write(json.dumps({"chunks": self.chunks}).encode())
+        self._f.write(_TRAILER.pack(offset, TRAILER_MAGIC))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    """Indexed random access to a recording (falls back to a chunk scan if unclosed)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.header, start = _read_header(f)
+            indexed = _read_index(f)
+            self.recovered = indexed is None
+            self.chunks = _scan_chunks(f, start)[0] if indexed is None else indexed[0]
+
+    def __len__(self) -> int:
+        return sum(n for _, n, _, _ in self.chunks)
+
+    @property
+    def duration(self) -> float:
+        return self.chunks[-1][3] - self.chunks[0][2] if self.chunks else 0.0
+
+    def read_chunk(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        offset, n, _, _ = self.chunks[i]
+        with open(self.path, "rb") as f:
+            f.seek(offset + _CHUNK_HEAD.size)
+            payload = f.read(_frame_bytes(n))
+        ts = np.frombuffer(payload, dtype="<f8", count=n)
+        frames = np.frombuffer(payload, dtype="<f4", offset=8 * n).reshape(n, *FRAME_SHAPE)
+        return ts, frames
+
+    def iter_chunks(self, start_s: float | None = None, end_s: float | None = None):
+        """(timestamps, frames) per chunk overlapping [start_s, end_s]; the index skips the rest."""
+        for i, (_, _, t0, t1) in enumerate(self.chunks):
+            if (start_s is not None and t1 < start_s) or (end_s is not None and t0 > end_s):
+                continue
+            yield self.read_chunk(i)
+
+    def read(self, start_s: float | None = None, end_s: float | None = None):
+        """All (timestamps [N], frames [N, 5, 100]) within [start_s, end_s]."""
+        parts = list(self.iter_chunks(start_s, end_s))
+        if not parts:
+            return np.zeros(0), np.zeros((0, *FRAME_SHAPE), dtype=np.float32)
+        ts = np.concatenate([p[0] for p in parts])
+        frames = np.concatenate([p[1] for p in parts])
+        keep = np.ones(len(ts), dtype=bool)
+        if start_s is not None:
+            keep &= ts >= start_s
+        if end_s is not None:
+            keep &= ts <= end_s
+        return ts[keep], frames[keep]
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+class VoteBuffer:
+    """Python port of the gestureBuffer.ts majority vote + same-word cooldown."""
+
+    def __init__(self, window: int = VOTE_WINDOW, quorum: float = VOTE_QUORUM,
+                 min_avg_confidence: float = MIN_AVG_CONFIDENCE, cooldown_s: float = COOLDOWN_S):
+        self.window = window
+        self.quorum = quorum
+        self.min_avg_confidence = min_avg_confidence
+        self.cooldown_s = cooldown_s
+        self.votes: list[tuple[str, float]] = []
+        self.last_word = None
+        self.last_emit = -np.inf
+
+    def reset(self):
+        self.votes = []
+
+    def push(self, word: str, confidence: float, now: float) -> tuple[str, float] | None:
+        self.votes = (self.votes + [(word, confidence)])[-self.window:]
+        if len(self.votes) < np.ceil(self.window * self.quorum):
+            return None
+        counts = Counter(w for w, _ in self.votes)
+        totals = Counter()
+        for w, c in self.votes:
+            totals[w] += c
+        best, best_count, best_avg = "", 0, 0.0
+        for w, count in counts.items():   # insertion order, like the TS Map
+            avg = totals[w] / count
+            if count > best_count or (count == best_count and avg > best_avg):
+                best, best_count, best_avg = w, count, avg
+        if best_count < np.ceil(len(self.votes) * self.quorum) or best_avg < self.min_avg_confidence:
+            return None
+        if best == self.last_word and now - self.last_emit < self.cooldown_s:
+            return None
+        self.last_word, self.last_emit = best, now
+        self.votes = []
+        return best, best_avg
+
+
+def replay(path: Path, recognizer, realtime: bool = False, stride: int = STRIDE) -> dict:
+    """Run one recording through windowing -> normalize -> infer -> vote."""
+    from asl_inference import softmax
+
+    reader = SessionReader(path)
+    version = reader.header.get("mapping_version")
+    if version and version != recognizer.mapping["version"]:
+        raise RecordingError(f"{Path(path).name} was recorded with mapping {version}, "
+                             f"model uses {recognizer.mapping['version']}")
+
+    stages = {"decode": [], "normalize": [], "infer": [], "vote": [], "window": []}
+    timeline = []
+    votes = VoteBuffer()
+    buffer: list[np.ndarray] = []
+    since = 0
+    wall0 = time.perf_counter()
+    rec0 = None
+
+    t0 = time.perf_counter()
+    for ts, frames in reader.iter_chunks():
+        decoded = time.perf_counter() - t0
+        stages["decode"].append(decoded * 1000 / len(ts))
+        recognizer.metrics.stage("decode").observe(decoded)
+        for t, frame in zip(ts, frames):
+            if rec0 is None:
+                rec0 = t
+            if realtime:
+                delay = (t - rec0) - (time.perf_counter() - wall0)
+                if delay > 0:
+                    time.sleep(delay)
+            if np.isnan(frame[1, :N_HAND_COLUMNS]).all():
+                buffer, since = [], 0
+                votes.reset()
+                continue
+            buffer = (buffer + [frame])[-SEQ_LEN:]
+            since += 1
+            if len(buffer) < SEQ_LEN or since < stride:
+                continue
+            since = 0
+
+            a = time.perf_counter()
+            window = recognizer.normalize(np.stack(buffer))
+            b = time.perf_counter()
+            probs = softmax(recognizer.logits(window))
+            c = time.perf_counter()
+            top = int(probs.argmax())
+            emitted = votes.push(recognizer.labels[top], float(probs[top]), float(t))
+            d = time.perf_counter()
+            recognizer.metrics.stage("vote").observe(d - c)
+            for name, span in (("normalize", b - a), ("infer", c - b), ("vote", d - c), ("window", d - a)):
+                stages[name].append(span * 1000)
+            if emitted:
+                timeline.append({"t": round(float(t - rec0), 4), "word": emitted[0],
+                                 "confidence": round(emitted[1], 6)})
+        t0 = time.perf_counter()
+
+    wall = time.perf_counter() - wall0
+    return {
+        "recording": Path(path).name,
+        "frames": len(reader),
+        "duration_s": reader.duration,
+        "windows": len(stages["window"]),
+        "wall_s": wall,
+        "realtime_factor": reader.duration / wall if wall else None,
+        "stages": {name: {"p50_ms": float(np.percentile(v, 50)), "p95_ms": float(np.percentile(v, 95)),
+                          "p99_ms": float(np.percentile(v, 99))}
+                   for name, v in stages.items() if v},
+        "timeline": timeline,
+    }
+
+
+def compare_baseline(results: list[dict], baseline: dict, max_regression: float) -> list[str]:
+    old = {r["recording"]: r for r in baseline.get("results", [])}
+    failures = []
+    for r in results:
+        prev = old.get(r["recording"])
+        if prev is None:
+            continue
+        if [(w["t"], w["word"]) for w in r["timeline"]] != [(w["t"], w["word"]) for w in prev["timeline"]]:
+            failures.append(f"{r['recording']}: word timeline changed "
+                            f"({len(prev['timeline'])} -> {len(r['timeline'])} words)")
+        for stage in ("normalize", "infer", "vote"):
+            a, b = prev["stages"].get(stage), r["stages"].get(stage)
+            if a and b and b["p50_ms"] > a["p50_ms"] * max_regression and b["p50_ms"] - a["p50_ms"] > 0.01:
+                failures.append(f"{r['recording']} {stage}: p50 {a['p50_ms']:.3f} -> "
+                                f"{b['p50_ms']:.3f} ms (> {max_regression:.2f}x)")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _record(args):
+    from asl_inference import LandmarkAssembler
+    from landmark_mapping import load_mapping
+
+    mapping = load_mapping()
+    if args.procedural:
+        from load_test import procedural_stream
+        holistic = procedural_stream(int(args.seconds * args.fps), args.seed, args.fps)
+        source = f"procedural seed {args.seed}"
+    else:
+        from segmenter import synthetic_stream
+        holistic, _ = synthetic_stream(args.clips, args.seed)
+        source = f"{args.clips} Kaggle clips, seed {args.seed}"
+    frames = LandmarkAssembler(mapping)(holistic)
+    if args.output.exists() and not args.append:
+        args.output.unlink()
+    with SessionWriter(args.output, mapping["version"], args.fps, meta={"source": source}) as writer:
+        start = writer.chunks[-1][3] + 1 / args.fps if writer.chunks else 0.0
+        writer.extend(start + np.arange(len(frames)) / args.fps, frames)
+    reader = SessionReader(args.output)
+    print(f"Recorded {len(frames)} frames ({source}) -> {args.output} "
+          f"[{len(reader)} frames, {len(reader.chunks)} chunks, {args.output.stat().st_size / 1e6:.1f} MB]")
+
+
+def _info(args):
+    reader = SessionReader(args.recording)
+    print(json.dumps({**reader.header, "frames": len(reader), "chunks": len(reader.chunks),
+                      "duration_s": round(reader.duration, 3), "recovered": reader.recovered}, indent=2))
+
+
+def _replay(args):
+    from asl_inference import ASLRecognizer, MODEL_PATH
+
+    recognizer = ASLRecognizer(args.model or MODEL_PATH)
+    if recognizer.fused:
+        print(f"{recognizer.model_path.name} is a fused model; replay needs the [5, 100] input model")
+        sys.exit(2)
+    results = []
+    for path in args.recordings:
+        r = replay(path, recognizer, realtime=args.realtime, stride=args.stride)
+        results.append(r)
+        print(f"\n{r['recording']}: {r['frames']} frames, {r['duration_s']:.1f}s, {r['windows']} windows, "
+              f"{r['realtime_factor']:.1f}x real time")
+        for name, s in r["stages"].items():
+            print(f"  {name:<10} p50 {s['p50_ms']:7.3f} ms  p95 {s['p95_ms']:7.3f} ms  p99 {s['p99_ms']:7.3f} ms")
+        words = ", ".join(f"{w['t']:.2f}s {w['word']}" for w in r["timeline"][:12])
+        print(f"  words ({len(r['timeline'])}): {words}{' ...' if len(r['timeline']) > 12 else ''}")
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare_baseline(results, json.load(f), args.max_regression)
+    if args.out:
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "model": recognizer.model_path.name,
+                  "realtime": args.realtime, "stride": args.stride, "results": results}
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = args.out.with_suffix(".tmp")
+        tmp.write_text(json.dumps(report, indent=2))
+        os.replace(tmp, args.out)
+        print(f"\nSaved: {args.out}")
+    if args.metrics:
+        recognizer.metrics.dump(args.metrics)
+        print(f"Metrics: {args.metrics}")
+    if failures:
+        print("\nRegressions:")
+        for line in failures:
+            print(f"  ✗ {line}")
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record / replay landmark sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="write a synthetic session recording")
+    p.add_argument("output", type=Path)
+    p.add_argument("--clips", type=int, default=40, help="Kaggle clips to concatenate")
+    p.add_argument("--procedural", action="store_true", help="procedural stream instead of Kaggle clips")
+    p.add_argument("--seconds", type=float, default=60.0)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--append", action="store_true", help="append to an existing recording")
+
+    p = sub.add_parser("replay", help="replay recordings and report per-stage latency + word timeline")
+    p.add_argument("recordings", nargs="+", type=Path)
+    p.add_argument("--model", type=Path, default=None)
+    p.add_argument("--realtime", action="store_true", help="pace frames by their timestamps")
+    p.add_argument("--stride", type=int, default=STRIDE)
+    p.add_argument("--out", type=Path, default=None)
+    p.add_argument("--baseline", type=Path, default=None, help="previous --out report to compare against")
+    p.add_argument("--max-regression", type=float, default=1.25)
+    p.add_argument("--metrics", type=Path, default=None, help="write the metrics registry as JSON")
+
+    p = sub.add_parser("info", help="print a recording's header and index summary")
+    p.add_argument("recording", type=Path)
+
+    args = parser.parse_args(argv)
+    {"record": _record, "replay": _replay, "info": _info}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
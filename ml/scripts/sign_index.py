@@ -0,0 +1,312 @@
+"""
+Open-vocabulary sign retrieval over DeBERTa embeddings.
+
+The embedding export (export_deberta_onnx.py --embedding) outputs the pooled
+fts.mean(1) features the 250-way logits head sees. Each sign gets a prototype:
+the normalized mean of its L2-normalized embeddings. Classification is one
+matrix-vector product of the query embedding against the prototype matrix
+(cosine similarity), so a new sign is added from a few recordings in seconds,
+without re-running collect_landmarks.py or retraining.
+
+Index layout (models/saved_model/sign_index/):
+    prototypes.f16   [n_signs, dim] float16, row-major, memory-mapped
+    index.json       format, dim, signs, sample counts, mean norms, mapping version
+
+Usage:
+    python sign_index.py build [--files 4000] [--per-sign 50]
+    python sign_index.py add <word> <recording.parquet|.npy> [...]
+    python sign_index.py eval [--files 2000]
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from asl_inference import LandmarkAssembler, normalize_window
+from landmark_mapping import MAPPING_PATH, MappingVersionError, check_model_version, load_mapping
+from ort_tune import create_session
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
+EMBED_MODEL = MODEL_DIR / "asl_deberta_embedding.onnx"
+INDEX_DIR = MODEL_DIR / "sign_index"
+
+INDEX_FORMAT = 1
+MATRIX_NAME = "prototypes.f16"
+META_NAME = "index.json"
+TOP_N = 5
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+class SignEmbedder:
+    """Embedding-model session + the same mapping-checked preprocessing as ASLRecognizer."""
+
+    def __init__(self, model_path: Path = EMBED_MODEL, mapping_path: Path = MAPPING_PATH,
+                 session_options=None):
+        self.mapping = load_mapping(mapping_path)
+        self.session = create_session(Path(model_path), session_options)
+        check_model_version(self.session.get_modelmeta().custom_metadata_map, self.mapping)
+        self.assembler = LandmarkAssembler(self.mapping)
+        self.input_name = self.session.get_inputs()[0].name
+        self.seq_len = self.mapping["seq_len"]
+
+    def embed_window(self, window: np.ndarray) -> np.ndarray:
+        """window: normalized [L, 5, 100] -> unit-length embedding [dim]."""
+        out = self.session.run(None, {self.input_name: np.ascontiguousarray(window, dtype=np.float32)})[0][0]
+        return l2_normalize(out)
+
+    def embed_holistic(self, holistic: np.ndarray) -> np.ndarray:
+        """holistic: [T, 543, 3] raw landmarks (NaN = missing); the last seq_len frames are used."""
+        return self.embed_window(normalize_window(self.assembler(holistic[-self.seq_len:])))
+
+
+def _atomic_write(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SignIndex:
+    """
+    Flat prototype index. The float16 matrix stays memory-mapped; scoring uses a
+    float32 copy made once at load (numpy has no fast float16 matmul), or the
+    mapped rows directly with compute_dtype=np.float16.
+
+    Prototypes are only comparable under the landmark mapping they were built
+    with. Opened with an `embedder`, the index checks the embedding model's
+    stamped mapping version against its own (check_model_version); add() rejects
+    embeddings from another mapping version, and with strict_mapping also those
+    that don't say which one they came from.
+    """
+
+    def __init__(self, index_dir: Path = INDEX_DIR, compute_dtype=np.float32,
+                 embedder: SignEmbedder | None = None, strict_mapping: bool = False):
+        self.index_dir = Path(index_dir)
+        self.compute_dtype = compute_dtype
+        self.strict_mapping = strict_mapping
+        with open(self.index_dir / META_NAME) as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported sign index format {meta.get('format')} in {self.index_dir}")
+        self.meta = meta
+        self.dim = meta["dim"]
+        self.signs: list[str] = meta["signs"]
+        self.counts: list[int] = meta["counts"]
+        self.norms: list[float] = meta["norms"]
+        self.mapping_version: str = meta["mapping_version"]
+        if embedder is not None:
+            check_model_version(embedder.session.get_modelmeta().custom_metadata_map,
+                                {"version": self.mapping_version}, strict=strict_mapping)
+        self._load_matrix()
+
+    @classmethod
+    def create(cls, index_dir: Path, dim: int, mapping_version: str, **kwargs) -> "SignIndex":
+        """Write an empty index (overwriting any existing one) and open it."""
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(index_dir / MATRIX_NAME, b"")
+        meta = {"format": INDEX_FORMAT, "dim": dim, "mapping_version": mapping_version,
+                "signs": [], "counts": [], "norms": []}
+        _atomic_write(index_dir / META_NAME, json.dumps(meta, indent=2).encode())
+        return cls(index_dir, **kwargs)
+
+    def _load_matrix(self):
+        n = len(self.signs)
+        if n:
+            self.prototypes = np.memmap(self.index_dir / MATRIX_NAME, dtype=np.float16, mode="r",
+                                        shape=(n, self.dim))
+        else:
+            self.prototypes = np.zeros((0, self.dim), dtype=np.float16)
+        self._matrix = np.asarray(self.prototypes, dtype=self.compute_dtype)
+        self._row = {sign: i for i, sign in enumerate(self.signs)}
+
+    def __len__(self) -> int:
+        return len(self.signs)
+
+    def __contains__(self, sign: str) -> bool:
+        return sign in self._row
+
+    def search(self, embedding: np.ndarray, k: int = TOP_N) -> list[tuple[str, float]]:
+        """Unit embedding [dim] -> the k most similar signs with cosine scores."""
+        scores = self._matrix @ embedding.astype(self.compute_dtype, copy=False)
+        top = np.argsort(scores)[::-1][:k]
+        return [(self.signs[i], float(scores[i])) for i in top]
+
+    def add(self, sign: str, embeddings: np.ndarray, save: bool = True, mapping_version: str | None = None):
+        """
+        Add unit embeddings [n, dim] to `sign`, creating it if new. The prototype
+        is the running mean of all embeddings seen, re-normalized. mapping_version
+        is the landmark mapping the embeddings were preprocessed with.
+        """
+        if mapping_version is None and self.strict_mapping:
+            raise MappingVersionError(f"Embeddings for '{sign}' have no landmark mapping version")
+        if mapping_version is not None and mapping_version != self.mapping_version:
+            raise MappingVersionError(
+                f"Index {self.index_dir} was built with landmark mapping {self.mapping_version}, "
+                f"but the embeddings for '{sign}' use {mapping_version}")
+        embeddings = np.atleast_2d(embeddings).astype(np.float32)
+        matrix = np.asarray(self.prototypes, dtype=np.float32)
+        total = embeddings.sum(0)
+        if sign in self._row:
+            i = self._row[sign]
+            total += matrix[i] * self.norms[i] * self.counts[i]
+            count = self.counts[i] + len(embeddings)
+        else:
+            matrix = np.vstack([matrix, np.zeros((1, self.dim), dtype=np.float32)])
+            self.signs.append(sign)
+            self.counts.append(0)
+            self.norms.append(0.0)
+            i, count = len(self.signs) - 1, len(embeddings)
+        mean = total / count
+        norm = float(np.linalg.norm(mean))
+        matrix[i] = mean / max(norm, 1e-12)
+        self.counts[i], self.norms[i] = count, norm
+        self.prototypes = matrix.astype(np.float16)
+        self._matrix = self.prototypes.astype(self.compute_dtype)
+        self._row[sign] = i
+        if save:
+            self.save()
+
+    def save(self):
+        _atomic_write(self.index_dir / MATRIX_NAME, np.ascontiguousarray(self.prototypes, dtype=np.float16).tobytes())
+        self.meta.update(signs=self.signs, counts=self.counts, norms=self.norms)
+        _atomic_write(self.index_dir / META_NAME, json.dumps(self.meta, indent=2).encode())
+        self._load_matrix()
+
+
+def _embed_windows(embedder: SignEmbedder, windows: list[np.ndarray]) -> np.ndarray:
+    return np.stack([embedder.embed_window(w) for w in windows])
+
+
+def _group_by_sign(embeddings: np.ndarray, signs: np.ndarray, per_sign: int | None = None) -> dict:
+    groups = {}
+    for sign in dict.fromkeys(signs):
+        rows = embeddings[signs == sign]
+        groups[sign] = rows[:per_sign] if per_sign else rows
+    return groups
+
+
+def _build(args):
+    from asl_inference import load_kaggle_windows
+
+    embedder = SignEmbedder(args.model)
+    print("Loading windows...")
+    windows, _, signs = load_kaggle_windows(args.files or None, args.seed)
+    t0 = time.perf_counter()
+    embeddings = _embed_windows(embedder, windows)
+    print(f"Embedded {len(windows)} windows in {time.perf_counter() - t0:.1f}s")
+
+    version = embedder.mapping["version"]
+    index = SignIndex.create(args.out, embeddings.shape[1], version, embedder=embedder)
+    for sign, rows in _group_by_sign(embeddings, signs, args.per_sign).items():
+        index.add(sign, rows, save=False, mapping_version=version)
+    index.save()
+    size_kb = (args.out / MATRIX_NAME).stat().st_size / 1024
+    print(f"Saved: {args.out} ({len(index)} signs × {index.dim} dims, {size_kb:.0f} KB)")
+
+
+def _add(args):
+    from collect_landmarks import load_parquet_holistic
+
+    embedder = SignEmbedder(args.model)
+    index = SignIndex(args.out, embedder=embedder)
+    t0 = time.perf_counter()
+    embeddings = []
+    for path in args.recordings:
+        holistic = load_parquet_holistic(path) if path.suffix == ".parquet" else np.load(path)
+        embeddings.append(embedder.embed_holistic(holistic))
+    existed = args.word in index
+    index.add(args.word, np.stack(embeddings), mapping_version=embedder.mapping["version"])
+    print(f"{'Updated' if existed else 'Added'} '{args.word}' from {len(embeddings)} recording(s) "
+          f"in {time.perf_counter() - t0:.2f}s — {len(index)} signs")
+
+
+def _eval(args):
+    """
+    Held-out accuracy of prototypes built from the rest of the sample, next to
+    the logits head on the same windows, plus query latency.
+    """
+    import tempfile
+
+    from asl_inference import load_kaggle_windows, softmax
+
+    embedder = SignEmbedder(args.model)
+    windows, labels, signs = load_kaggle_windows(args.files or None, args.seed)
+    embeddings = _embed_windows(embedder, windows)
+    order = np.random.default_rng(args.seed).permutation(len(windows))
+    n_eval = max(1, int(len(windows) * args.eval_frac))
+    eval_idx, fit_idx = order[:n_eval], order[n_eval:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        version = embedder.mapping["version"]
+        index = SignIndex.create(Path(tmp), embeddings.shape[1], version, embedder=embedder)
+        for sign, rows in _group_by_sign(embeddings[fit_idx], signs[fit_idx], args.per_sign).items():
+            index.add(sign, rows, save=False, mapping_version=version)
+        index.save()
+
+        hits1 = hits5 = 0
+        for i in eval_idx:
+            found = [s for s, _ in index.search(embeddings[i])]
+            hits1 += found[0] == signs[i]
+            hits5 += signs[i] in found
+        query = embeddings[eval_idx[0]]
+        index.search(query)
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            index.search(query)
+        search_us = (time.perf_counter() - t0) / 1000 * 1e6
+
+    print(f"Prototype index ({len(index)} signs from {len(fit_idx)} windows) on {n_eval} held-out: "
+          f"top-1 {hits1 / n_eval:.3f}, top-5 {hits5 / n_eval:.3f}; search {search_us:.1f} µs/query")
+
+    logits_model = MODEL_DIR / "asl_deberta.onnx"
+    if logits_model.exists():
+        sess = create_session(logits_model)
+        name = sess.get_inputs()[0].name
+        preds = np.array([softmax(sess.run(None, {name: windows[i]})[0][0]).argmax() for i in eval_idx])
+        print(f"Logits head on the same windows: top-1 {(preds == labels[eval_idx]).mean():.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", type=Path, default=EMBED_MODEL, help="embedding ONNX model")
+    parser.add_argument("--out", type=Path, default=INDEX_DIR, help="index directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="prototypes for every sign in the Kaggle data")
+    p.add_argument("--files", type=int, default=4000, help="parquet files to sample (0 = all)")
+    p.add_argument("--per-sign", type=int, default=50, help="max recordings per prototype")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=_build)
+
+    p = sub.add_parser("add", help="add or update one sign from recordings")
+    p.add_argument("word")
+    p.add_argument("recordings", nargs="+", type=Path, help="Kaggle-style .parquet or [T, 543, 3] .npy")
+    p.set_defaults(func=_add)
+
+    p = sub.add_parser("eval", help="held-out prototype accuracy and query latency")
+    p.add_argument("--files", type=int, default=2000)
+    p.add_argument("--per-sign", type=int, default=50)
+    p.add_argument("--eval-frac", type=float, default=0.2)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=_eval)
+
+    args = parser.parse_args(argv)
+    if not args.model.exists():
+        print(f"Embedding model not found at {args.model}")
+        print("Run export_deberta_onnx.py <weights.pt> --embedding first.")
+        raise SystemExit(1)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Parallel hyperparameter sweep for the BiLSTM classifier (train_model.py).
+
+The dataset is materialized once as read-only .npy memmaps that every trial
+maps (one copy in the page cache, no per-trial reload). Trials run in a spawned
+process pool, each worker pinned to its own cores with a matching torch /
+ONNX Runtime thread count. A trial that early-stops returns and frees its slot
+for the next config. Every finished trial is exported to ONNX and timed, and
+leaderboard.json (accuracy vs. batch-1 ONNX latency, Pareto front marked) is
+rewritten as results arrive. A trial that raises is listed under "failed" (config
+and error) and the sweep goes on; trials lost to a crashed worker are rerun once
+in a fresh pool. The exit status is 1 if any trial failed.
+
+Usage:
+    python sweep.py [--hidden 64,128,256] [--layers 1,2] [--dropout 0.2,0.3]
+                    [--lr 1e-3,3e-4] [--batch-size 64] [--trials N]
+                    [--workers W] [--threads 1] [--max-epochs 60] [--patience 8]
+                    [--split participant|random] [--no-augment]
+    python cli.py sweep ...
+
+Output: models/sweep/<timestamp>/{leaderboard.json, trial_<n>.onnx, data/*.npy}
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+SWEEP_DIR = PROJECT_DIR / "models" / "sweep"
+
+LATENCY_RUNS = 200
+
+
+def materialize(dataset, prefix: Path):
+    """Write a (x, y) dataset to <prefix>_X.npy / <prefix>_y.npy once, for memmapping."""
+    from train_model import NUM_FEATURES, SEQ_LEN
+
+    X = np.lib.format.open_memmap(f"{prefix}_X.npy", mode="w+", dtype=np.float32,
+                                  shape=(len(dataset), SEQ_LEN, NUM_FEATURES))
+    y = np.lib.format.open_memmap(f"{prefix}_y.npy", mode="w+", dtype=np.int64, shape=(len(dataset),))
+    for i in range(len(dataset)):
+        X[i], y[i] = dataset[i]
+    X.flush()
+    y.flush()
+    del X, y
+
+
+class MemmapBatches:
+    """Iterable of (x, y) tensor batches read from shared read-only memmaps."""
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, batch_size: int, shuffle: bool = False,
+                 augment=None, seed: int = 0):
+        self.X, self.y = X, y
+        self.batch_size, self.shuffle, self.augment = batch_size, shuffle, augment
+        self.rng = np.random.default_rng(seed)
+
+    def __iter__(self):
+        import torch
+
+        order = self.rng.permutation(len(self.y)) if self.shuffle else np.arange(len(self.y))
+        for start in range(0, len(order), self.batch_size):
+            idx = np.sort(order[start:start + self.batch_size])    # sequential page access
+            x = torch.from_numpy(self.X[idx])
+            if self.augment is not None:
+                x = self.augment(x)
+            yield x, torch.from_numpy(self.y[idx])
+
+
+def _init_worker(slots, threads: int):
+    """Pin this worker to its own `threads` cores before torch is imported."""
+    slot = slots.get()
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        mine = {cpus[(slot * threads + i) % len(cpus)] for i in range(threads)}
+        os.sched_setaffinity(0, mine)
+
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def onnx_latency_ms(onnx_path: Path, sample: np.ndarray, threads: int) -> float:
+    """Median batch-1 latency of an exported trial on the worker's pinned cores."""
+    import onnxruntime as ort
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    opts.inter_op_num_threads = 1
+    sess = ort.InferenceSession(str(onnx_path), opts, providers=["CPUExecutionProvider"])
+    feed = {sess.get_inputs()[0].name: np.ascontiguousarray(sample[:1], dtype=np.float32)}
+    for _ in range(10):
+        sess.run(None, feed)
+    times = []
+    for _ in range(LATENCY_RUNS):
+        t0 = time.perf_counter()
+        sess.run(None, feed)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1000)
+
+
+def run_trial(trial: int, config: dict, data_dir: Path, out_dir: Path, threads: int,
+              max_epochs: int, patience: int, augment: bool, num_classes: int) -> dict:
+    import torch
+
+    from landmark_augment import BatchAugment
+    from train_model import ASLClassifier, NUM_FEATURES, export_onnx, fit
+
+    torch.manual_seed(trial)
+    X_train = np.load(data_dir / "train_X.npy", mmap_mode="r")
+    y_train = np.load(data_dir / "train_y.npy", mmap_mode="r")
+    X_test = np.load(data_dir / "test_X.npy", mmap_mode="r")
+    y_test = np.load(data_dir / "test_y.npy", mmap_mode="r")
+    train_loader = MemmapBatches(X_train, y_train, config["batch_size"], shuffle=True,
+                                 augment=BatchAugment("hands") if augment else None, seed=trial)
+    test_loader = MemmapBatches(X_test, y_test, config["batch_size"])
+
+    model = ASLClassifier(NUM_FEATURES, num_classes, hidden_size=config["hidden_size"],
+                          num_layers=config["num_layers"], dropout=config["dropout"])
+    t0 = time.perf_counter()
+    result = fit(model, train_loader, test_loader, torch.device("cpu"), lr=config["lr"],
+                 max_epochs=max_epochs, max_patience=patience, log=None)
+    train_s = time.perf_counter() - t0
+
+    top5 = result["logits"].topk(min(5, num_classes), dim=1).indices
+    top5_acc = (top5 == result["labels"].unsqueeze(1)).any(1).float().mean().item()
+
+    record = {
+        "trial": trial, **config,
+        "val_acc": result["best_acc"], "top5_acc": top5_acc, "epochs": result["epochs"],
+        "train_s": round(train_s, 1), "params": sum(p.numel() for p in model.parameters()),
+        "onnx": None, "latency_ms": None,
+    }
+    onnx_path = out_dir / f"trial_{trial:03d}.onnx"
+    try:
+        export_onnx(model, onnx_path, torch.device("cpu"))
+        record["onnx"] = onnx_path.name
+        record["latency_ms"] = onnx_latency_ms(onnx_path, np.asarray(X_test[:1]), threads)
+    except Exception as e:
+        record["error"] = f"ONNX export/timing failed: {e}"
+    return record
+
+
+def pareto_front(records: list[dict]) -> set[int]:
+    """Trials no other trial beats on both accuracy and latency."""
+    timed = [r for r in records if r["latency_ms"] is not None]
+    return {
+        r["trial"] for r in timed
+        if not any(o["val_acc"] >= r["val_acc"] and o["latency_ms"] <= r["latency_ms"]
+                   and (o["val_acc"] > r["val_acc"] or o["latency_ms"] < r["latency_ms"])
+                   for o in timed)
+    }
+
+
+def write_leaderboard(path: Path, records: list[dict], meta: dict):
+    front = pareto_front(records)
+    ranked = sorted(records, key=lambda r: (-r["val_acc"], r["latency_ms"] or float("inf")))
+    board = [{**r, "pareto": r["trial"] in front} for r in ranked]
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({**meta, "trials": board}, f, indent=2)
+    os.replace(tmp, path)
+    return board
+
+
+def build_configs(args) -> list[dict]:
+    grid = [dict(zip(("hidden_size", "num_layers", "dropout", "lr", "batch_size"), values))
+            for values in itertools.product(args.hidden, args.layers, args.dropout, args.lr,
+                                            args.batch_size)]
+    if args.trials and args.trials < len(grid):
+        grid = random.Random(args.seed).sample(grid, args.trials)
+    return grid
+
+
+def _floats(text: str) -> list[float]:
+    return [float(v) for v in text.split(",")]
+
+
+def _ints(text: str) -> list[int]:
+    return [int(v) for v in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sweep", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hidden", type=_ints, default=[64, 128, 256])
+    parser.add_argument("--layers", type=_ints, default=[1, 2])
+    parser.add_argument("--dropout", type=_floats, default=[0.2, 0.3])
+    parser.add_argument("--lr", type=_floats, default=[1e-3, 3e-4])
+    parser.add_argument("--batch-size", type=_ints, default=[64])
+    parser.add_argument("--trials", type=int, default=0, help="random subset of the grid (0 = all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1, help="cores / threads per trial")
+    parser.add_argument("--workers", type=int, default=0, help="concurrent trials (0 = cores / threads)")
+    parser.add_argument("--max-epochs", type=int, default=60)
+    parser.add_argument("--patience", type=int, default=8)
+    parser.add_argument("--split", choices=["participant", "random"], default="participant")
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--out", type=Path, help="sweep directory (default models/sweep/<timestamp>)")
+    args = parser.parse_args(argv)
+
+    from train_model import load_datasets
+
+    configs = build_configs(args)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    workers = args.workers or max(1, cores // args.threads)
+    out_dir = args.out or SWEEP_DIR / time.strftime("%Y%m%d-%H%M%S")
+    data_dir = out_dir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    train_ds, test_ds, label_map_path = load_datasets(args.split)
+    with open(label_map_path) as f:
+        num_classes = len(json.load(f))
+    t0 = time.perf_counter()
+    materialize(train_ds, data_dir / "train")
+    materialize(test_ds, data_dir / "test")
+    print(f"Shared memmaps: {len(train_ds)} train / {len(test_ds)} test in {data_dir} "
+          f"({time.perf_counter() - t0:.1f}s)")
+    print(f"Sweeping {len(configs)} configs on {workers} workers × {args.threads} thread(s)\n")
+
+    meta = {"split": args.split, "augment": not args.no_augment, "workers": workers,
+            "threads": args.threads, "max_epochs": args.max_epochs, "patience": args.patience}
+    leaderboard = out_dir / "leaderboard.json"
+    records = []
+    failed = meta["failed"] = []       # config + error of trials that raised
+    ctx = get_context("spawn")
+    started = time.perf_counter()
+    todo, retried = list(range(len(configs))), set()
+    while todo:
+        # A crashed worker breaks the whole pool: its unfinished trials are rerun once
+        # in a fresh pool, and recorded as failed if that pool breaks too
+        broken = []
+        slots = ctx.Queue()
+        for slot in range(workers):
+            slots.put(slot)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(slots, args.threads)) as pool:
+            futures = {
+                pool.submit(run_trial, i, configs[i], data_dir, out_dir, args.threads, args.max_epochs,
+                            args.patience, not args.no_augment, num_classes): i
+                for i in todo
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    r = future.result()
+                except BrokenProcessPool:
+                    if i not in retried:
+                        broken.append(i)
+                        continue
+                    failed.append({"trial": i, **configs[i], "error": "worker crashed (BrokenProcessPool)"})
+                except Exception as e:
+                    # One bad trial (OOM, NaN assert...) mustn't cost the rest of the sweep
+                    failed.append({"trial": i, **configs[i], "error": f"{type(e).__name__}: {e}"})
+                else:
+                    records.append(r)
+                write_leaderboard(leaderboard, records, meta)
+                progress = f"[{len(records) + len(failed)}/{len(configs)}] trial {i:3d}"
+                if failed and failed[-1]["trial"] == i:
+                    print(f"  {progress}: failed: {failed[-1]['error']}")
+                    continue
+                latency = f"{r['latency_ms']:.2f} ms" if r["latency_ms"] is not None else "n/a"
+                print(f"  {progress}: acc {r['val_acc']:.4f} "
+                      f"top5 {r['top5_acc']:.4f} | {latency} | {r['epochs']} epochs, {r['train_s']}s "
+                      f"| h={r['hidden_size']} l={r['num_layers']} d={r['dropout']} lr={r['lr']}")
+        if broken:
+            print(f"  Worker pool crashed; rerunning {len(broken)} unfinished trial(s) in a new pool")
+        todo = sorted(broken)
+        retried.update(broken)
+
+    board = write_leaderboard(leaderboard, records, meta)
+    print(f"\nSweep finished in {time.perf_counter() - started:.0f}s\n")
+    print(f"  {'trial':>5} {'val_acc':>8} {'top5':>7} {'latency':>9} {'params':>9}  config")
+    for r in board:
+        latency = f"{r['latency_ms']:.2f}" if r["latency_ms"] is not None else "n/a"
+        print(f"  {r['trial']:>5} {r['val_acc']:>8.4f} {r['top5_acc']:>7.4f} {latency:>9} "
+              f"{r['params']:>9,}  h={r['hidden_size']} l={r['num_layers']} d={r['dropout']} "
+              f"lr={r['lr']} bs={r['batch_size']}{'  *' if r['pareto'] else ''}")
+    print(f"\n* = accuracy/latency Pareto front. Saved: {leaderboard}")
+    if failed:
+        print(f"\n{len(failed)} trial(s) failed (listed under \"failed\" in {leaderboard.name}):")
+        for f in sorted(failed, key=lambda f: f["trial"]):
+            print(f"  trial {f['trial']:3d}: {f['error']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,15 +3,25 @@ Train an LSTM-based ASL word classifier on hand landmark sequences.
 
 Uses PyTorch instead of TensorFlow for broader Python version support.
 
-Input:
+Input (participant shards from collect_landmarks.py, memory-mapped):
+  data/processed/shards/index.arrow + participant=<id>.arrow
+  data/processed/shards/label_map.json — index -> word mapping
+or, if no shards exist, the legacy arrays:
   data/processed/sequences.npy  — shape (N, 32, 126)
   data/processed/labels.npy     — shape (N,)
   data/processed/label_map.json — index -> word mapping
 
+Usage:
+  python train_model.py [--split participant|random] [--no-augment] [--streaming]
+
 Output:
   models/saved_model/asl_model.pth    — PyTorch state dict
   models/saved_model/asl_model.onnx   — ONNX export for browser conversion
   models/saved_model/label_map.json   — copy of label map
+
+--streaming trains a unidirectional LSTM instead and writes asl_model_stream.pth,
+asl_model_stream.onnx (windowed) and asl_model_stream_step.onnx (one frame per
+call with explicit hidden/cell state; see lstm_stream.py).
 """
 
 import json
@@ -24,6 +34,8 @@ import torch
 import torch.nn as nn
 from torch.utils.data import DataLoader, TensorDataset
 
+from landmark_augment import AugmentCollate, BatchAugment
+
 # Paths
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_DIR = SCRIPT_DIR.parent
@@ -33,24 +45,33 @@ MODEL_DIR = PROJECT_DIR / "models" / "saved_model"
 SEQ_LEN = 32
 NUM_FEATURES = 126  # 42 hand landmarks × 3 coords
 
+# Shard reads: cap per sign (as collect_landmarks used to) and loader workers
+MAX_SAMPLES_PER_SIGN = 500
+LOADER_WORKERS = 2
+
 
 class ASLClassifier(nn.Module):
-    """Bidirectional LSTM classifier for ASL hand landmark sequences."""
+    """
+    LSTM classifier for ASL hand landmark sequences. Bidirectional by default;
+    `bidirectional=False` gives the causal variant that can run one frame at a
+    time (StreamingStep).
+    """
 
     def __init__(self, input_size: int, num_classes: int,
-                 hidden_size: int = 128, num_layers: int = 2, dropout: float = 0.3):
+                 hidden_size: int = 128, num_layers: int = 2, dropout: float = 0.3,
+                 bidirectional: bool = True):
         super().__init__()
         self.lstm = nn.LSTM(
             input_size=input_size,
             hidden_size=hidden_size,
             num_layers=num_layers,
             batch_first=True,
-            bidirectional=True,
+            bidirectional=bidirectional,
             dropout=dropout if num_layers > 1 else 0.0,
         )
         self.classifier = nn.Sequential(
             nn.Dropout(dropout),
-            nn.Linear(hidden_size * 2, 128),  # *2 for bidirectional
+            nn.Linear(hidden_size * (2 if bidirectional else 1), 128),
             nn.ReLU(),
             nn.Dropout(dropout),
             nn.Linear(128, num_classes),
@@ -63,50 +84,35 @@ class ASLClassifier(nn.Module):
         return self.classifier(last_hidden) # (batch, num_classes)
 
 
-def train():
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
-
-    # Load processed data
-    X = np.load(DATA_DIR / "sequences.npy")   # (N, 32, 126)
-    y = np.load(DATA_DIR / "labels.npy")       # (N,)
-
-    with open(DATA_DIR / "label_map.json") as f:
-        label_map = json.load(f)
-    num_classes = len(label_map)
-
-    print(f"Dataset: {X.shape[0]} samples")
-    print(f"Sequence shape: {X.shape[1:]} (frames={SEQ_LEN}, features={NUM_FEATURES})")
-    print(f"Classes: {num_classes}")
-
-    # Split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.15, random_state=42, stratify=y
-    )
-    print(f"Train: {X_train.shape[0]}, Test: {X_test.shape[0]}")
+class StreamingStep(nn.Module):
+    """
+    One frame of a unidirectional ASLClassifier with the LSTM state as explicit
+    inputs/outputs: (frame [B, F], h [layers, B, H], c [layers, B, H]) ->
+    (logits [B, C], h_out, c_out). Feeding a window frame by frame from zero
+    state gives the windowed model's logits at the last frame.
+    """
 
-    # Create DataLoaders
-    train_ds = TensorDataset(
-        torch.tensor(X_train, dtype=torch.float32),
-        torch.tensor(y_train, dtype=torch.long),
-    )
-    test_ds = TensorDataset(
-        torch.tensor(X_test, dtype=torch.float32),
-        torch.tensor(y_test, dtype=torch.long),
-    )
-    train_loader = DataLoader(train_ds, batch_size=64, shuffle=True)
-    test_loader = DataLoader(test_ds, batch_size=64)
-
-    # Build model
-    model = ASLClassifier(
-        input_size=NUM_FEATURES,
-        num_classes=num_classes,
-    ).to(device)
-
-    print(f"\nModel parameters: {sum(p.numel() for p in model.parameters()):,}")
-    print(model)
-
-    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    def __init__(self, model: ASLClassifier):
+        super().__init__()
+        if model.lstm.bidirectional:
+            raise ValueError("StreamingStep needs a unidirectional ASLClassifier (bidirectional=False)")
+        self.lstm = model.lstm
+        self.classifier = model.classifier
+
+    def forward(self, frame: torch.Tensor, h: torch.Tensor, c: torch.Tensor):
+        out, (h_out, c_out) = self.lstm(frame.unsqueeze(1), (h, c))
+        return self.classifier(out[:, -1, :]), h_out, c_out
+
+
+def fit(model: nn.Module, train_loader, test_loader, device, lr: float = 1e-3,
+        max_epochs: int = 60, max_patience: int = 8, log=print) -> dict:
+    """
+    Adam + ReduceLROnPlateau with early stopping on validation accuracy.
+    Restores the best weights into `model` and returns best_acc, epochs run and
+    the last epoch's validation logits/labels. `log=None` silences per-epoch output.
+    """
+    log = log or (lambda *_: None)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
     scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
         optimizer, factor=0.5, patience=3, min_lr=1e-6
     )
@@ -114,10 +120,10 @@ def train():
 
     # Training loop
     best_acc = 0.0
+    best_state = {k: v.clone() for k, v in model.state_dict().items()}
     patience_counter = 0
-    max_patience = 8
 
-    for epoch in range(60):
+    for epoch in range(max_epochs):
         # Train
         model.train()
         train_loss = 0.0
@@ -164,12 +170,12 @@ def train():
         val_acc = val_correct / val_total
 
         scheduler.step(val_loss)
-        lr = optimizer.param_groups[0]["lr"]
+        current_lr = optimizer.param_groups[0]["lr"]
 
-        print(f"Epoch {epoch+1:2d} | "
-              f"Train Loss: {train_loss:.4f} Acc: {train_acc:.4f} | "
-              f"Val Loss: {val_loss:.4f} Acc: {val_acc:.4f} | "
-              f"LR: {lr:.6f}")
+        log(f"Epoch {epoch+1:2d} | "
+            f"Train Loss: {train_loss:.4f} Acc: {train_acc:.4f} | "
+            f"Val Loss: {val_loss:.4f} Acc: {val_acc:.4f} | "
+            f"LR: {current_lr:.6f}")
 
         # Early stopping with best model tracking
         if val_acc > best_acc:
@@ -179,16 +185,148 @@ def train():
         else:
             patience_counter += 1
             if patience_counter >= max_patience:
-                print(f"\nEarly stopping at epoch {epoch+1}")
+                log(f"\nEarly stopping at epoch {epoch+1}")
                 break
 
     # Restore best model
     model.load_state_dict(best_state)
-    print(f"\nBest validation accuracy: {best_acc:.4f}")
+    return {
+        "best_acc": best_acc,
+        "epochs": epoch + 1,
+        "logits": torch.cat(all_logits),
+        "labels": torch.cat(all_labels),
+    }
+
+
+def export_onnx(model: nn.Module, onnx_path: Path, device):
+    """Export the classifier with a dynamic batch axis (opset 17)."""
+    model.eval()
+    dummy_input = torch.randn(1, SEQ_LEN, NUM_FEATURES).to(device)
+    torch.onnx.export(
+        model,
+        dummy_input,
+        str(onnx_path),
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={
+            "input": {0: "batch_size"},
+            "output": {0: "batch_size"},
+        },
+        opset_version=17,
+    )
+
+
+def export_streaming_onnx(model: ASLClassifier, onnx_path: Path, device):
+    """Export StreamingStep: inputs frame/h/c, outputs output/h_out/c_out (opset 17)."""
+    model.eval()
+    step = StreamingStep(model)
+    layers, hidden = model.lstm.num_layers, model.lstm.hidden_size
+    dummy = (torch.randn(1, NUM_FEATURES).to(device),
+             torch.zeros(layers, 1, hidden).to(device),
+             torch.zeros(layers, 1, hidden).to(device))
+    torch.onnx.export(
+        step,
+        dummy,
+        str(onnx_path),
+        input_names=["frame", "h", "c"],
+        output_names=["output", "h_out", "c_out"],
+        dynamic_axes={
+            "frame": {0: "batch_size"},
+            "h": {1: "batch_size"},
+            "c": {1: "batch_size"},
+            "output": {0: "batch_size"},
+            "h_out": {1: "batch_size"},
+            "c_out": {1: "batch_size"},
+        },
+        opset_version=17,
+    )
+
+
+def load_datasets(split: str = "participant"):
+    """
+    Returns (train_ds, test_ds, label_map_path). Prefers the memory-mapped
+    participant shards; `split="participant"` holds whole participants out of
+    training, `"random"` is the old stratified 85/15 split. Falls back to the
+    monolithic npy arrays (random split only) when no shards exist.
+    """
+    from landmark_dataset import INDEX_NAME, SHARD_DIR, ShardedLandmarks
+
+    if (SHARD_DIR / INDEX_NAME).exists():
+        dataset = ShardedLandmarks(SHARD_DIR, SEQ_LEN, max_per_sign=MAX_SAMPLES_PER_SIGN)
+        print(f"Dataset: {len(dataset)} sequences from {len(dataset.participants)} participants (shards)")
+        if split == "participant":
+            train_ds, test_ds = dataset.split_by_participant(holdout_frac=0.15, seed=42)
+            print(f"Held-out participants: {test_ds.participants.tolist()}")
+        else:
+            train_idx, test_idx = train_test_split(
+                np.arange(len(dataset)), test_size=0.15, random_state=42, stratify=dataset.labels
+            )
+            train_ds, test_ds = dataset.subset(train_idx), dataset.subset(test_idx)
+        return train_ds, test_ds, SHARD_DIR / "label_map.json"
+
+    if split == "participant":
+        print("No participant shards found — using sequences.npy with a random split")
+    X = np.load(DATA_DIR / "sequences.npy")   # (N, 32, 126)
+    y = np.load(DATA_DIR / "labels.npy")       # (N,)
+    print(f"Dataset: {X.shape[0]} samples (sequences.npy)")
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.15, random_state=42, stratify=y
+    )
+    train_ds = TensorDataset(
+        torch.tensor(X_train, dtype=torch.float32),
+        torch.tensor(y_train, dtype=torch.long),
+    )
+    test_ds = TensorDataset(
+        torch.tensor(X_test, dtype=torch.float32),
+        torch.tensor(y_test, dtype=torch.long),
+    )
+    return train_ds, test_ds, DATA_DIR / "label_map.json"
+
+
+def train(split: str = "participant", augment: bool = True, hidden_size: int = 128,
+          num_layers: int = 2, dropout: float = 0.3, lr: float = 1e-3, batch_size: int = 64,
+          streaming: bool = False):
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Using device: {device}")
+
+    # Load processed data
+    train_ds, test_ds, label_map_path = load_datasets(split)
+
+    with open(label_map_path) as f:
+        label_map = json.load(f)
+    num_classes = len(label_map)
+
+    print(f"Sequence shape: ({SEQ_LEN}, {NUM_FEATURES})")
+    print(f"Classes: {num_classes}")
+    print(f"Train: {len(train_ds)}, Test: {len(test_ds)}")
+
+    # Create DataLoaders (shard reads are memory-mapped per worker; augmentation
+    # runs on whole batches in the workers' collate_fn)
+    workers = 0 if isinstance(train_ds, TensorDataset) else LOADER_WORKERS
+    collate_fn = AugmentCollate(BatchAugment("hands")) if augment else None
+    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, collate_fn=collate_fn,
+                              num_workers=workers, persistent_workers=workers > 0)
+    test_loader = DataLoader(test_ds, batch_size=batch_size,
+                             num_workers=workers, persistent_workers=workers > 0)
+
+    # Build model
+    model = ASLClassifier(
+        input_size=NUM_FEATURES,
+        num_classes=num_classes,
+        hidden_size=hidden_size,
+        num_layers=num_layers,
+        dropout=dropout,
+        bidirectional=not streaming,
+    ).to(device)
+
+    print(f"\nModel parameters: {sum(p.numel() for p in model.parameters()):,}")
+    print(model)
+
+    result = fit(model, train_loader, test_loader, device, lr=lr)
+    print(f"\nBest validation accuracy: {result['best_acc']:.4f}")
 
     # Top-5 accuracy
-    all_logits = torch.cat(all_logits)
-    all_labels = torch.cat(all_labels)
+    all_logits, all_labels = result["logits"], result["labels"]
     top5_preds = all_logits.topk(min(5, num_classes), dim=1).indices
     top5_correct = sum(
         label in preds for label, preds in zip(all_labels, top5_preds)
@@ -199,36 +337,58 @@ def train():
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
     # Save PyTorch model
+    stem = "asl_model_stream" if streaming else "asl_model"
     torch.save({
         "model_state_dict": model.state_dict(),
         "num_classes": num_classes,
         "seq_len": SEQ_LEN,
         "num_features": NUM_FEATURES,
-    }, MODEL_DIR / "asl_model.pth")
-    print(f"PyTorch model saved to {MODEL_DIR / 'asl_model.pth'}")
+        "hparams": {"hidden_size": hidden_size, "num_layers": num_layers, "dropout": dropout,
+                    "bidirectional": not streaming},
+    }, MODEL_DIR / f"{stem}.pth")
+    print(f"PyTorch model saved to {MODEL_DIR / f'{stem}.pth'}")
 
     # Export to ONNX for browser conversion
-    model.eval()
-    dummy_input = torch.randn(1, SEQ_LEN, NUM_FEATURES).to(device)
-    onnx_path = MODEL_DIR / "asl_model.onnx"
-    torch.onnx.export(
-        model,
-        dummy_input,
-        str(onnx_path),
-        input_names=["input"],
-        output_names=["output"],
-        dynamic_axes={
-            "input": {0: "batch_size"},
-            "output": {0: "batch_size"},
-        },
-        opset_version=17,
-    )
+    onnx_path = MODEL_DIR / f"{stem}.onnx"
+    export_onnx(model, onnx_path, device)
     print(f"ONNX model saved to {onnx_path}")
 
+    # Verify the ONNX export against PyTorch on held-out samples
+    try:
+        import onnxruntime as ort
+        sess = ort.InferenceSession(str(onnx_path))
+        sample = torch.stack([torch.as_tensor(test_ds[i][0]) for i in range(min(256, len(test_ds)))])
+        with torch.no_grad():
+            ref = model(sample.to(device)).cpu().numpy()
+        got = sess.run(None, {"input": sample.numpy()})[0]
+        diff = np.abs(ref - got).max()
+        agree = (ref.argmax(1) == got.argmax(1)).mean()
+        print(f"ONNX verification on {len(sample)} test samples: max abs diff = {diff:.2e}, "
+              f"top-1 agreement = {agree:.3f} {'✓' if diff < 1e-4 and agree == 1.0 else '✗'}")
+    except ImportError:
+        print("(Install onnxruntime for verification)")
+
+    if streaming:
+        from lstm_stream import check_step_parity
+
+        step_path = MODEL_DIR / f"{stem}_step.onnx"
+        export_streaming_onnx(model, step_path, device)
+        print(f"Streaming step model saved to {step_path}")
+        windows = torch.stack([torch.as_tensor(test_ds[i][0]) for i in range(min(64, len(test_ds)))])
+        check_step_parity(model.cpu(), step_path, windows)
+
     # Copy label map alongside model
-    shutil.copy(DATA_DIR / "label_map.json", MODEL_DIR / "label_map.json")
+    shutil.copy(label_map_path, MODEL_DIR / "label_map.json")
     print("Label map copied to model directory")
 
 
 if __name__ == "__main__":
-    train()
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--split", choices=["participant", "random"], default="participant")
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--streaming", action="store_true",
+                        help="unidirectional LSTM + single-step stateful ONNX export")
+    args = parser.parse_args()
+    train(split=args.split, augment=not args.no_augment, streaming=args.streaming)
@@ -0,0 +1,218 @@
+"""
+Window-level logits cache for the Python inference path.
+
+Consecutive stride windows from a near-still signer are almost identical, so
+ASLRecognizer(cache=WindowCache()) looks up each window before running the
+model. Each window is reduced to a small hand summary (x, y, z of the 42 hand
+columns averaged over TIME_BINS stretches of frames) and looked up in two steps:
+
+    bucket   hash of the per-bin hand presence and each hand's centroid
+             quantized to BUCKET_SCALE x tolerance — cheap, and coarse enough
+             that landmark jitter rarely moves a window to another bucket
+    match    a cached summary in that bucket with the same presence whose
+             coordinates all lie within `tolerance` (image units)
+
+Hashing the full quantized window instead would miss almost always: with
+thousands of coordinates, some jittering value always crosses a rounding edge.
+
+Entries are partitioned per room: each room keeps its own LRU of at most
+`per_room` windows (a signer only ever revisits their own recent windows), and
+when the total exceeds `max_entries` the least recently active room gives up its
+oldest entries first, so one busy room can't flush everyone else.
+
+    cache = WindowCache(tolerance=0.01)
+    recognizer = ASLRecognizer(cache=cache)
+    recognizer.classify_window(frames, room="abc")
+    print(cache.stats())   # hits, misses, hit_rate, inference_ms_saved, ...
+
+Benchmark: python cli.py bench cache [--tolerances 0.002,0.005,0.01,0.02]
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+N_HAND_COLUMNS = 42       # assembled columns 0-41 are the two hands
+TIME_BINS = 5
+BUCKET_SCALE = 4
+MAX_ENTRIES = 4096        # ~2.5 KB each (logits + float16 summary)
+PER_ROOM = 64
+TOLERANCE = 0.01
+
+
+class WindowCache:
+    """Per-room LRU of logits, bucketed by a quantized hand fingerprint."""
+
+    def __init__(self, tolerance: float = TOLERANCE, max_entries: int = MAX_ENTRIES,
+                 per_room: int = PER_ROOM):
+        if per_room < 1:
+            raise ValueError(f"per_room must be at least 1, got {per_room}")
+        self.tolerance = tolerance
+        self.max_entries = max_entries
+        self.per_room = per_room
+        # room -> OrderedDict(bucket -> [(summary, logits, infer_ms), ...]), LRU order at both levels
+        self.rooms: OrderedDict = OrderedDict()
+        self.counts: dict = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_ms = 0.0
+        self.fingerprint_ms = 0.0
+
+    def key(self, frames: np.ndarray) -> tuple[bytes, np.ndarray]:
+        """frames: assembled [L, 5, 100] window -> (bucket hash, hand summary [TIME_BINS, 3, 42])."""
+        start = time.perf_counter()
+        hands = frames[:, 1:4, :N_HAND_COLUMNS]
+        valid = ~np.isnan(hands)
+        edges = np.linspace(0, len(frames), min(TIME_BINS, len(frames)) + 1).astype(int)[:-1]
+        total = np.add.reduceat(np.where(valid, hands, 0.0), edges, axis=0)
+        count = np.add.reduceat(valid, edges, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            summary = (total / count).astype(np.float16)                 # NaN where never seen
+            per_hand = count.reshape(len(edges), 3, 2, 21).sum(axis=(0, 3))
+            centroid = total.reshape(len(edges), 3, 2, 21).sum(axis=(0, 3)) / per_hand
+        present = ~np.isnan(summary[:, 0, ::21])    # [bins, hand]: wrist seen (hands are all-or-nothing)
+        grid = np.round(np.nan_to_num(centroid, nan=-1.0) / (BUCKET_SCALE * self.tolerance)).astype(np.int32)
+        digest = hashlib.blake2b(present.tobytes(), digest_size=16)
+        digest.update(grid.tobytes())
+        self.fingerprint_ms += (time.perf_counter() - start) * 1000
+        return digest.digest(), summary
+
+    def _match(self, entries: list, summary: np.ndarray) -> int | None:
+        nan = np.isnan(summary)
+        for i, (cached, _, _) in enumerate(entries):
+            cached_nan = np.isnan(cached)
+            if np.array_equal(nan, cached_nan) and \
+                    np.abs(np.where(nan, 0, summary - cached)).max() <= self.tolerance:
+                return i
+        return None
+
+    def get(self, room, key: tuple[bytes, np.ndarray]) -> np.ndarray | None:
+        bucket, summary = key
+        buckets = self.rooms.get(room)
+        entries = buckets.get(bucket) if buckets is not None else None
+        i = self._match(entries, summary) if entries else None
+        if i is None:
+            self.misses += 1
+            return None
+        buckets.move_to_end(bucket)
+        self.rooms.move_to_end(room)
+        entries.insert(0, entries.pop(i))
+        self.hits += 1
+        self.saved_ms += entries[0][2]
+        return entries[0][1]
+
+    def put(self, room, key: tuple[bytes, np.ndarray], logits: np.ndarray, infer_ms: float):
+        bucket, summary = key
+        buckets = self.rooms.setdefault(room, OrderedDict())
+        self.rooms.move_to_end(room)
+        buckets.setdefault(bucket, []).insert(0, (summary, logits, infer_ms))
+        buckets.move_to_end(bucket)
+        self.counts[room] = self.counts.get(room, 0) + 1
+        self.size += 1
+        while self.counts[room] > self.per_room:
+            self._evict(room)
+        while self.size > self.max_entries:
+            self._evict(next(iter(self.rooms)))
+
+    def _evict(self, room):
+        """Drop the oldest entry of the room's least recently used bucket."""
+        buckets = self.rooms[room]
+        bucket = next(iter(buckets))
+        buckets[bucket].pop()
+        if not buckets[bucket]:
+            del buckets[bucket]
+        self.counts[room] -= 1
+        self.size -= 1
+        self.evictions += 1
+        if not buckets:
+            del self.rooms[room], self.counts[room]
+
+    def drop_room(self, room):
+        """Forget a room's entries (e.g. when the participant leaves)."""
+        if self.rooms.pop(room, None) is not None:
+            self.size -= self.counts.pop(room)
+
+    def nbytes(self) -> int:
+        return sum(summary.nbytes + logits.nbytes + 16 for buckets in self.rooms.values()
+                   for entries in buckets.values() for summary, logits, _ in entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.size,
+            "rooms": len(self.rooms),
+            "evictions": self.evictions,
+            "bytes": self.nbytes(),
+            "inference_ms_saved": self.saved_ms,
+            "fingerprint_ms": self.fingerprint_ms,
+            "net_ms_saved": self.saved_ms - self.fingerprint_ms,
+        }
+
+
+def held_stream(n_clips: int, seed: int = 0, hold: tuple = (30, 90), jitter: float = 0.001):
+    """
+    Kaggle clips separated by 1-3 s holds: the signer keeps the clip's last hand
+    pose (landmark jitter of `jitter`) instead of dropping the hands.
+    """
+    from segmenter import HAND_ROWS, synthetic_stream
+
+    rng = np.random.default_rng(seed)
+    stream, truth = synthetic_stream(n_clips, seed, gap=hold)
+    starts = [s for s, _, _ in truth[1:]] + [len(stream)]
+    for (_, end, _), nxt in zip(truth, starts):
+        pose = stream[end - 1, HAND_ROWS]
+        stream[end:nxt, HAND_ROWS] = pose + rng.normal(0, jitter, (nxt - end, *pose.shape)).astype(np.float32)
+    return stream
+
+
+def bench_main(argv=None):
+    """
+    `cli.py bench cache`: hit rate, CPU saved and top-1 agreement with uncached
+    inference per tolerance, over several rooms of held-pose Kaggle streams.
+    """
+    import argparse
+
+    from asl_inference import ASLRecognizer, MODEL_PATH
+    from landmark_config import SEQ_LEN
+
+    parser = argparse.ArgumentParser(prog="bench cache")
+    parser.add_argument("--rooms", type=int, default=4)
+    parser.add_argument("--clips", type=int, default=30, help="Kaggle clips per room")
+    parser.add_argument("--stride", type=int, default=4)
+    parser.add_argument("--tolerances", default="0.002,0.005,0.01,0.02")
+    args = parser.parse_args(argv)
+
+    plain = ASLRecognizer(MODEL_PATH)
+    rooms = [plain.assembler(held_stream(args.clips, seed=r)) for r in range(args.rooms)]
+    # Interleave rooms window by window, as a shared server would see them
+    schedule = [(r, end) for end in range(SEQ_LEN, max(map(len, rooms)) + 1, args.stride)
+                for r in range(args.rooms) if end <= len(rooms[r])]
+
+    t0 = time.perf_counter()
+    reference = {(r, end): plain.classify_window(rooms[r][end - SEQ_LEN:end])["word"] for r, end in schedule}
+    base_s = time.perf_counter() - t0
+    print(f"{args.rooms} rooms, {len(schedule)} windows; uncached: {base_s * 1000 / len(schedule):.2f} ms/window")
+    print(f"{'tolerance':>10} {'hit rate':>9} {'ms/window':>10} {'CPU saved':>10} {'top-1 agree':>12} {'KB':>7}")
+
+    results = []
+    for tol in (float(t) for t in args.tolerances.split(",")):
+        cache = WindowCache(tolerance=tol)
+        recognizer = ASLRecognizer(MODEL_PATH, cache=cache)
+        t0 = time.perf_counter()
+        words = {(r, end): recognizer.classify_window(rooms[r][end - SEQ_LEN:end], room=r)["word"]
+                 for r, end in schedule}
+        cached_s = time.perf_counter() - t0
+        s = cache.stats()
+        agree = np.mean([words[k] == reference[k] for k in schedule])
+        saved = 1 - cached_s / base_s
+        print(f"{tol:>10g} {s['hit_rate']:>8.1%} {cached_s * 1000 / len(schedule):>10.2f} {saved:>9.1%} "
+              f"{agree:>12.3f} {s['bytes'] / 1024:>7.0f}")
+        results.append({"tolerance": tol, **s, "cpu_saved": saved, "top1_agreement": float(agree)})
+    return results
@@ -0,0 +1,34 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from collect_landmarks import iter_hand_sequences, load_parquet_hand_landmarks
+
+
+def _write_sample(path, frames):
+    rows = [(f, kind, i, 0.1 * f, 0.2, 0.0) for f in range(frames)
+            for kind in ("left_hand", "face") for i in range(21)]
+    columns = list(zip(*rows))
+    pq.write_table(pa.table({"frame": pa.array(columns[0], pa.int16()), "type": columns[1],
+                             "landmark_index": pa.array(columns[2], pa.int16()),
+                             "x": columns[3], "y": columns[4], "z": columns[5]}), path)
+
+
+def test_corrupt_file_mid_list_costs_one_sample(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"{i}.parquet"
+        if i == 2:
+            path.write_bytes(b"not a parquet file")
+        else:
+            _write_sample(path, frames=3 + i)
+        paths.append(path)
+
+    results = list(iter_hand_sequences(paths, batch_size=16))
+    assert [p for p, _ in results] == paths
+    for i, (path, sequence) in enumerate(results):
+        if i == 2:
+            assert sequence is None
+        else:
+            assert sequence.shape == (3 + i, 126)
+            np.testing.assert_array_equal(sequence, load_parquet_hand_landmarks(path))
@@ -0,0 +1,29 @@
+import numpy as np
+
+from ipc_worker import FRAME_SHAPE, FrameRing
+
+
+class _SpyFrame:
+    """A frame that records the ring's sequence numbers while it is being copied in."""
+
+    def __init__(self, ring, slot):
+        self.ring, self.slot, self.seen = ring, slot, []
+
+    def __array__(self, dtype=None, copy=None):
+        self.seen.append((int(self.ring.seq[self.slot]), int(self.ring.seq[self.slot + self.ring.slots])))
+        return np.ones(FRAME_SHAPE, dtype=dtype or np.float32)
+
+
+def test_write_invalidates_slot_while_frame_is_torn(tmp_path):
+    ring = FrameRing(tmp_path / "t.ring", slots=4, create=True)
+    for n in range(4):
+        ring.write(n, np.zeros(FRAME_SHAPE, np.float32))
+    assert ring.intact(4, 4)
+
+    spy = _SpyFrame(ring, slot=0)
+    ring.write(4, spy)          # laps frame 0
+    assert spy.seen and all(seen == (0, 0) for seen in spy.seen)
+    assert ring.seq[0] == ring.seq[4] == 5
+    assert ring.intact(5, 4) and not ring.intact(4, 4)
+    np.testing.assert_array_equal(ring.window(5, 4)[-1], 1)
+    ring.close()
@@ -0,0 +1,24 @@
+import model_registry
+from model_registry import ModelRegistry, ModelSpec
+
+
+def _specs(tmp_path, names, mb):
+    specs = {}
+    for name in names:
+        model = tmp_path / f"{name}.onnx"
+        model.write_bytes(b"\0" * int(mb * 2**20))
+        specs[name] = ModelSpec(name, model, tmp_path / "labels.json")
+    return specs
+
+
+def test_eviction_trims_heap_outside_the_registry_lock(tmp_path, monkeypatch):
+    registry = ModelRegistry(_specs(tmp_path, ["ASL", "BSL", "CSL"], 1), budget_mb=2.5)
+    monkeypatch.setattr(model_registry, "load_model", lambda spec, *args: object())
+    trims = []
+    monkeypatch.setattr(model_registry, "_release_memory", lambda: trims.append(registry._lock.locked()))
+
+    for name in ("ASL", "BSL", "CSL", "ASL"):
+        registry.get(name)
+    assert registry.evictions == 2
+    assert trims == [False, False]
+    assert list(registry.stats()["loaded"]) == ["CSL", "ASL"]
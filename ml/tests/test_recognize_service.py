@@ -0,0 +1,58 @@
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from landmark_config import N_HOLISTIC
+from recognize_service import POSE_START, parse_request, snapshots_to_holistic
+
+ASSEMBLER = (Path(__file__).resolve().parents[2] / "client" / "src" / "features" / "asl"
+             / "_legacyML" / "services" / "landmarkAssembler.ts")
+
+
+def _assembler_hand_bases() -> dict[str, int]:
+    """MediaPipe handedness label -> holistic base row, as buildHolisticMap assigns them."""
+    source = ASSEMBLER.read_text()
+    left_label = re.search(r"const isLeft = label === '(\w+)'", source).group(1)
+    left_base, right_base = map(int, re.search(r"isLeft \? (\d+) : (\d+)", source).groups())
+    other = {"Right": "Left", "Left": "Right"}[left_label]
+    return {left_label: left_base, other: right_base}
+
+
+def _hand(x: float) -> list[dict]:
+    return [{"x": x, "y": i / 21, "z": 0.0} for i in range(21)]
+
+
+def test_handedness_matches_client_assembler():
+    bases = _assembler_hand_bases()
+    holistic = snapshots_to_holistic([{"hands": [_hand(0.25), _hand(0.75)], "handedness": ["Right", "Left"]}])
+
+    for label, x in (("Right", 0.25), ("Left", 0.75)):
+        rows = holistic[0, bases[label]:bases[label] + 21]
+        np.testing.assert_allclose(rows[:, 0], x)
+        np.testing.assert_allclose(rows[:, 1], np.arange(21) / 21, rtol=1e-6)
+
+
+def test_missing_landmarks_stay_nan():
+    pose = [{"x": 0.5, "y": 0.5} for _ in range(25)]
+    holistic = snapshots_to_holistic([{"hands": [_hand(0.5)], "handedness": ["Right"], "pose": pose}, {}])
+
+    assert holistic.shape == (2, N_HOLISTIC, 3)
+    assert np.isnan(holistic[1]).all()
+    np.testing.assert_allclose(holistic[0, POSE_START:POSE_START + 25, :2], 0.5)
+    assert (holistic[0, POSE_START:POSE_START + 25, 2] == 0).all()
+    assert np.isnan(holistic[0, _assembler_hand_bases()["Left"]]).all()
+
+
+def test_parse_request_rejects_malformed_bodies():
+    for body in ([], {"landmarks": "x"}, {"landmarks": ["x"]}, {"landmarks": [{"hands": [[1] * 21]}]},
+                 {"landmarks": [{"pose": {"x": 1}}]}, {"signLanguage": 3}):
+        with pytest.raises(ValueError):
+            parse_request(json.dumps(body).encode())
+    with pytest.raises(ValueError):
+        parse_request(b"{not json")
+
+    holistic, language, vocabulary = parse_request(json.dumps({"signLanguage": "BSL", "vocabulary": "med"}).encode())
+    assert holistic.shape[0] == 0 and (language, vocabulary) == ("BSL", "med")
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from landmark_mapping import METADATA_KEY, MappingVersionError
+from sign_index import SignIndex
+
+
+def _embedder(version):
+    meta = SimpleNamespace(custom_metadata_map={METADATA_KEY: version})
+    return SimpleNamespace(session=SimpleNamespace(get_modelmeta=lambda: meta))
+
+
+def test_add_rejects_other_mapping_version(tmp_path):
+    index = SignIndex.create(tmp_path, dim=4, mapping_version="v1")
+    index.add("hello", np.eye(4)[:2], mapping_version="v1")
+    with pytest.raises(MappingVersionError):
+        index.add("bye", np.eye(4)[2:], mapping_version="v2")
+    assert index.signs == ["hello"]
+
+    strict = SignIndex(tmp_path, strict_mapping=True)
+    with pytest.raises(MappingVersionError):
+        strict.add("bye", np.eye(4)[2:])
+
+
+def test_open_checks_embedder_mapping_version(tmp_path):
+    SignIndex.create(tmp_path, dim=4, mapping_version="v1")
+    SignIndex(tmp_path, embedder=_embedder("v1"))
+    with pytest.raises(MappingVersionError):
+        SignIndex(tmp_path, embedder=_embedder("v2"))
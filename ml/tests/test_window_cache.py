@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from window_cache import WindowCache
+
+
+def test_per_room_must_hold_an_entry():
+    with pytest.raises(ValueError):
+        WindowCache(per_room=0)
+
+
+def test_per_room_evicts_oldest():
+    cache = WindowCache(per_room=1)
+    rng = np.random.default_rng(0)
+    keys = [cache.key(rng.random((25, 5, 100), dtype=np.float32)) for _ in range(2)]
+    for i, key in enumerate(keys):
+        cache.put("room", key, np.full(3, i, np.float32), 1.0)
+    assert cache.size == 1 and cache.evictions == 1
+    assert cache.get("room", keys[0]) is None
+    assert cache.get("room", keys[1])[0] == 1
@@ -1,7 +1,9 @@
 import 'dotenv/config';
+import { signRouterConfig } from '../../lib/signRouter.js';
 
 export const config = {
   port: Number(process.env.PORT || 3001),
   corsOrigin: process.env.CORS_ORIGIN || 'http://localhost:5173',
   geminiApiKey: process.env.GEMINI_API_KEY || '',
+  ...signRouterConfig(),
 };
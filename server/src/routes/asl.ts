@@ -1,10 +1,10 @@
 import { Router } from 'express';
 import { GoogleGenerativeAI, HarmCategory, HarmBlockThreshold } from '@google/generative-ai';
 import { config } from '../config.js';
+import { createSignRouter, type Prediction, type RecognizeRequest, type SignLanguage } from '../../../lib/signRouter.js';
 
 export const aslRouter = Router();
-
-type SignLanguage = 'ASL' | 'BSL' | 'CSL' | 'ISL' | 'FSL' | 'JSL';
+const signRouter = createSignRouter(config);
 
 const SIGN_LANGUAGE_NAMES: Record<SignLanguage, string> = {
   ASL: 'American Sign Language (ASL)',
@@ -98,6 +98,70 @@ function getGenAI(): GoogleGenerativeAI {
   return genAI;
 }
 
+async function geminiRecognize({ frames, landmarks, signLanguage }: RecognizeRequest): Promise<Prediction> {
+  // Limit to 5 frames max to keep request fast
+  const selectedFrames = frames.slice(0, 5);
+
+  console.log(`[${signLanguage} Vision] Processing ${selectedFrames.length} frames (sizes: ${selectedFrames.map(f => f.length).join(', ')} chars)`);
+
+  const systemPrompt = buildSystemPrompt(signLanguage);
+  const fullName = SIGN_LANGUAGE_NAMES[signLanguage];
+
+  const ai = getGenAI();
+  const model = ai.getGenerativeModel({
+    model: 'gemini-2.0-flash',
+    safetySettings: [
+      { category: HarmCategory.HARM_CATEGORY_HARASSMENT, threshold: HarmBlockThreshold.BLOCK_NONE },
+      { category: HarmCategory.HARM_CATEGORY_HATE_SPEECH, threshold: HarmBlockThreshold.BLOCK_NONE },
+      { category: HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT, threshold: HarmBlockThreshold.BLOCK_NONE },
+      { category: HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT, threshold: HarmBlockThreshold.BLOCK_NONE },
+    ],
+  });
+
+  // Detect MIME type from base64 header bytes
+  const detectMime = (b64: string): string => {
+    if (b64.startsWith('/9j/')) return 'image/jpeg';
+    if (b64.startsWith('iVBOR')) return 'image/png';
+    return 'image/jpeg'; // default
+  };
+
+  const imageParts = selectedFrames.map((base64) => ({
+    inlineData: {
+      data: base64,
+      mimeType: detectMime(base64) as 'image/jpeg' | 'image/png',
+    },
+  }));
+
+  // Build landmark context string
+  let landmarkContext = '';
+  if (landmarks && Array.isArray(landmarks) && landmarks.length > 0) {
+    landmarkContext = '\n\nMediaPipe landmark data (JSON):\n' + JSON.stringify(landmarks, null, 0);
+  }
+
+  const result = await model.generateContent([
+    systemPrompt,
+    ...imageParts,
+    `What ${fullName} sign is being performed? ${landmarkContext ? 'Use both the images AND the landmark data below to identify the sign.' : 'Respond with JSON only.'}${landmarkContext}\n\nRespond with JSON only.`,
+  ]);
+
+  const text = result.response.text().trim();
+
+  // Parse JSON from response (handle markdown code blocks)
+  let parsed: { sign: string; confidence: number };
+  try {
+    const jsonStr = text.replace(/```json\s*/g, '').replace(/```\s*/g, '').trim();
+    parsed = JSON.parse(jsonStr);
+  } catch {
+    console.warn(`[${signLanguage} Vision] Failed to parse Gemini response:`, text);
+    parsed = { sign: '', confidence: 0 };
+  }
+
+  return {
+    sign: parsed.sign || '',
+    confidence: typeof parsed.confidence === 'number' ? parsed.confidence : 0,
+  };
+}
+
 aslRouter.post('/recognize', async (req, res) => {
   try {
     const { frames, landmarks, signLanguage: reqSignLanguage } = req.body as { frames: string[]; landmarks?: any[]; signLanguage?: string };
@@ -112,67 +176,10 @@ aslRouter.post('/recognize', async (req, res) => {
       ? (reqSignLanguage as SignLanguage)
       : 'ASL';
 
-    // Limit to 5 frames max to keep request fast
-    const selectedFrames = frames.slice(0, 5);
-
-    console.log(`[${signLanguage} Vision] Processing ${selectedFrames.length} frames (sizes: ${selectedFrames.map(f => f.length).join(', ')} chars)`);
-
-    const systemPrompt = buildSystemPrompt(signLanguage);
-    const fullName = SIGN_LANGUAGE_NAMES[signLanguage];
-
-    const ai = getGenAI();
-    const model = ai.getGenerativeModel({
-      model: 'gemini-2.0-flash',
-      safetySettings: [
-        { category: HarmCategory.HARM_CATEGORY_HARASSMENT, threshold: HarmBlockThreshold.BLOCK_NONE },
-        { category: HarmCategory.HARM_CATEGORY_HATE_SPEECH, threshold: HarmBlockThreshold.BLOCK_NONE },
-        { category: HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT, threshold: HarmBlockThreshold.BLOCK_NONE },
-        { category: HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT, threshold: HarmBlockThreshold.BLOCK_NONE },
-      ],
-    });
-
-    // Detect MIME type from base64 header bytes
-    const detectMime = (b64: string): string => {
-      if (b64.startsWith('/9j/')) return 'image/jpeg';
-      if (b64.startsWith('iVBOR')) return 'image/png';
-      return 'image/jpeg'; // default
-    };
-
-    const imageParts = selectedFrames.map((base64) => ({
-      inlineData: {
-        data: base64,
-        mimeType: detectMime(base64) as 'image/jpeg' | 'image/png',
-      },
-    }));
-
-    // Build landmark context string
-    let landmarkContext = '';
-    if (landmarks && Array.isArray(landmarks) && landmarks.length > 0) {
-      landmarkContext = '\n\nMediaPipe landmark data (JSON):\n' + JSON.stringify(landmarks, null, 0);
-    }
-
-    const result = await model.generateContent([
-      systemPrompt,
-      ...imageParts,
-      `What ${fullName} sign is being performed? ${landmarkContext ? 'Use both the images AND the landmark data below to identify the sign.' : 'Respond with JSON only.'}${landmarkContext}\n\nRespond with JSON only.`,
-    ]);
-
-    const text = result.response.text().trim();
-
-    // Parse JSON from response (handle markdown code blocks)
-    let parsed: { sign: string; confidence: number };
-    try {
-      const jsonStr = text.replace(/```json\s*/g, '').replace(/```\s*/g, '').trim();
-      parsed = JSON.parse(jsonStr);
-    } catch {
-      console.warn(`[${signLanguage} Vision] Failed to parse Gemini response:`, text);
-      parsed = { sign: '', confidence: 0 };
-    }
+    // Local model first for ASL; the LLM only when it is unsure or can't answer
+    const prediction = await signRouter.recognizeSign({ frames, landmarks, signLanguage }, geminiRecognize);
 
-    res.json({
-      sign: parsed.sign || '',
-      confidence: typeof parsed.confidence === 'number' ? parsed.confidence : 0,
-    });
+    res.json(prediction);
   } catch (err: any) {
     const msg = err.message || String(err);
     console.error(`[${(req.body as any)?.signLanguage || 'ASL'} Vision] Error:`, msg);
@@ -186,3 +193,11 @@ aslRouter.post('/recognize', async (req, res) => {
   }
 });
 
+// Routing counters: how often the LLM still has to answer, and why
+aslRouter.get('/metrics', (_req, res) => {
+  res.type('text/plain; version=0.0.4').send(signRouter.routingMetricsText());
+});
+
+aslRouter.get('/metrics.json', (_req, res) => {
+  res.json(signRouter.routingStats());
+});